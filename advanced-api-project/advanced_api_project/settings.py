@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from advanced_api_project.caching import cache_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -82,6 +85,15 @@ DATABASES = {
 }
 
 
+# Cache
+# CACHE_URL picks the backend: locmem:// (default), file:///path, redis://host:port/db,
+# or fakeredis:// to run the Redis backend against an in-process fake (needs fakeredis).
+
+CACHES = {
+    'default': cache_config(os.environ.get('CACHE_URL'), key_prefix='books'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from advanced_api_project.caching import invalidate_on
+        from .models import Author, Book
+        from .views import BOOK_LIST_CACHE
+
+        # Book lists are searched by author name, so author edits invalidate them too
+        invalidate_on(BOOK_LIST_CACHE, Book, Author)
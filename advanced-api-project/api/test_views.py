@@ -128,3 +128,12 @@ class BookAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         years = [b["publication_year"] for b in response.data]
         self.assertEqual(years, sorted(years))
+
+    # ----- Caching Tests -----
+
+    def test_cached_book_list_sees_new_books(self):
+        # The list is served from the cache until a Book or Author changes
+        self.client.get(self.list_url)
+        Book.objects.create(title="Cache Busting", author=self.author2, publication_year=2020)
+        response = self.client.get(self.list_url)
+        self.assertIn("Cache Busting", [b["title"] for b in response.data])
@@ -3,9 +3,14 @@ from rest_framework import filters
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from django_filters import rest_framework
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.response import Response
+from advanced_api_project.caching import read_through
 from .models import Book
 from .serializers import BookSerializer
 
+# Cache namespace of serialized book lists (invalidated in ApiConfig.ready)
+BOOK_LIST_CACHE = 'book-list'
+
 class BookListView(generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
@@ -15,6 +20,14 @@ class BookListView(generics.ListAPIView):
     search_fields = ['title', 'author__name']
     ordering_fields = ['title', 'publication_year']
 
+    def list(self, request, *args, **kwargs):
+        # Serialized results are cached per query string (filters, search, ordering)
+        data = read_through(
+            BOOK_LIST_CACHE, request.get_full_path(),
+            compute=lambda: list(super(BookListView, self).list(request, *args, **kwargs).data),
+        )
+        return Response(data)
+
 class BookDetailView(generics.RetrieveAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
@@ -4,3 +4,25 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+        from taggit.models import Tag, TaggedItem
+        from django_blog.caching import invalidate_on
+        from .models import Post
+        from .autocomplete import TAG_INDEX_CACHE
+        from .search import post_tags_changed, tag_deleted, tag_deleting, tag_saved, tagged_item_deleted
+        from .views import POST_LIST_CACHE
+
+        # Tag names are part of Post.search_document
+        m2m_changed.connect(post_tags_changed, sender=Post.tags.through, dispatch_uid='blog:search:tags')
+        post_save.connect(tag_saved, sender=Tag, dispatch_uid='blog:search:tag-renamed')
+        # Deletes send no m2m_changed, including the cascade from a deleted tag
+        pre_delete.connect(tag_deleting, sender=Tag, dispatch_uid='blog:search:tag-deleting')
+        post_delete.connect(tag_deleted, sender=Tag, dispatch_uid='blog:search:tag-deleted')
+        post_delete.connect(tagged_item_deleted, sender=TaggedItem, dispatch_uid='blog:search:untagged')
+
+        # Cached post lists and tag pages are dropped when posts or their tags change
+        invalidate_on(POST_LIST_CACHE, Post, Post.tags.through, Tag)
+        # Per-process tag autocomplete indexes rebuild when tags are added, renamed or deleted
+        invalidate_on(TAG_INDEX_CACHE, Tag)
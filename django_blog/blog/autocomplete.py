@@ -0,0 +1,67 @@
+"""
+Tag autocomplete (search-as-you-type) for the tag field and the search box.
+
+Each process keeps every tag name in a sorted in-memory list, so a prefix
+lookup is a binary search followed by a short forward scan, with no query.
+The list is rebuilt from taggit's Tag table when the TAG_INDEX_CACHE
+namespace version moves (see django_blog.caching), which BlogConfig.ready()
+bumps on every Tag change. With a shared cache (Redis) every process sees
+the bump on its next lookup; with a per-process cache (locmem://, the
+default) only the process that changed the tag does. So each list is also
+rebuilt once it is MAX_AGE seconds old, which bounds how stale another
+worker's suggestions can be.
+"""
+import bisect
+import threading
+import time
+
+from django_blog.caching import namespace_version
+
+TAG_INDEX_CACHE = 'blog-tag-index'
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+# Seconds before a list is rebuilt even without a version bump
+MAX_AGE = 300
+
+
+class TagPrefixIndex:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.built_at = None
+        self.keys = []
+        self.tags = []
+
+    def _refresh(self):
+        from taggit.models import Tag
+
+        version = namespace_version(TAG_INDEX_CACHE)
+        if version == self.version and time.monotonic() - self.built_at < MAX_AGE:
+            return
+        rows = sorted(
+            (name.lower(), name, slug)
+            for name, slug in Tag.objects.values_list('name', 'slug').iterator(chunk_size=2000)
+        )
+        with self.lock:
+            self.keys = [key for key, _, _ in rows]
+            self.tags = [{'name': name, 'slug': slug} for _, name, slug in rows]
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """Tags whose name starts with prefix (case-insensitive), alphabetically."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        self._refresh()
+        with self.lock:
+            keys, tags = self.keys, self.tags
+        results = []
+        for position in range(bisect.bisect_left(keys, prefix), len(keys)):
+            if len(results) == limit or not keys[position].startswith(prefix):
+                break
+            results.append(tags[position])
+        return results
+
+
+tag_index = TagPrefixIndex()
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+# Posts rebuilt (read, tagged and written back) per round
+CHUNK_SIZE = 500
+
+
+def populate_search_documents(apps, schema_editor):
+    """Fill search_document chunk by chunk, so memory stays bounded however many posts there are."""
+    Post = apps.get_model('blog', 'Post')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    last_pk = 0
+    while True:
+        posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'title', 'content')[:CHUNK_SIZE])
+        if not posts:
+            return
+        tag_names = {post.pk: [] for post in posts}
+        tagged = TaggedItem.objects.filter(
+            content_type__app_label='blog', content_type__model='post', object_id__in=tag_names,
+        ).values_list('object_id', 'tag__name')
+        for post_id, name in tagged:
+            tag_names[post_id].append(name)
+        # Same layout as Post.build_search_document()
+        for post in posts:
+            post.search_document = '\n'.join([post.title, post.content, *sorted(tag_names[post.pk], key=str.lower)]).lower()
+        Post.objects.bulk_update(posts, ['search_document'])
+        last_pk = posts[-1].pk
+
+
+def create_search_indexes(apps, schema_editor):
+    """Full-text and trigram indexes used by blog.search (PostgreSQL only)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        "CREATE INDEX blog_post_search_fts ON blog_post "
+        "USING GIN (to_tsvector('english', \"search_document\"))"
+    )
+    schema_editor.execute(
+        'CREATE INDEX blog_post_search_trgm ON blog_post '
+        'USING GIN ("search_document" gin_trgm_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS blog_post_search_fts')
+    schema_editor.execute('DROP INDEX IF EXISTS blog_post_search_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_alter_post_options_post_tags_and_more'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
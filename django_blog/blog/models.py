@@ -10,7 +10,34 @@ class Post(models.Model):
     published_date = models.DateTimeField(default=timezone.now)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     tags = TaggableManager() # <-- NEW FIELD for Tagging
-    
+    # Lower-cased title, content and tag names in one column, so search never
+    # joins the tag tables (kept current by blog.search)
+    search_document = models.TextField(blank=True, default='', editable=False)
+
+    def build_search_document(self, tag_names=None):
+        if tag_names is None:
+            tag_names = list(self.tags.names()) if self.pk else []
+        return '\n'.join([self.title, self.content, *sorted(tag_names, key=str.lower)]).lower()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # The text search_document was built from, so saves that leave it alone skip the rebuild
+        post._indexed_text = (post.__dict__.get('title'), post.__dict__.get('content'))
+        return post
+
+    def save(self, *args, **kwargs):
+        # Tag changes rebuild the document from blog.search's receivers
+        text = (self.title, self.content)
+        update_fields = kwargs.get('update_fields')
+        text_saved = update_fields is None or not {'title', 'content'}.isdisjoint(update_fields)
+        if text_saved and getattr(self, '_indexed_text', None) != text:
+            self.search_document = self.build_search_document()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_document'}
+        super().save(*args, **kwargs)
+        self._indexed_text = text
+
     def get_absolute_url(self):
         return reverse('post-detail', kwargs={'pk': self.pk})
 
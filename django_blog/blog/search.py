@@ -0,0 +1,129 @@
+"""
+Search for SearchResultsListView.
+
+Posts are matched against Post.search_document, a lower-cased copy of the
+title, content and tag names, so a search reads one table: no join through
+the tag tables and no DISTINCT to undo the duplicate rows that join produced.
+
+On PostgreSQL (the production database) migration 0004 indexes the column twice:
+
+* a GIN index on to_tsvector('english', search_document) for ranked full-text
+  matches of whole words (stemmed: "tagging" finds "tags"), and
+* a pg_trgm GIN index, so the ILIKE '%...%' substring match that keeps
+  partial words working ("djan") is served by the index instead of a scan.
+
+Other databases fall back to an unranked substring match on the same column.
+
+The document is rebuilt in Post.save() when the title or content changes and,
+through the receivers below, when tags are added to or removed from a post or
+a tag is renamed or deleted.
+"""
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Must stay identical to the expression of the GIN index in migration 0004
+PG_DOCUMENT = "to_tsvector('english', \"blog_post\".\"search_document\")"
+
+
+def search_posts(queryset, query):
+    """Filter queryset to posts matching query, best match first."""
+    query = query.strip()
+    if not query:
+        return queryset.none()
+    if connection.vendor == 'postgresql':
+        return _search_postgres(queryset, query)
+    return (
+        queryset.filter(search_document__contains=query.lower())
+        .annotate(search_rank=Value(0.0, output_field=FloatField()))
+        .order_by('-published_date', '-pk')
+    )
+
+
+def _search_postgres(queryset, query):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+    # The indexed expression itself (SearchVector would wrap the column in COALESCE)
+    vector = RawSQL(PG_DOCUMENT, (), output_field=SearchVectorField())
+    search_query = SearchQuery(query, config='english', search_type='websearch')
+    # search_document is already lower-case, so a plain LIKE matches
+    # case-insensitively and is served by the trigram index
+    return (
+        queryset.alias(document_vector=vector)
+        .filter(Q(document_vector=search_query) | Q(search_document__contains=query.lower()))
+        .annotate(search_rank=SearchRank(vector, search_query))
+        .order_by(F('search_rank').desc(), '-published_date', '-pk')
+    )
+
+
+# --- Keeping search_document current ---
+
+def refresh_search_documents(post_ids):
+    """Rebuild search_document for the given posts (two queries however many there are)."""
+    from taggit.models import TaggedItem
+    from .models import Post
+
+    posts = list(Post.objects.filter(pk__in=post_ids).only('pk', 'title', 'content'))
+    tag_names = {post.pk: [] for post in posts}
+    tagged = TaggedItem.objects.filter(
+        content_type__app_label=Post._meta.app_label,
+        content_type__model=Post._meta.model_name,
+        object_id__in=tag_names,
+    ).values_list('object_id', 'tag__name')
+    for post_id, name in tagged:
+        tag_names[post_id].append(name)
+    for post in posts:
+        post.search_document = post.build_search_document(tag_names[post.pk])
+    Post.objects.bulk_update(posts, ['search_document'], batch_size=500)
+
+
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed on Post.tags.through: tags added to posts (removals arrive as deletes)."""
+    from .models import Post
+
+    if action != 'post_add':
+        return
+    if not reverse and isinstance(instance, Post):
+        refresh_search_documents([instance.pk])
+    elif reverse and pk_set:
+        refresh_search_documents(pk_set)
+
+
+def tag_saved(sender, instance, created, **kwargs):
+    """A renamed tag changes the document of every post carrying it."""
+    from .models import Post
+
+    if created:
+        return
+    post_ids = list(Post.objects.filter(tags=instance).values_list('pk', flat=True))
+    if post_ids:
+        refresh_search_documents(post_ids)
+
+
+def tag_deleting(sender, instance, **kwargs):
+    """pre_delete on Tag: remember its posts, whose tagged items the delete cascades to."""
+    from .models import Post
+
+    instance.search_post_ids = list(Post.objects.filter(tags=instance).values_list('pk', flat=True))
+
+
+def tag_deleted(sender, instance, **kwargs):
+    if getattr(instance, 'search_post_ids', None):
+        refresh_search_documents(instance.search_post_ids)
+
+
+def tagged_item_deleted(sender, instance, origin=None, **kwargs):
+    """
+    post_delete on TaggedItem: a tag taken off a post (tags.remove()/clear(),
+    the admin). Cascades from a deleted tag are handled by tag_deleted, and a
+    deleted post needs no document.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from taggit.models import Tag
+    from .models import Post
+
+    if isinstance(origin, (Tag, Post)):
+        return
+    # get_for_id is served from the content type cache
+    if ContentType.objects.get_for_id(instance.content_type_id).model_class() is Post:
+        refresh_search_documents([instance.object_id])
@@ -1,3 +1,185 @@
+import importlib.util
+import time
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.backends.redis import RedisCache
 from django.test import TestCase
+from taggit.models import Tag
+
+from django_blog.caching import VERSION_TIMEOUT, cache_config, invalidate, namespace_version, read_through
+
+from .autocomplete import MAX_AGE, TagPrefixIndex
+from .models import Post
+from .views import POST_LIST_CACHE
+
+
+class CacheLayerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_read_through_until_invalidated(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(read_through('tests', 'key', compute=compute), 1)
+        self.assertEqual(read_through('tests', 'key', compute=compute), 1)
+        invalidate('tests')
+        self.assertEqual(read_through('tests', 'key', compute=compute), 2)
+
+    def test_namespace_versions_expire_and_reseed(self):
+        version = namespace_version('tests')
+        invalidate('tests')
+        self.assertEqual(namespace_version('tests'), version + 1)
+
+        later = time.time() + VERSION_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            reseeded = namespace_version('tests')
+        self.assertGreater(reseeded, version + 1)
+
+    @skipUnless(importlib.util.find_spec('fakeredis'), 'needs fakeredis')
+    def test_fakeredis_url_runs_the_redis_backend(self):
+        config = cache_config('fakeredis://tests/1', key_prefix='blog')
+        self.assertEqual(config['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+
+        backend = RedisCache(config['LOCATION'], {key: value for key, value in config.items() if key != 'LOCATION'})
+        backend.set('greeting', 'hello')
+        self.assertEqual(backend.get('greeting'), 'hello')
+
+
+class PostListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer', password='pass-12345')
+        self.post = Post.objects.create(title='First post', content='hello', author=self.author)
+        self.post.tags.add('django')
+
+    def post_titles(self, url):
+        return [post.title for post in self.client.get(url).context['posts']]
+
+    def test_post_list_is_served_from_the_cache(self):
+        self.client.get('/posts/')
+        version = namespace_version(POST_LIST_CACHE)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post_titles('/posts/'), ['First post'])
+        self.assertEqual(namespace_version(POST_LIST_CACHE), version)
+
+    def test_post_writes_invalidate_the_list(self):
+        self.assertEqual(self.post_titles('/posts/'), ['First post'])
+
+        Post.objects.create(title='Second post', content='more', author=self.author)
+        self.assertEqual(self.post_titles('/posts/'), ['Second post', 'First post'])
+
+        self.post.title = 'Renamed post'
+        self.post.save()
+        self.assertIn('Renamed post', self.post_titles('/posts/'))
+
+        self.post.delete()
+        self.assertEqual(self.post_titles('/posts/'), ['Second post'])
+
+    def test_retagging_invalidates_tag_pages(self):
+        self.assertEqual(self.post_titles('/tags/python/'), [])
+        self.post.tags.add('python')
+        self.assertEqual(self.post_titles('/tags/python/'), ['First post'])
+        self.post.tags.remove('django')
+        self.assertEqual(self.post_titles('/tags/django/'), [])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='searcher', password='pass-12345')
+        self.post = Post.objects.create(title='Deploying Django', content='gunicorn behind nginx', author=self.author)
+        self.post.tags.add('ops')
+
+    def found(self, query):
+        return [post.title for post in self.client.get('/search/', {'q': query}).context['results']]
+
+    def test_new_posts_are_found(self):
+        Post.objects.create(title='Testing views', content='the test client', author=self.author)
+        self.assertEqual(self.found('client'), ['Testing views'])
+        self.assertEqual(self.found('DJANGO'), ['Deploying Django'])
+
+    def test_edits_replace_the_indexed_text(self):
+        self.post.title = 'Deploying Flask'
+        self.post.content = 'uwsgi'
+        self.post.save()
+        self.assertEqual(self.found('flask'), ['Deploying Flask'])
+        self.assertEqual(self.found('uwsgi'), ['Deploying Flask'])
+        self.assertEqual(self.found('gunicorn'), [])
+
+        Post.objects.get(pk=self.post.pk).save(update_fields=['content'])
+        self.assertEqual(self.found('uwsgi'), ['Deploying Flask'])
+
+    def test_retagging_is_searchable(self):
+        self.post.tags.add('deployment')
+        self.assertEqual(self.found('deployment'), ['Deploying Django'])
+        self.post.tags.remove('deployment')
+        self.assertEqual(self.found('deployment'), [])
+        self.post.tags.clear()
+        self.assertEqual(self.found('ops'), [])
+
+    def test_renamed_and_deleted_tags(self):
+        tag = Tag.objects.get(name='ops')
+        tag.name = 'devops'
+        tag.save()
+        self.assertEqual(self.found('devops'), ['Deploying Django'])
+
+        tag.delete()
+        self.assertEqual(self.found('devops'), [])
+        self.assertEqual(self.found('deploying'), ['Deploying Django'])
+
+    def test_deleted_posts_are_not_found(self):
+        self.post.delete()
+        self.assertEqual(self.found('django'), [])
+
+    def test_saves_without_text_changes_keep_the_document(self):
+        post = Post.objects.get(pk=self.post.pk)
+        # Only the UPDATE: no tag query to rebuild the document
+        with self.assertNumQueries(1):
+            post.save()
+        with self.assertNumQueries(1):
+            post.save(update_fields=['published_date'])
+        self.assertEqual(self.found('ops'), ['Deploying Django'])
+
+
+class TagAutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Tag.objects.create(name='Django', slug='django')
+        Tag.objects.create(name='django-rest', slug='django-rest')
+        Tag.objects.create(name='python', slug='python')
+
+    def test_prefix_lookup(self):
+        index = TagPrefixIndex()
+        self.assertEqual([tag['name'] for tag in index.complete('DJ')], ['Django', 'django-rest'])
+        self.assertEqual(index.complete('dj', limit=1), [{'name': 'Django', 'slug': 'django'}])
+        self.assertEqual(index.complete('ruby'), [])
+        # Served from memory until the tags change
+        with self.assertNumQueries(0):
+            index.complete('py')
+
+    def test_tag_changes_rebuild_the_index(self):
+        index = TagPrefixIndex()
+        index.complete('py')
+        Tag.objects.create(name='pytest', slug='pytest')
+        self.assertEqual([tag['name'] for tag in index.complete('py')], ['pytest', 'python'])
+
+    def test_stale_index_is_rebuilt_without_a_version_bump(self):
+        index = TagPrefixIndex()
+        index.complete('py')
+        # Another worker's change, whose version bump this process never saw
+        with mock.patch('blog.autocomplete.namespace_version', return_value=index.version):
+            Tag.objects.create(name='pytest', slug='pytest')
+            self.assertEqual([tag['name'] for tag in index.complete('py')], ['python'])
+
+            later = time.monotonic() + MAX_AGE
+            with mock.patch('time.monotonic', return_value=later):
+                self.assertEqual([tag['name'] for tag in index.complete('py')], ['pytest', 'python'])
 
-# Create your tests here.
+    def test_autocomplete_view(self):
+        response = self.client.get('/tags/autocomplete/', {'q': 'pyt'})
+        self.assertEqual(response.json(), {'results': [{'name': 'python', 'slug': 'python'}]})
@@ -39,6 +39,8 @@ urlpatterns = [
 
     # --- Task 4: Tagging and Search URLs (Checker Compliant Tag Path) ---
     # NOTE: We use PostByTagListView to satisfy the checker, even though the view class is named PostTagListView
+    # Declared before the tag page so 'autocomplete' is not read as a tag slug
+    path('tags/autocomplete/', views.tag_autocomplete, name='tag-autocomplete'),
     path('tags/<slug:tag_slug>/', PostByTagListView.as_view(), name='post-by-tag'), # REQUIRED Path and View Name
     path('search/', SearchResultsListView.as_view(), name='search-results'),
 ]
@@ -1,10 +1,10 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin # REQUIRED Mixins
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.db.models import Q 
 
 # Import the base CBVs
 from django.views.generic import (
@@ -15,8 +15,11 @@ from django.views.generic import (
     DeleteView
 )
 
+from django_blog.caching import cached_queryset
 from .forms import CustomUserCreationForm, PostForm, CommentForm
 from .models import Post, Comment
+from .search import search_posts
+from .autocomplete import tag_index, DEFAULT_LIMIT, MAX_LIMIT
 from django.utils import timezone
 
 
@@ -55,12 +58,24 @@ def profile(request):
 
 # --- Task 2: CRUD Class-Based Views (Post Management) ---
 
+# Cache namespace of the post list and tag pages (invalidated in BlogConfig.ready)
+POST_LIST_CACHE = 'blog-post-list'
+
+
+def cached_post_list(queryset):
+    """Evaluate a post list through the cache, with the authors and tags the template shows."""
+    return cached_queryset(queryset.select_related('author').prefetch_related('tags'), POST_LIST_CACHE)
+
+
 class PostListView(ListView):
     model = Post
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
     ordering = ['-published_date'] 
 
+    def get_queryset(self):
+        return cached_post_list(super().get_queryset())
+
 class PostDetailView(DetailView):
     model = Post
     template_name = 'blog/post_detail.html'
@@ -165,7 +180,9 @@ class PostTagListView(ListView):
     context_object_name = 'posts'
     
     def get_queryset(self):
-        return Post.objects.filter(tags__slug=self.kwargs.get('tag_slug')).order_by('-published_date')
+        return cached_post_list(
+            Post.objects.filter(tags__slug=self.kwargs.get('tag_slug')).order_by('-published_date')
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -183,19 +200,26 @@ class SearchResultsListView(ListView):
     model = Post
     template_name = 'blog/search_results.html'
     context_object_name = 'results'
+    paginate_by = 10
 
     def get_queryset(self):
-        query = self.request.GET.get('q')
-        if query:
-            queryset = Post.objects.filter(
-                Q(title__icontains=query) |
-                Q(content__icontains=query) |
-                Q(tags__name__icontains=query)
-            ).distinct().order_by('-published_date')
-            return queryset
-        return Post.objects.none()
+        query = self.request.GET.get('q', '')
+        # One table (see blog.search), so no DISTINCT is needed and paging stays cheap
+        return search_posts(
+            Post.objects.select_related('author').prefetch_related('tags'), query,
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['search_query'] = self.request.GET.get('q', '')
         return context
+
+
+def tag_autocomplete(request):
+    """Tags starting with ?q=, as JSON, for search-as-you-type (?limit= up to 25)."""
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    results = tag_index.complete(request.GET.get('q', ''), max(1, min(limit, MAX_LIMIT)))
+    return JsonResponse({'results': results})
@@ -0,0 +1,199 @@
+"""
+Read-through caching for hot read paths.
+
+Backends are chosen with the CACHE_URL environment variable (see cache_config):
+
+    locmem://                   per-process memory (the default)
+    file:///var/tmp/app-cache   files shared by the processes of one host
+    redis://localhost:6379/0    Redis, shared by every process (needs `redis`)
+    fakeredis://                Django's Redis backend against an in-process
+                                fakeredis server (needs `redis` and `fakeredis`),
+                                for tests and development without a Redis server
+
+Cached values live in namespaces. Every namespace has a version number that is
+part of each key, so invalidate() drops a whole namespace by bumping the number
+instead of deleting keys one by one; old entries simply expire. Version keys
+expire too (VERSION_TIMEOUT): the next read reseeds the version from the clock,
+which never reuses an old number. invalidate_on() wires that to model signals.
+
+On a miss only one caller recomputes a key (single-flight): it takes a short
+lock with cache.add(), the others wait briefly for its result instead of all
+hitting the database at once.
+
+social_media_api, django_blog and advanced-api-project each ship an identical
+copy of this module, so every project deploys on its own; change them together.
+"""
+import functools
+import hashlib
+import time
+from urllib.parse import urlsplit
+
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+__all__ = [
+    'DEFAULT_TIMEOUT', 'VERSION_TIMEOUT', 'cache_config', 'cached', 'cached_queryset', 'get_or_compute',
+    'invalidate', 'invalidate_on', 'make_key', 'namespace_version', 'read_through',
+]
+
+DEFAULT_TIMEOUT = 5 * 60
+# Lifetime of a namespace's version key; expiry only costs one round of misses
+VERSION_TIMEOUT = 24 * 60 * 60
+# How long a recomputation may hold the lock, and how long others wait for it
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+def cache_config(url, timeout=DEFAULT_TIMEOUT, key_prefix=''):
+    """Build a CACHES entry from a cache URL."""
+    parts = urlsplit(url or 'locmem://')
+    options = {'TIMEOUT': timeout, 'KEY_PREFIX': key_prefix}
+    if parts.scheme == 'locmem':
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': parts.netloc, **options}
+    if parts.scheme == 'fakeredis':
+        return _fakeredis_config(parts, options)
+    if parts.scheme == 'file':
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': parts.path, **options}
+    if parts.scheme in ('redis', 'rediss'):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url, **options}
+    if parts.scheme == 'dummy':
+        return {'BACKEND': 'django.core.cache.backends.dummy.DummyCache', **options}
+    raise ValueError(f'Unsupported cache URL scheme: {parts.scheme!r}')
+
+
+_fake_redis_servers = {}
+
+
+def _fakeredis_config(parts, options):
+    # The real Redis backend and client, with connections served by fakeredis
+    try:
+        import fakeredis
+    except ImportError as error:
+        raise ImproperlyConfigured('fakeredis:// cache URLs need the fakeredis package') from error
+    server = _fake_redis_servers.setdefault(parts.netloc, fakeredis.FakeServer())
+    return {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'redis://localhost{parts.path or "/0"}',
+        'OPTIONS': {'connection_class': fakeredis.FakeConnection, 'server': server},
+        **options,
+    }
+
+
+# --- Namespaces and versioning ---
+
+def _version_key(namespace):
+    return f'ns:{namespace}:version'
+
+
+def namespace_version(namespace, cache_alias='default'):
+    cache = caches[cache_alias]
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        # Seed with the time so a cache restart never reuses an old version number
+        cache.add(_version_key(namespace), int(time.time() * 1000), VERSION_TIMEOUT)
+        version = cache.get(_version_key(namespace), 0)
+    return version
+
+
+def invalidate(namespace, cache_alias='default'):
+    """Drop every key of the namespace by moving it to a new version."""
+    cache = caches[cache_alias]
+    try:
+        cache.incr(_version_key(namespace))
+        cache.touch(_version_key(namespace), VERSION_TIMEOUT)
+    except ValueError:
+        namespace_version(namespace, cache_alias)
+
+
+def make_key(namespace, *parts, cache_alias='default'):
+    raw = ':'.join(str(part) for part in parts)
+    # Hash arbitrary parts (query strings, filters) into a short, backend-safe key
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'{namespace}:{namespace_version(namespace, cache_alias)}:{digest}'
+
+
+# --- Read-through ---
+
+def get_or_compute(key, compute, timeout=DEFAULT_TIMEOUT, cache_alias='default'):
+    """Return the cached value for key, computing and storing it on a miss (single-flight)."""
+    cache = caches[cache_alias]
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    # Another caller is recomputing; wait for its result rather than stampeding
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if cache.get(lock_key) is None:
+            break
+    return compute()
+
+
+def read_through(namespace, *parts, compute, timeout=DEFAULT_TIMEOUT, cache_alias='default'):
+    """get_or_compute() under a versioned key built from namespace and parts."""
+    key = make_key(namespace, *parts, cache_alias=cache_alias)
+    return get_or_compute(key, compute, timeout=timeout, cache_alias=cache_alias)
+
+
+def cached(namespace, key=None, timeout=DEFAULT_TIMEOUT, cache_alias='default'):
+    """
+    Decorator form of read_through(). The key parts are the call arguments, or
+    whatever key(*args, **kwargs) returns (a tuple of parts).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            parts = key(*args, **kwargs) if key else (*args, *sorted(kwargs.items()))
+            return read_through(
+                namespace, *parts, compute=lambda: func(*args, **kwargs),
+                timeout=timeout, cache_alias=cache_alias,
+            )
+        wrapper.invalidate = lambda: invalidate(namespace, cache_alias)
+        return wrapper
+    return decorator
+
+
+def cached_queryset(queryset, namespace, *parts, timeout=DEFAULT_TIMEOUT, cache_alias='default'):
+    """Evaluate queryset through the cache; the SQL is part of the key."""
+    return read_through(
+        namespace, str(queryset.query), *parts,
+        compute=lambda: list(queryset), timeout=timeout, cache_alias=cache_alias,
+    )
+
+
+# --- Signal-driven invalidation ---
+
+def invalidate_on(namespace, *senders, cache_alias='default'):
+    """
+    Invalidate namespace whenever one of the sender models is saved or
+    deleted, or one of the sender M2M through models changes.
+    """
+    def receiver(sender, **kwargs):
+        if kwargs.get('action', 'post_').startswith('post_'):
+            # Again after commit, in case a reader re-cached the old rows meanwhile
+            invalidate(namespace, cache_alias)
+            transaction.on_commit(lambda: invalidate(namespace, cache_alias))
+
+    for sender in senders:
+        for name, signal in (('save', post_save), ('delete', post_delete), ('m2m', m2m_changed)):
+            signal.connect(
+                receiver, sender=sender, weak=False,
+                dispatch_uid=f'caching:{namespace}:{sender._meta.label}:{name}',
+            )
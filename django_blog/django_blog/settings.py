@@ -7,6 +7,8 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from django_blog.caching import cache_config
+
 # Load environment variables from .env file
 load_dotenv()
 # --- END UPDATED IMPORTS ---
@@ -85,6 +87,14 @@ DATABASES = {
 }
 
 
+# --- Cache (django_blog.caching) ---
+# CACHE_URL picks the backend: locmem:// (default), file:///path, redis://host:port/db,
+# or fakeredis:// to run the Redis backend against an in-process fake (needs fakeredis).
+CACHES = {
+    'default': cache_config(os.getenv('CACHE_URL'), key_prefix='blog'),
+}
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
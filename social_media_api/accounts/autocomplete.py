@@ -0,0 +1,34 @@
+"""
+Username autocomplete (search-as-you-type).
+
+A prefix is matched as a range scan on the lower(username) expression index
+(migration 0005): lower(username) >= 'ab' AND lower(username) < 'ab' + U+10FFFF,
+ordered by the same expression, so the database reads at most `limit` index
+entries however large the user table is. The istartswith condition re-checks
+each candidate, which keeps results exact under collations where the range is
+only approximately a prefix.
+"""
+from django.db.models.functions import Lower
+
+from .models import CustomUser, USER_SUMMARY_FIELDS
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 25
+# Sorts after every character that can follow the prefix
+_RANGE_END = '\U0010ffff'
+
+
+def autocomplete_usernames(prefix, limit=DEFAULT_LIMIT):
+    prefix = prefix.strip().lower()
+    if not prefix:
+        return CustomUser.objects.none()
+    return (
+        CustomUser.objects.annotate(username_lower=Lower('username'))
+        .filter(
+            username_lower__gte=prefix,
+            username_lower__lt=prefix + _RANGE_END,
+            username__istartswith=prefix,
+        )
+        .order_by('username_lower', 'id')
+        .only(*USER_SUMMARY_FIELDS)[:limit]
+    )
@@ -0,0 +1,181 @@
+"""
+Batched follow-graph writes shared by the single and bulk follow views.
+
+Following N users costs a fixed number of statements: one ``IN`` query to
+validate the ids, one INSERT of the through rows and two counter UPDATEs.
+The INSERT (``ON CONFLICT DO NOTHING RETURNING``) and the unfollow DELETE
+(``RETURNING``) report which rows they actually changed, and only those move
+the counters and produce notifications, so concurrent or repeated requests
+cannot double count. Notifications are handed to the dispatch pipeline as one
+batch of events.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+from notifications import dispatch
+from posts.timeline import backfill_timeline, remove_from_timeline
+from social_media_api.caching import invalidate, read_through
+from social_media_api.sql import supports_returning
+
+from .models import CustomUser, Follow
+
+FOLLOW_VERB = 'started following'
+
+
+def _columns():
+    quote = connection.ops.quote_name
+    return (
+        quote(Follow._meta.db_table),
+        quote(Follow._meta.get_field('followee').column),
+        quote(Follow._meta.get_field('follower').column),
+    )
+
+
+def _insert_follows(user, followee_ids):
+    """Insert the missing follow rows; returns the followee ids actually inserted."""
+    if not supports_returning():
+        # Serialize the user's follow writes on the follower row, then diff
+        CustomUser.objects.select_for_update().filter(pk=user.pk).exists()
+        existing = set(
+            Follow.objects.filter(follower=user, followee__in=followee_ids).values_list('followee_id', flat=True)
+        )
+        new_ids = [pk for pk in followee_ids if pk not in existing]
+        Follow.objects.bulk_create([Follow(followee_id=pk, follower_id=user.pk) for pk in new_ids])
+        return new_ids
+
+    table, followee, follower = _columns()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({followee}, {follower}) VALUES {", ".join(["(%s, %s)"] * len(followee_ids))} '
+            f'ON CONFLICT ({followee}, {follower}) DO NOTHING RETURNING {followee}',
+            [value for pk in followee_ids for value in (pk, user.pk)],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _delete_follows(user, followee_ids):
+    """Delete the user's follow rows for followee_ids; returns the followee ids actually deleted."""
+    if not supports_returning():
+        CustomUser.objects.select_for_update().filter(pk=user.pk).exists()
+        links = Follow.objects.filter(follower=user, followee__in=followee_ids)
+        removed_ids = list(links.values_list('followee_id', flat=True))
+        links.delete()
+        return removed_ids
+
+    table, followee, follower = _columns()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {follower} = %s AND {followee} IN ({", ".join(["%s"] * len(followee_ids))}) '
+            f'RETURNING {followee}',
+            [user.pk, *followee_ids],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _move_counts(user, followee_ids, delta):
+    # Greatest() keeps a counter that has drifted from going negative
+    CustomUser.objects.filter(pk__in=followee_ids).update(
+        follower_count=Greatest(F('follower_count') + delta, Value(0))
+    )
+    CustomUser.objects.filter(pk=user.pk).update(
+        following_count=Greatest(F('following_count') + delta * len(followee_ids), Value(0))
+    )
+
+
+def follow_users(user, user_ids):
+    """
+    Make user follow every id in user_ids.
+
+    Returns (followed, already_following, not_found) as sorted id lists.
+    """
+    requested = set(user_ids) - {user.pk}
+    found = sorted(CustomUser.objects.filter(pk__in=requested).values_list('pk', flat=True))
+    if not found:
+        return [], [], sorted(requested)
+
+    with transaction.atomic():
+        new_ids = sorted(_insert_follows(user, found))
+        if new_ids:
+            _move_counts(user, new_ids, 1)
+            # Target is the User who was followed
+            dispatch.enqueue(
+                dispatch.make_event(dispatch.CREATE, pk, user.pk, FOLLOW_VERB, CustomUser, pk)
+                for pk in new_ids
+            )
+
+    if new_ids:
+        # Copy the followed users' recent posts into the follower's timeline
+        backfill_timeline(user, new_ids)
+        invalidate(_suggestions_namespace(user))
+
+    return new_ids, sorted(set(found) - set(new_ids)), sorted(requested - set(found))
+
+
+def unfollow_users(user, user_ids):
+    """Make user stop following every id in user_ids. Returns the ids that were unfollowed."""
+    requested = sorted(set(user_ids))
+    if not requested:
+        return []
+
+    with transaction.atomic():
+        removed_ids = sorted(_delete_follows(user, requested))
+        if removed_ids:
+            _move_counts(user, removed_ids, -1)
+            dispatch.enqueue(
+                dispatch.make_event(dispatch.RETRACT, pk, user.pk, FOLLOW_VERB, CustomUser, pk)
+                for pk in removed_ids
+            )
+
+    if removed_ids:
+        # Drop the unfollowed users' posts from the follower's timeline
+        remove_from_timeline(user, removed_ids)
+        invalidate(_suggestions_namespace(user))
+
+    return removed_ids
+
+
+# Suggestions only go stale slowly (other users' follows), so they are cached
+# per user and dropped when the user's own follows change.
+SUGGESTIONS_TIMEOUT = 10 * 60
+
+
+def _suggestions_namespace(user):
+    return f'follow-suggestions:{user.pk}'
+
+
+def follow_suggestions(user, limit=20):
+    """Cached _compute_suggestions() for the user."""
+    return read_through(
+        _suggestions_namespace(user), limit,
+        compute=lambda: _compute_suggestions(user, limit), timeout=SUGGESTIONS_TIMEOUT,
+    )
+
+
+def _compute_suggestions(user, limit):
+    """
+    Users followed by the people user follows, ranked by how many of them
+    follow each one; padded with the most-followed accounts.
+    """
+    following = Follow.objects.filter(follower=user).values('followee')
+    mutual = dict(
+        Follow.objects.filter(follower__in=following)
+        .exclude(followee__in=following)
+        .exclude(followee=user)
+        .values('followee')
+        .annotate(mutual=Count('id'))
+        .order_by('-mutual')
+        .values_list('followee', 'mutual')[:limit]
+    )
+
+    suggestions = list(CustomUser.objects.filter(pk__in=mutual))
+    if len(suggestions) < limit:
+        suggestions += list(
+            CustomUser.objects.exclude(pk__in=following).exclude(pk=user.pk).exclude(pk__in=mutual)
+            .order_by('-follower_count', 'pk')[:limit - len(suggestions)]
+        )
+
+    for suggestion in suggestions:
+        suggestion.mutual_count = mutual.get(suggestion.pk, 0)
+    suggestions.sort(key=lambda suggestion: (-suggestion.mutual_count, -suggestion.follower_count, suggestion.pk))
+    return suggestions
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:24
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_follow_counters(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    Follow = CustomUser.followers.through
+
+    def total(column):
+        return Coalesce(Subquery(
+            Follow.objects.filter(**{column: OuterRef('pk')}).order_by()
+            .values(column).annotate(total=Count('id')).values('total')
+        ), 0)
+
+    CustomUser.objects.update(
+        follower_count=total('from_customuser'),
+        following_count=total('to_customuser'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_follow_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Replace the auto-generated CustomUser.followers through model with the
+    explicit Follow model. Follow maps onto the existing table and columns, so
+    only the migration state changes; the two keyset indexes are real DDL.
+    """
+
+    dependencies = [
+        ('accounts', '0003_unread_counter'),
+        # Earlier data migrations query the follow table through the auto-generated model
+        ('posts', '0003_timelineentry'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Follow',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('followee', models.ForeignKey(db_column='from_customuser_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                        ('follower', models.ForeignKey(db_column='to_customuser_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'accounts_customuser_followers',
+                        'unique_together': {('followee', 'follower')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='customuser',
+                    name='followers',
+                    field=models.ManyToManyField(blank=True, related_name='following', through='accounts.Follow', through_fields=('followee', 'follower'), to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followee', '-id'], name='accounts_follow_followee_new'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', '-id'], name='accounts_follow_follower_new'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled_authors(apps, schema_editor):
+    """Authors over the fan-out limit had their posts pulled rather than fanned out."""
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    limit = getattr(settings, 'FEED_FANOUT_FOLLOWER_LIMIT', 10000)
+    CustomUser.objects.filter(follower_count__gt=limit).update(feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_username_autocomplete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='feed_pulled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_pulled_authors, migrations.RunPython.noop),
+    ]
@@ -1,21 +1,68 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 
+# Columns loaded with only() wherever a user is embedded as a summary
+# (accounts.serializers.UserSummarySerializer)
+USER_SUMMARY_FIELDS = ('id', 'username', 'profile_picture')
+
 class CustomUser(AbstractUser):
     # Additional Fields
     bio = models.TextField(max_length=500, blank=True, null=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
 
-    # Followers field (ManyToMany to self, non-symmetrical)
+    # Followers field (ManyToMany to self, non-symmetrical), stored as Follow rows
     followers = models.ManyToManyField(
         'self',
         symmetrical=False,
         related_name='following',
-        blank=True
+        blank=True,
+        through='Follow',
+        through_fields=('followee', 'follower'),
     )
 
+    # Denormalized sizes of the follow graph, maintained with F() updates
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    # Unread notifications badge, maintained by the notifications app
+    unread_notification_count = models.PositiveIntegerField(default=0)
+
+    # Posts are merged into followers' feeds at read time rather than fanned
+    # out, maintained by posts.timeline
+    feed_pulled = models.BooleanField(default=False)
+
     def __str__(self):
         return self.username
 
     class Meta:
         ordering = ['username']
+        indexes = [
+            # Case-insensitive prefix lookups for username autocomplete (accounts.autocomplete)
+            models.Index(Lower('username'), name='accounts_username_lower'),
+        ]
+
+
+class Follow(models.Model):
+    """
+    One follow edge: `follower` follows `followee`. Kept in the table Django
+    created for the original auto-generated CustomUser.followers through model.
+    """
+    followee = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name='+', db_column='from_customuser_id'
+    )
+    follower = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name='+', db_column='to_customuser_id'
+    )
+
+    class Meta:
+        db_table = 'accounts_customuser_followers'
+        unique_together = [('followee', 'follower')]
+        # Newest-first keyset pagination of both directions of the graph
+        indexes = [
+            models.Index(fields=['followee', '-id'], name='accounts_follow_followee_new'),
+            models.Index(fields=['follower', '-id'], name='accounts_follow_follower_new'),
+        ]
+
+    def __str__(self):
+        return f'{self.follower_id} follows {self.followee_id}'
@@ -26,8 +26,43 @@ class CustomUserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 class CustomUserSerializer(serializers.ModelSerializer):
-    """Serializer for retrieving and updating user profile data."""
+    """
+    Serializer for retrieving and updating user profile data. The follow graph
+    itself is served by the paginated followers/following endpoints.
+    """
     class Meta:
         model = CustomUser
-        fields = ('id', 'username', 'email', 'bio', 'profile_picture', 'followers', 'following')
-        read_only_fields = ('followers', 'following') 
+        fields = (
+            'id', 'username', 'email', 'bio', 'profile_picture',
+            'follower_count', 'following_count'
+        )
+        read_only_fields = ('follower_count', 'following_count')
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    """
+    Compact user embed for posts, comments and notifications. Reads only the
+    columns in USER_SUMMARY_FIELDS, so querysets can load users with only().
+    """
+    avatar = serializers.ImageField(source='profile_picture', read_only=True)
+
+    class Meta:
+        model = CustomUser
+        fields = ('id', 'username', 'avatar')
+
+
+class BulkFollowSerializer(serializers.Serializer):
+    """Validates the list of user ids for bulk follow/unfollow."""
+    user_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    """A suggested account plus how many followed users already follow it."""
+    mutual_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = CustomUser
+        fields = ('id', 'username', 'profile_picture', 'follower_count', 'mutual_count')
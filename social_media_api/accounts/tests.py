@@ -1,3 +1,158 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.contenttypes.models import ContentType
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from notifications.models import Notification
+from .follows import follow_users, unfollow_users
+from .models import CustomUser
+
+
+class BulkFollowTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='newcomer', password='pass-12345')
+        self.others = [CustomUser.objects.create_user(username=f'user{i}') for i in range(5)]
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_follow_reports_each_id(self):
+        self.client.post(f'/api/follow/{self.others[0].pk}/')
+        ids = [user.pk for user in self.others] + [self.user.pk, 999999]
+
+        response = self.client.post('/api/follow/bulk/', {'user_ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['followed'], [user.pk for user in self.others[1:]])
+        self.assertEqual(response.data['already_following'], [self.others[0].pk])
+        self.assertEqual(response.data['not_found'], [999999])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.following_count, 5)
+        self.assertEqual(Notification.objects.filter(actor=self.user).count(), 5)
+
+    def test_bulk_follow_query_count_is_constant(self):
+        ContentType.objects.get_for_model(CustomUser)  # warm the ContentType cache
+        ids = [user.pk for user in self.others]
+        # validate ids, savepoint, INSERT ... RETURNING, 2 counter UPDATEs,
+        # notification batch (savepoint, usernames, open rollups, INSERT, unread
+        # counters, actor links, release), release, timeline backfill and trim
+        with self.assertNumQueries(15):
+            self.client.post('/api/follow/bulk/', {'user_ids': ids}, format='json')
+
+    def test_bulk_unfollow(self):
+        ids = [user.pk for user in self.others]
+        self.client.post('/api/follow/bulk/', {'user_ids': ids}, format='json')
+
+        response = self.client.post('/api/unfollow/bulk/', {'user_ids': ids[:2]}, format='json')
+
+        self.assertEqual(response.data['unfollowed'], ids[:2])
+        self.others[0].refresh_from_db()
+        self.assertEqual(self.others[0].follower_count, 0)
+        self.assertEqual(set(self.user.following.values_list('pk', flat=True)), set(ids[2:]))
+
+    def test_following_twice_counts_once(self):
+        target = self.others[0]
+        for _ in range(2):
+            self.client.post(f'/api/follow/{target.pk}/')
+        self.assertEqual(follow_users(self.user, [target.pk]), ([], [target.pk], []))
+
+        target.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(target.follower_count, 1)
+        self.assertEqual(self.user.following_count, 1)
+        self.assertEqual(Notification.objects.filter(recipient=target, actor=self.user).count(), 1)
+
+    def test_locking_fallback_counts_once(self):
+        target = self.others[0]
+        with mock.patch('accounts.follows.supports_returning', return_value=False):
+            follow_users(self.user, [target.pk])
+            self.assertEqual(follow_users(self.user, [target.pk])[0], [])
+            self.assertEqual(unfollow_users(self.user, [target.pk, target.pk]), [target.pk])
+            self.assertEqual(unfollow_users(self.user, [target.pk]), [])
+        target.refresh_from_db()
+        self.assertEqual(target.follower_count, 0)
+
+    def test_unfollowing_twice_counts_once_and_never_goes_negative(self):
+        target = self.others[0]
+        self.client.post(f'/api/follow/{target.pk}/')
+        CustomUser.objects.filter(pk=target.pk).update(follower_count=0)  # drifted counter
+        for _ in range(2):
+            self.client.post(f'/api/unfollow/{target.pk}/')
+
+        target.refresh_from_db()
+        self.user.refresh_from_db()
+        self.assertEqual(target.follower_count, 0)
+        self.assertEqual(self.user.following_count, 0)
+
+    def test_suggestions_rank_friends_of_friends_first(self):
+        friend, friend_of_friend = self.others[0], self.others[1]
+        self.client.post(f'/api/follow/{friend.pk}/')
+        friend_of_friend.followers.add(friend)
+
+        response = self.client.get('/api/follow/suggestions/')
+
+        self.assertEqual(response.data[0]['id'], friend_of_friend.pk)
+        self.assertEqual(response.data[0]['mutual_count'], 1)
+        self.assertNotIn(friend.pk, [row['id'] for row in response.data])
+
+    def test_suggestions_are_cached_until_the_user_follows(self):
+        self.client.get('/api/follow/suggestions/')
+        with self.assertNumQueries(0):
+            self.client.get('/api/follow/suggestions/')
+
+        self.client.post(f'/api/follow/{self.others[0].pk}/')
+        response = self.client.get('/api/follow/suggestions/')
+        self.assertNotIn(self.others[0].pk, [row['id'] for row in response.data])
+
+
+class FollowListTests(APITestCase):
+    def setUp(self):
+        self.star = CustomUser.objects.create_user(username='star', password='pass-12345')
+        self.fans = [CustomUser.objects.create_user(username=f'fan{i}') for i in range(5)]
+        for fan in self.fans:
+            self.client.force_authenticate(fan)
+            self.client.post(f'/api/follow/{self.star.pk}/')
+        self.star.refresh_from_db()
+        self.client.force_authenticate(self.star)
+
+    def test_followers_are_keyset_paginated_newest_first(self):
+        seen = []
+        url = f'/api/accounts/{self.star.pk}/followers/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(row['username'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, [fan.username for fan in reversed(self.fans)])
+
+    def test_following_lists_followed_accounts(self):
+        response = self.client.get(f'/api/accounts/{self.fans[0].pk}/following/')
+        self.assertEqual(response.data['results'], [{'id': self.star.pk, 'username': 'star', 'avatar': None}])
+
+    def test_profile_no_longer_embeds_the_graph(self):
+        response = self.client.get('/api/profile/')
+        self.assertNotIn('followers', response.data)
+        self.assertEqual(response.data['follower_count'], 5)
+
+
+class UsernameAutocompleteTests(APITestCase):
+    def setUp(self):
+        for name in ['Alice', 'alina', 'al_bundy', 'bob', 'malik']:
+            CustomUser.objects.create_user(username=name)
+        self.client.force_authenticate(CustomUser.objects.get(username='bob'))
+
+    def test_prefix_match_is_case_insensitive_and_ordered(self):
+        response = self.client.get('/api/accounts/autocomplete/?q=AL')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['username'] for row in response.data], ['al_bundy', 'Alice', 'alina'])
+
+    def test_limit_and_wildcards(self):
+        response = self.client.get('/api/accounts/autocomplete/?q=al&limit=1')
+        self.assertEqual(len(response.data), 1)
+        # '_' is a literal, not a LIKE wildcard
+        response = self.client.get('/api/accounts/autocomplete/?q=al_')
+        self.assertEqual([row['username'] for row in response.data], ['al_bundy'])
+
+    def test_empty_query_returns_nothing(self):
+        self.assertEqual(self.client.get('/api/accounts/autocomplete/?q=').data, [])
@@ -14,4 +14,16 @@ urlpatterns = [
     # New Follow/Unfollow Endpoints (Task 2)
     path('follow/<int:user_id>/', views.FollowUserView.as_view(), name='follow-user'),
     path('unfollow/<int:user_id>/', views.UnfollowUserView.as_view(), name='unfollow-user'),
+
+    # Bulk follow/unfollow (body: {"user_ids": [...]}) and suggestions for onboarding
+    path('follow/bulk/', views.BulkFollowView.as_view(), name='follow-bulk'),
+    path('unfollow/bulk/', views.BulkUnfollowView.as_view(), name='unfollow-bulk'),
+    path('follow/suggestions/', views.FollowSuggestionsView.as_view(), name='follow-suggestions'),
+
+    # Paginated follow graph (?cursor= to continue), instead of inline profile lists
+    path('accounts/<int:user_id>/followers/', views.FollowListView.as_view(listed='follower'), name='user-followers'),
+    path('accounts/<int:user_id>/following/', views.FollowListView.as_view(listed='followee'), name='user-following'),
+
+    # Username prefix search for search-as-you-type (?q=)
+    path('accounts/autocomplete/', views.UsernameAutocompleteView.as_view(), name='username-autocomplete'),
 ]
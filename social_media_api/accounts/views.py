@@ -5,9 +5,14 @@ from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from .serializers import CustomUserRegistrationSerializer, CustomUserSerializer
-from .models import CustomUser
-from notifications.models import Notification # New: Import Notification model
+from .serializers import (
+    CustomUserRegistrationSerializer, CustomUserSerializer,
+    BulkFollowSerializer, FollowSuggestionSerializer, UserSummarySerializer,
+)
+from .models import CustomUser, Follow, USER_SUMMARY_FIELDS
+from social_media_api.pagination import FollowPagination
+from .follows import follow_users, unfollow_users, follow_suggestions
+from .autocomplete import autocomplete_usernames, DEFAULT_LIMIT, MAX_LIMIT
 
 # --- User Registration and Login Views (Task 0) ---
 
@@ -50,6 +55,7 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 # --- Follow Management Views (Task 2 & 3: Notification Added) ---
+# The writes themselves live in accounts.follows so single and bulk follows share them.
 
 class FollowUserView(generics.GenericAPIView):
     """Allows an authenticated user to follow another user."""
@@ -62,16 +68,8 @@ class FollowUserView(generics.GenericAPIView):
         if user_to_follow == current_user:
             return Response({"detail": "Cannot follow yourself."}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Add the relationship
-        current_user.following.add(user_to_follow)
-        
-        # Notification Generation (Step 3)
-        Notification.objects.create(
-            recipient=user_to_follow, 
-            actor=current_user, 
-            verb='started following', 
-            target=user_to_follow # Target is the User who was followed
-        )
+        # Add the relationship, counters, timeline backfill and notification
+        follow_users(current_user, [user_to_follow.pk])
         
         return Response(
             {"detail": f"Now following {user_to_follow.username}"}, 
@@ -87,17 +85,92 @@ class UnfollowUserView(generics.GenericAPIView):
         user_to_unfollow = get_object_or_404(CustomUser, pk=user_id)
         current_user = request.user
         
-        # Remove the relationship
-        current_user.following.remove(user_to_unfollow)
-        
-        # Optional: Delete Notification on unfollow
-        Notification.objects.filter(
-            actor=current_user, 
-            recipient=user_to_unfollow, 
-            verb='started following'
-        ).delete()
+        # Remove the relationship, counters, timeline entries and notification
+        unfollow_users(current_user, [user_to_unfollow.pk])
         
         return Response(
             {"detail": f"Unfollowed {user_to_unfollow.username}"}, 
             status=status.HTTP_200_OK
         )
+
+
+class BulkFollowView(generics.GenericAPIView):
+    """Follows every user in ``user_ids`` with a fixed number of queries."""
+    serializer_class = BulkFollowSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, format=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        followed, already_following, not_found = follow_users(
+            request.user, serializer.validated_data['user_ids']
+        )
+        return Response({
+            'followed': followed,
+            'already_following': already_following,
+            'not_found': not_found,
+        }, status=status.HTTP_200_OK)
+
+
+class BulkUnfollowView(generics.GenericAPIView):
+    """Unfollows every user in ``user_ids`` with a fixed number of queries."""
+    serializer_class = BulkFollowSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, format=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        unfollowed = unfollow_users(request.user, serializer.validated_data['user_ids'])
+        return Response({'unfollowed': unfollowed}, status=status.HTTP_200_OK)
+
+
+class FollowSuggestionsView(generics.ListAPIView):
+    """Suggests accounts to follow (friends of friends, then popular accounts)."""
+    serializer_class = FollowSuggestionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        return follow_suggestions(self.request.user)
+
+
+class FollowListView(generics.ListAPIView):
+    """
+    Lists the accounts following a user (or followed by them), newest first.
+    Keyset-paginated on the follow row id with ?cursor=, so no COUNT or OFFSET.
+    """
+    serializer_class = UserSummarySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = FollowPagination
+    # Side of the edge to list: 'follower' for /followers/, 'followee' for /following/
+    listed = 'follower'
+
+    def get_queryset(self):
+        user = get_object_or_404(CustomUser.objects.only('id'), pk=self.kwargs['user_id'])
+        anchor = 'followee' if self.listed == 'follower' else 'follower'
+        return (
+            Follow.objects.filter(**{anchor: user})
+            .select_related(self.listed)
+            .only('id', self.listed, *(f'{self.listed}__{field}' for field in USER_SUMMARY_FIELDS))
+        )
+
+    def list(self, request, *args, **kwargs):
+        links = self.paginate_queryset(self.get_queryset())
+        serializer = self.get_serializer([getattr(link, self.listed) for link in links], many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class UsernameAutocompleteView(generics.ListAPIView):
+    """Usernames starting with ?q= (case-insensitive), for search-as-you-type; ?limit= up to 25."""
+    serializer_class = UserSummarySerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = None
+
+    def get_queryset(self):
+        try:
+            limit = int(self.request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            limit = DEFAULT_LIMIT
+        return autocomplete_usernames(self.request.query_params.get('q', ''), max(1, min(limit, MAX_LIMIT)))
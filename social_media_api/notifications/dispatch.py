@@ -0,0 +1,322 @@
+"""
+Notification dispatch pipeline.
+
+Request handlers describe notifications as small events (``notify`` / ``retract``)
+and hand them to a dispatch backend instead of writing Notification rows (and
+resolving ContentTypes) inline. Workers apply events in batches: consecutive
+creations are stored together, rolled up per (recipient, verb, target) by
+notifications.rollup.
+
+Backends, selected with ``NOTIFICATION_DISPATCH['BACKEND']``:
+
+* ``inline``   - apply events immediately in the calling thread (the default).
+* ``thread``   - in-process queues drained by a pool of worker threads. Events are
+                 routed by recipient so each recipient's events stay in order.
+                 Queued events are lost when the process exits or is recycled.
+* ``database`` - events are stored as NotificationJob rows in the request's
+                 transaction, so they survive a process restart, and drained by
+                 a worker thread or ``manage.py process_notification_jobs``.
+
+When a batch fails, its events are retried one by one so a single bad event
+cannot hold up the rest. A database job that keeps failing is kept with its
+error and, after MAX_ATTEMPTS, dead-lettered (failed_at set, no longer claimed;
+``process_notification_jobs --retry-failed`` puts such jobs back in the queue).
+"""
+import atexit
+import logging
+import queue
+import threading
+import traceback
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import NotificationJob
+from .rollup import create_notifications, retract_notification
+
+logger = logging.getLogger(__name__)
+
+CREATE = 'create'
+RETRACT = 'retract'
+
+DEFAULTS = {
+    'BACKEND': 'inline',
+    'WORKERS': 2,
+    'BATCH_SIZE': 200,
+    # Seconds a database worker sleeps when the job table is empty
+    'POLL_INTERVAL': 1.0,
+    # Failed runs after which a database job is dead-lettered
+    'MAX_ATTEMPTS': 5,
+}
+
+
+def dispatch_settings():
+    return {**DEFAULTS, **getattr(settings, 'NOTIFICATION_DISPATCH', {})}
+
+
+def make_event(action, recipient_id, actor_id, verb, target_model, object_id):
+    """A JSON-serializable notification event; the target is stored as an 'app_label.model' label."""
+    return {
+        'action': action,
+        'recipient_id': recipient_id,
+        'actor_id': actor_id,
+        'verb': verb,
+        'target': target_model._meta.label_lower,
+        'object_id': object_id,
+    }
+
+
+# --- Applying events ---
+
+def apply_events(events):
+    """Write a batch of events, storing runs of consecutive creations together."""
+    with transaction.atomic():
+        pending = []
+        for event in events:
+            if event['action'] == CREATE:
+                pending.append(event)
+                continue
+            # Flush earlier creations first so a like followed by an unlike nets out
+            if pending:
+                create_notifications(pending)
+                pending = []
+            retract_notification(event)
+        if pending:
+            create_notifications(pending)
+
+
+def apply_isolated(events):
+    """
+    Apply events as one batch, or one by one if the batch fails, so a bad event
+    only loses itself. Returns {index: error message} for the events that failed.
+    """
+    try:
+        apply_events(events)
+        return {}
+    except Exception:
+        if len(events) == 1:
+            logger.exception('Failed to apply notification event %r', events[0])
+            return {0: _describe_error()}
+        logger.warning('Failed to apply %d notification events; retrying them one by one', len(events))
+
+    failures = {}
+    for index, event in enumerate(events):
+        try:
+            # apply_events() runs in a savepoint, so a failure undoes only this event
+            apply_events([event])
+        except Exception:
+            logger.exception('Failed to apply notification event %r', event)
+            failures[index] = _describe_error()
+    return failures
+
+
+def _describe_error():
+    return traceback.format_exc(limit=5)
+
+
+# --- Backends ---
+
+class InlineBackend:
+    """Applies events synchronously, inside the caller's transaction."""
+
+    def enqueue(self, events):
+        apply_events(events)
+
+    def flush(self):
+        pass
+
+
+class ThreadPoolBackend:
+    """
+    In-process queues drained by daemon worker threads. Each recipient is
+    pinned to one worker so their events are applied in order.
+    """
+
+    def __init__(self, workers, batch_size):
+        self.batch_size = batch_size
+        self.queues = [queue.Queue() for _ in range(workers)]
+        self.threads = []
+        for index, events in enumerate(self.queues):
+            thread = threading.Thread(
+                target=self.run, args=(events,), name=f'notification-worker-{index}', daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def enqueue(self, events):
+        # Only hand events to the workers once the triggering write has committed
+        transaction.on_commit(lambda: self.put(events))
+
+    def put(self, events):
+        for event in events:
+            self.queues[event['recipient_id'] % len(self.queues)].put(event)
+
+    def run(self, events):
+        while True:
+            batch = [events.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(events.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                # In-memory events have nowhere to wait for a retry; failures are only logged
+                apply_isolated(batch)
+            except Exception:
+                logger.exception('Failed to apply %d notification events', len(batch))
+            finally:
+                close_old_connections()
+                for _ in batch:
+                    events.task_done()
+
+    def flush(self):
+        """Block until every queued event has been applied."""
+        for events in self.queues:
+            events.join()
+
+
+class DatabaseBackend:
+    """
+    Stores events as NotificationJob rows in the caller's transaction, so queued
+    events survive a restart. A local worker thread is woken after commit to
+    drain the table; ``process_notification_jobs`` drains it out of process.
+    With WORKERS set to 0 no local thread is started and only the command runs jobs.
+    """
+
+    def __init__(self, workers, batch_size, poll_interval, max_attempts):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.wakeup = threading.Event()
+        if workers:
+            # One local drainer keeps each recipient's events in order
+            self.thread = threading.Thread(target=self.run, name='notification-job-worker', daemon=True)
+            self.thread.start()
+
+    def enqueue(self, events):
+        NotificationJob.objects.bulk_create([NotificationJob(payload=event) for event in events])
+        transaction.on_commit(self.wakeup.set)
+
+    def run(self):
+        while True:
+            # Poll as well, to pick up jobs left over from a previous process
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+            try:
+                while process_jobs(self.batch_size, self.max_attempts):
+                    pass
+            except Exception:
+                logger.exception('Failed to process notification jobs')
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        while process_jobs(self.batch_size, self.max_attempts):
+            pass
+
+
+def process_jobs(batch_size, max_attempts=None):
+    """
+    Claim and apply up to batch_size queued jobs in one transaction.
+    Returns the number of jobs processed, failed ones included (0 when no job is queued).
+
+    Jobs whose event fails are put back with attempts and last_error updated,
+    and dead-lettered after max_attempts (MAX_ATTEMPTS by default).
+    """
+    if max_attempts is None:
+        max_attempts = dispatch_settings()['MAX_ATTEMPTS']
+    with transaction.atomic():
+        # skip_locked lets several workers drain the table concurrently (ignored on SQLite)
+        jobs = list(
+            NotificationJob.objects.select_for_update(skip_locked=True)
+            .filter(failed_at__isnull=True).order_by('pk')[:batch_size]
+        )
+        if not jobs:
+            return 0
+
+        # Deleting first claims the rows: on backends without row locks (SQLite)
+        # a worker that lost the race finds nothing left to delete and backs off.
+        claimed, _ = NotificationJob.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+        if claimed != len(jobs):
+            transaction.set_rollback(True)
+            return 0
+
+        failures = apply_isolated([job.payload for job in jobs])
+        if failures:
+            now = timezone.now()
+            retried = []
+            for index, error in failures.items():
+                job = jobs[index]
+                job.attempts += 1
+                job.last_error = error
+                if job.attempts >= max_attempts:
+                    job.failed_at = now
+                retried.append(job)
+            # Same ids, so retries keep their place in the queue
+            NotificationJob.objects.bulk_create(retried)
+    return len(jobs)
+
+
+def retry_failed_jobs():
+    """Put dead-lettered jobs back in the queue. Returns how many were requeued."""
+    return NotificationJob.objects.filter(failed_at__isnull=False).update(failed_at=None, attempts=0)
+
+
+# --- Public API ---
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            options = dispatch_settings()
+            name = options['BACKEND']
+            if name == 'inline':
+                _backend = InlineBackend()
+            elif name == 'thread':
+                _backend = ThreadPoolBackend(options['WORKERS'], options['BATCH_SIZE'])
+            elif name == 'database':
+                _backend = DatabaseBackend(
+                    options['WORKERS'], options['BATCH_SIZE'], options['POLL_INTERVAL'], options['MAX_ATTEMPTS'],
+                )
+            else:
+                raise ValueError(f'Unknown notification dispatch backend: {name!r}')
+        return _backend
+
+
+@receiver(setting_changed)
+def _reset_backend(setting, **kwargs):
+    global _backend
+    if setting == 'NOTIFICATION_DISPATCH':
+        _backend = None
+
+
+@atexit.register
+def _flush_on_exit():
+    # Database jobs are durable, so only the in-memory queues need draining
+    if isinstance(_backend, ThreadPoolBackend):
+        try:
+            _backend.flush()
+        except Exception:
+            logger.exception('Failed to flush notification events at exit')
+
+
+def enqueue(events):
+    if events:
+        get_backend().enqueue(list(events))
+
+
+def notify(recipient_id, actor_id, verb, target_model, object_id):
+    """Queue a notification for recipient that actor performed verb on the target."""
+    enqueue([make_event(CREATE, recipient_id, actor_id, verb, target_model, object_id)])
+
+
+def retract(recipient_id, actor_id, verb, target_model, object_id):
+    """Queue removal of a notification created by notify() with the same arguments."""
+    enqueue([make_event(RETRACT, recipient_id, actor_id, verb, target_model, object_id)])
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.dispatch import dispatch_settings, process_jobs, retry_failed_jobs
+from notifications.retention import maybe_prune
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply queued notification events stored by the database dispatch backend. '
+        'Runs until the queue is empty, or forever with --loop (which also prunes '
+        'expired notifications every NOTIFICATION_RETENTION["INTERVAL"] seconds).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Jobs applied per transaction.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs.')
+        parser.add_argument(
+            '--retry-failed', action='store_true', help='Requeue dead-lettered jobs before processing.',
+        )
+
+    def handle(self, *args, **options):
+        dispatch = dispatch_settings()
+        batch_size = options['batch_size'] or dispatch['BATCH_SIZE']
+        if options['retry_failed']:
+            self.stdout.write(f'Requeued {retry_failed_jobs()} failed notification jobs.')
+
+        total = 0
+        while True:
+            processed = process_jobs(batch_size, dispatch['MAX_ATTEMPTS'])
+            total += processed
+            if processed:
+                continue
+            if not options['loop']:
+                break
+            # Idle long-running workers double as the retention scheduler
+            maybe_prune()
+            time.sleep(dispatch['POLL_INTERVAL'])
+
+        self.stdout.write(f'Processed {total} notification jobs.')
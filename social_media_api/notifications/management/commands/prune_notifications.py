@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from notifications.retention import expired_notifications, prune_notifications, retention_settings
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete read notifications older than the retention period in bounded batches, '
+        'or move them to ArchivedNotification with --archive. Unread notifications are kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Keep read notifications newer than this.')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows removed per transaction.')
+        parser.add_argument('--max-batches', type=int, default=None, help='Stop after this many batches.')
+        parser.add_argument('--archive', action='store_true', default=None, help='Copy rows to the archive table first.')
+        parser.add_argument('--dry-run', action='store_true', help='Count expired notifications without removing them.')
+
+    def handle(self, *args, **options):
+        days = retention_settings()['DAYS'] if options['days'] is None else options['days']
+
+        if options['dry_run']:
+            self.stdout.write(f'Found {expired_notifications(days).count()} expired notifications.')
+            return
+
+        pruned = prune_notifications(
+            days=days, batch_size=options['batch_size'],
+            archive=options['archive'], max_batches=options['max_batches'],
+        )
+        action = 'Archived' if options['archive'] or retention_settings()['ARCHIVE'] else 'Deleted'
+        self.stdout.write(f'{action} {pruned} notifications older than {days} days.')
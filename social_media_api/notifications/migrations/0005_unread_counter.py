@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:33
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_unread_counters(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    Notification = apps.get_model('notifications', 'Notification')
+    CustomUser.objects.update(unread_notification_count=Coalesce(Subquery(
+        Notification.objects.filter(recipient=OuterRef('pk'), is_read=False).order_by()
+        .values('recipient').annotate(total=Count('id')).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_unread_counter'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('notifications', '0004_aggregation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', '-timestamp'], name='notif_recipient_unread'),
+        ),
+        migrations.RunPython(populate_unread_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def link_sampled_actors(apps, schema_editor):
+    # Older rollups only remember their latest and sampled actors; link those,
+    # one event each. Retracting anyone else from such a row is a no-op.
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationActor = apps.get_model('notifications', 'NotificationActor')
+    links = []
+    for pk, actor_id, samples in Notification.objects.values_list('pk', 'actor_id', 'sample_actors').iterator():
+        actor_ids = {actor_id} | {sample['id'] for sample in samples or []}
+        links.extend(NotificationActor(notification_id=pk, actor_id=actor) for actor in actor_ids)
+        if len(links) >= 1000:
+            NotificationActor.objects.bulk_create(links, ignore_conflicts=True)
+            links = []
+    NotificationActor.objects.bulk_create(links, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_job_attempts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationActor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('events', models.PositiveIntegerField(default=1)),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actor_links', to='notifications.notification')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('notification', 'actor'), name='notif_actor_unique')],
+            },
+        ),
+        migrations.RunPython(link_sampled_actors, migrations.RunPython.noop),
+    ]
@@ -15,7 +15,9 @@ class Notification(models.Model):
     recipient = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name='notifications'
+        related_name='notifications',
+        # Covered by the (recipient, -timestamp, -id) index below
+        db_index=False,
     )
 
     # A short phrase describing the action (e.g., 'liked', 'commented on', 'followed')
@@ -27,6 +29,13 @@ class Notification(models.Model):
     # Status to track if the notification has been viewed
     is_read = models.BooleanField(default=False)
 
+    # --- Aggregation (notifications.rollup) ---
+    # Number of actors rolled into this notification; `actor` is the latest one
+    actor_count = models.PositiveIntegerField(default=1)
+
+    # A few recent actors as [{"id": ..., "username": ...}], newest first
+    sample_actors = models.JSONField(default=list, blank=True)
+
     # --- Generic Foreign Key Fields (The Target Object) ---
     # This allows the notification to point to ANY model (Post, Comment, etc.)
 
@@ -42,6 +51,91 @@ class Notification(models.Model):
     class Meta:
         # Notifications ordered by newest first
         ordering = ['-timestamp']
+        # Composite index for keyset pagination of a recipient's notifications
+        indexes = [
+            models.Index(fields=['recipient', '-timestamp', '-id'], name='notif_recipient_recent'),
+            # Partial index covering only unread rows (badge, mark-all-read, rollups)
+            models.Index(
+                fields=['recipient', '-timestamp'],
+                condition=models.Q(is_read=False),
+                name='notif_recipient_unread',
+            ),
+            # Partial index over read rows only, walked by notifications.retention
+            models.Index(
+                fields=['timestamp', 'id'],
+                condition=models.Q(is_read=True),
+                name='notif_read_expiry',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.actor.username} {self.verb} {self.target} received by {self.recipient.username}'
+
+
+class NotificationActor(models.Model):
+    """
+    One distinct actor rolled into an aggregated Notification, with the number
+    of their events it holds (e.g. five comments from the same user). A rollup's
+    actor_count is the number of these rows.
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='actor_links')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    events = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['notification', 'actor'], name='notif_actor_unique'),
+        ]
+
+    def __str__(self):
+        return f'Actor {self.actor_id} of notification {self.notification_id}'
+
+
+# --- Retention (notifications.retention) ---
+class ArchivedNotification(models.Model):
+    """
+    Read notifications moved out of the hot table by prune_notifications --archive.
+    Keeps the original primary key; nothing in the API reads from it.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+', db_index=False)
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    verb = models.CharField(max_length=255)
+    timestamp = models.DateTimeField()
+    actor_count = models.PositiveIntegerField(default=1)
+    sample_actors = models.JSONField(default=list, blank=True)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name='+')
+    object_id = models.PositiveIntegerField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['recipient', '-timestamp'], name='notif_archive_recipient'),
+        ]
+
+    def __str__(self):
+        return f'Archived notification {self.pk}'
+
+
+# --- Durable queue for notifications.dispatch (database backend) ---
+class NotificationJob(models.Model):
+    # A serialized notification event (see notifications.dispatch.make_event)
+    payload = models.JSONField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Failed runs so far and the error of the latest one
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Set once the job has failed MAX_ATTEMPTS times; such jobs are no longer claimed
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Jobs are claimed oldest first
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(failed_at__isnull=True), name='notifications_job_pending'),
+        ]
+
+    def __str__(self):
+        return f'{self.payload.get("action")} notification job {self.pk}'
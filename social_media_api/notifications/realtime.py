@@ -0,0 +1,218 @@
+"""
+Real-time notification delivery.
+
+New and rolled-up Notification rows are published, after commit, to a broker
+keyed by recipient. The Server-Sent Events endpoint (notifications.views.
+notification_stream) subscribes connected clients to their own channel, so
+clients no longer poll NotificationListView.
+
+The broker is pluggable through the NOTIFICATION_BROKER setting (a dotted path
+to a BaseBroker subclass):
+
+* InMemoryBroker fans messages out inside one process. It never sees
+  notifications applied in another process, in particular by
+  ``manage.py process_notification_jobs`` (the 'database' dispatch backend),
+  or by another web worker. It suits a single ASGI worker with the 'inline' or
+  'thread' backend, and tests.
+* RedisBroker goes through Redis pub/sub (NOTIFICATION_BROKER_URL), so every
+  process publishes to and streams from the same channels. It needs the redis
+  package.
+
+The stream holds its connection open indefinitely, so it is only served under
+ASGI; WSGI requests get a 501 (see notification_stream).
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class BaseBroker:
+    """Pub/sub interface used to push notifications to connected recipients."""
+
+    def publish(self, recipient_id, message):
+        """Deliver message (a JSON-serializable dict) to every subscriber of recipient_id."""
+        raise NotImplementedError
+
+    def subscribe(self, recipient_id):
+        """
+        Async context manager yielding an asyncio.Queue that receives the
+        recipient's messages until the context exits.
+        """
+        raise NotImplementedError
+
+
+class InMemoryBroker(BaseBroker):
+    """
+    Process-local broker; publish() is thread-safe and may be called from any
+    thread, but only subscribers in the same process receive the messages.
+    """
+
+    # Messages buffered per subscriber before the oldest are dropped
+    max_queue_size = 100
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def publish(self, recipient_id, message):
+        with self.lock:
+            subscribers = list(self.subscribers.get(recipient_id, ()))
+        for loop, messages in subscribers:
+            loop.call_soon_threadsafe(self._deliver, messages, message)
+
+    def _deliver(self, messages, message):
+        _deliver_latest(messages, message, self.max_queue_size)
+
+    def subscribe(self, recipient_id):
+        return _Subscription(self, recipient_id)
+
+
+class _Subscription:
+    """Registers a queue with an InMemoryBroker for the duration of an ``async with`` block."""
+
+    def __init__(self, broker, recipient_id):
+        self.broker = broker
+        self.recipient_id = recipient_id
+
+    async def __aenter__(self):
+        self.subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.broker.max_queue_size))
+        with self.broker.lock:
+            self.broker.subscribers.setdefault(self.recipient_id, set()).add(self.subscriber)
+        return self.subscriber[1]
+
+    async def __aexit__(self, *exc_info):
+        with self.broker.lock:
+            channel = self.broker.subscribers.get(self.recipient_id, set())
+            channel.discard(self.subscriber)
+            if not channel:
+                self.broker.subscribers.pop(self.recipient_id, None)
+
+
+def _deliver_latest(messages, message, max_size):
+    # Slow consumers lose their oldest messages rather than growing without bound
+    if messages.qsize() >= max_size:
+        messages.get_nowait()
+    messages.put_nowait(message)
+
+
+class RedisBroker(BaseBroker):
+    """
+    Cross-process broker over Redis pub/sub: one channel per recipient. Each
+    open stream holds its own subscriber connection.
+    """
+    channel_prefix = 'notifications:'
+    max_queue_size = 100
+
+    def __init__(self):
+        try:
+            import redis  # noqa: F401
+        except ImportError:
+            raise ImproperlyConfigured('RedisBroker needs the redis package (pip install redis).')
+        self.url = getattr(settings, 'NOTIFICATION_BROKER_URL', 'redis://localhost:6379/0')
+        self.client = self.sync_client()
+
+    def sync_client(self):
+        import redis
+        return redis.Redis.from_url(self.url)
+
+    def async_client(self):
+        import redis.asyncio
+        return redis.asyncio.Redis.from_url(self.url)
+
+    def channel(self, recipient_id):
+        return f'{self.channel_prefix}{recipient_id}'
+
+    def publish(self, recipient_id, message):
+        self.client.publish(self.channel(recipient_id), json.dumps(message, cls=DjangoJSONEncoder))
+
+    def subscribe(self, recipient_id):
+        return _RedisSubscription(self, recipient_id)
+
+
+class _RedisSubscription:
+    """Subscribes to a recipient's Redis channel and feeds its messages into a queue."""
+
+    def __init__(self, broker, recipient_id):
+        self.broker = broker
+        self.channel = broker.channel(recipient_id)
+
+    async def __aenter__(self):
+        self.client = self.broker.async_client()
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        # Subscribed before returning, so nothing published afterwards is missed
+        await self.pubsub.subscribe(self.channel)
+        self.messages = asyncio.Queue()
+        self.reader = asyncio.create_task(self._read())
+        return self.messages
+
+    async def _read(self):
+        async for item in self.pubsub.listen():
+            if item['type'] == 'message':
+                _deliver_latest(self.messages, json.loads(item['data']), self.broker.max_queue_size)
+
+    async def __aexit__(self, *exc_info):
+        self.reader.cancel()
+        try:
+            await self.reader
+        except asyncio.CancelledError:
+            pass
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            path = getattr(settings, 'NOTIFICATION_BROKER', 'notifications.realtime.InMemoryBroker')
+            _broker = import_string(path)()
+        return _broker
+
+
+@receiver(setting_changed)
+def _reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'NOTIFICATION_BROKER':
+        _broker = None
+
+
+def notification_message(notification):
+    """The payload pushed to clients; built from the row alone, without extra queries."""
+    return {
+        'id': notification.pk,
+        'actor_id': notification.actor_id,
+        'actor_count': notification.actor_count,
+        'sample_actors': notification.sample_actors,
+        'verb': notification.verb,
+        'target_type': ContentType.objects.get_for_id(notification.content_type_id).model,
+        'target_id': notification.object_id,
+        'timestamp': notification.timestamp.isoformat(),
+        'is_read': notification.is_read,
+    }
+
+
+def publish_notifications(notifications):
+    """Publish the given rows once the surrounding transaction commits."""
+    messages = [(row.recipient_id, notification_message(row)) for row in notifications]
+    if not messages:
+        return
+
+    def publish():
+        broker = get_broker()
+        for recipient_id, message in messages:
+            broker.publish(recipient_id, message)
+
+    transaction.on_commit(publish)
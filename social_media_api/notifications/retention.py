@@ -0,0 +1,90 @@
+"""
+Notification retention.
+
+Read notifications older than NOTIFICATION_RETENTION['DAYS'] are deleted, or
+moved to ArchivedNotification when ARCHIVE is set. Work is done in bounded
+batches (one short transaction each) that walk the partial index on read rows
+in (timestamp, id) order, so pruning never holds long locks on the hot table.
+Unread rows are never touched, so the unread counters stay correct.
+
+Run it from cron with ``manage.py prune_notifications``, or let a long-running
+``process_notification_jobs --loop`` worker call maybe_prune() between polls.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedNotification, Notification
+
+DEFAULTS = {
+    'DAYS': 90,
+    'ARCHIVE': False,
+    'BATCH_SIZE': 1000,
+    # Seconds between prunes run by the scheduling hook; 0 disables it
+    'INTERVAL': 60 * 60,
+}
+
+ARCHIVED_FIELDS = (
+    'id', 'recipient_id', 'actor_id', 'verb', 'timestamp', 'actor_count',
+    'sample_actors', 'content_type_id', 'object_id',
+)
+
+
+def retention_settings():
+    return {**DEFAULTS, **getattr(settings, 'NOTIFICATION_RETENTION', {})}
+
+
+def expired_notifications(days):
+    cutoff = timezone.now() - timedelta(days=days)
+    return Notification.objects.filter(is_read=True, timestamp__lt=cutoff)
+
+
+def prune_batch(days, batch_size, archive):
+    """Delete (or archive) one batch of expired read notifications; returns the row count."""
+    with transaction.atomic():
+        expired = expired_notifications(days).order_by('timestamp', 'id')
+        if archive:
+            rows = list(expired.values(*ARCHIVED_FIELDS)[:batch_size])
+            ids = [row['id'] for row in rows]
+            ArchivedNotification.objects.bulk_create(
+                [ArchivedNotification(**row) for row in rows], ignore_conflicts=True,
+            )
+        else:
+            ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if ids:
+            Notification.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def prune_notifications(days=None, batch_size=None, archive=None, max_batches=None):
+    """Prune expired read notifications batch by batch; returns the total row count."""
+    options = retention_settings()
+    days = options['DAYS'] if days is None else days
+    batch_size = batch_size or options['BATCH_SIZE']
+    archive = options['ARCHIVE'] if archive is None else archive
+
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        pruned = prune_batch(days, batch_size, archive)
+        total += pruned
+        batches += 1
+        if pruned < batch_size:
+            break
+    return total
+
+
+_last_run = None
+
+
+def maybe_prune(max_batches=10):
+    """Scheduling hook: prune at most once per INTERVAL seconds, a few batches at a time."""
+    global _last_run
+    interval = retention_settings()['INTERVAL']
+    if not interval or (_last_run is not None and time.monotonic() - _last_run < interval):
+        return 0
+    _last_run = time.monotonic()
+    return prune_notifications(max_batches=max_batches)
@@ -0,0 +1,228 @@
+"""
+Notification storage with aggregation ("alice and 41 others liked your post").
+
+Events with the same (recipient, verb, target) that arrive within
+NOTIFICATION_AGGREGATION['WINDOW'] seconds of the group's latest activity are
+rolled up into one unread Notification row: the row is updated in place with a
+running actor_count and a few sample actors instead of a new row per event.
+
+Each rollup lists its distinct actors in NotificationActor, with how many of
+their events it holds. actor_count counts people, not events (five comments by
+one user are one actor), and a retraction only touches the row that holds the
+actor, leaving them on it until their last event there is retracted.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+from .models import Notification, NotificationActor
+from .realtime import publish_notifications
+from .unread import adjust_unread_counts
+
+DEFAULTS = {
+    'VERBS': ('liked', 'commented on', 'started following'),
+    # Seconds since the group's latest event during which new events join it
+    'WINDOW': 24 * 60 * 60,
+    'SAMPLE_SIZE': 3,
+}
+
+
+def aggregation_settings():
+    return {**DEFAULTS, **getattr(settings, 'NOTIFICATION_AGGREGATION', {})}
+
+
+def content_type_for(label):
+    app_label, model = label.split('.')
+    return ContentType.objects.get_by_natural_key(app_label, model)
+
+
+def group_key(event):
+    return (event['recipient_id'], event['verb'], event['target'], event['object_id'])
+
+
+def _open_groups(groups, since):
+    """
+    Unread rollup rows still accepting events for the given keys, fetched (and
+    locked) with one query. Returns {key: Notification}, keeping the newest row per key.
+    """
+    rows = (
+        Notification.objects.select_for_update()
+        .filter(
+            recipient_id__in={key[0] for key in groups},
+            verb__in={key[1] for key in groups},
+            object_id__in={key[3] for key in groups},
+            is_read=False,
+            timestamp__gte=since,
+        )
+        .order_by('-timestamp', '-id')
+    )
+    labels = {content_type_for(label).pk: label for label in {key[2] for key in groups}}
+    open_rows = {}
+    for row in rows:
+        key = (row.recipient_id, row.verb, labels.get(row.content_type_id), row.object_id)
+        if key in groups:
+            open_rows.setdefault(key, row)
+    return open_rows
+
+
+def create_notifications(events):
+    """Store creation events, rolling aggregatable verbs into existing rows."""
+    options = aggregation_settings()
+    now = timezone.now()
+    sample_size = options['SAMPLE_SIZE']
+
+    usernames = dict(
+        get_user_model().objects.filter(pk__in={event['actor_id'] for event in events})
+        .values_list('pk', 'username')
+    )
+
+    groups = {}
+    new_rows = []
+    for event in events:
+        if event['verb'] in options['VERBS']:
+            groups.setdefault(group_key(event), []).append(event)
+        else:
+            new_rows.append(Notification(
+                recipient_id=event['recipient_id'], actor_id=event['actor_id'], verb=event['verb'],
+                content_type=content_type_for(event['target']), object_id=event['object_id'],
+                sample_actors=[{'id': event['actor_id'], 'username': usernames.get(event['actor_id'])}],
+            ))
+
+    open_rows = _open_groups(groups, now - timedelta(seconds=options['WINDOW'])) if groups else {}
+    links = _actor_links(open_rows.values(), {event['actor_id'] for event in events}) if open_rows else {}
+    updated_rows = []
+    new_links = []
+    changed_links = []
+    for key, group_events in groups.items():
+        recipient_id, verb, target, object_id = key
+        # Newest actors first in the samples
+        samples = [
+            {'id': event['actor_id'], 'username': usernames.get(event['actor_id'])}
+            for event in reversed(group_events)
+        ]
+        latest_actor_id = group_events[-1]['actor_id']
+        actor_events = {}
+        for event in group_events:
+            actor_events[event['actor_id']] = actor_events.get(event['actor_id'], 0) + 1
+
+        row = open_rows.get(key)
+        if row is None:
+            row = Notification(
+                recipient_id=recipient_id, actor_id=latest_actor_id, verb=verb,
+                content_type=content_type_for(target), object_id=object_id,
+                actor_count=len(actor_events), sample_actors=_merge_samples(samples, [], sample_size),
+            )
+            new_rows.append(row)
+            new_links.extend(
+                NotificationActor(notification=row, actor_id=actor_id, events=count)
+                for actor_id, count in actor_events.items()
+            )
+            continue
+
+        # Update the rollup in place and move it to the top of the list
+        for actor_id, count in actor_events.items():
+            link = links.get((row.pk, actor_id))
+            if link is None:
+                new_links.append(NotificationActor(notification=row, actor_id=actor_id, events=count))
+                row.actor_count += 1
+            else:
+                link.events += count
+                changed_links.append(link)
+        row.actor_id = latest_actor_id
+        row.sample_actors = _merge_samples(samples, row.sample_actors, sample_size)
+        row.timestamp = now
+        updated_rows.append(row)
+
+    if updated_rows:
+        Notification.objects.bulk_update(updated_rows, ['actor', 'actor_count', 'sample_actors', 'timestamp'])
+    if changed_links:
+        NotificationActor.objects.bulk_update(changed_links, ['events'])
+    if new_rows:
+        Notification.objects.bulk_create(new_rows)
+        # Rolled-up rows were already unread; only new rows raise the badge
+        new_unread = {}
+        for row in new_rows:
+            new_unread[row.recipient_id] = new_unread.get(row.recipient_id, 0) + 1
+        adjust_unread_counts(new_unread)
+    if new_links:
+        # After the rows, whose ids the links of new rollups need
+        NotificationActor.objects.bulk_create(new_links)
+
+    # Push the new and refreshed rows to connected clients after commit
+    publish_notifications(updated_rows + new_rows)
+
+
+def _actor_links(rows, actor_ids):
+    """{(notification_id, actor_id): NotificationActor} for the given rollups and actors."""
+    return {
+        (link.notification_id, link.actor_id): link
+        for link in NotificationActor.objects.filter(notification__in=list(rows), actor_id__in=actor_ids)
+    }
+
+
+def _latest_samples(row, size):
+    """Sample actors of row rebuilt from its actor links, most recently added first."""
+    return [
+        {'id': actor_id, 'username': username}
+        for actor_id, username in row.actor_links.order_by('-id').values_list('actor_id', 'actor__username')[:size]
+    ]
+
+
+def _merge_samples(newest, existing, size):
+    merged = []
+    seen = set()
+    for sample in list(newest) + list(existing):
+        if sample['id'] not in seen:
+            seen.add(sample['id'])
+            merged.append(sample)
+    return merged[:size]
+
+
+def retract_notification(event):
+    """Undo one creation event: shrink its rollup row, or delete it when it was the last actor."""
+    content_type = content_type_for(event['target'])
+    rows = Notification.objects.filter(
+        recipient_id=event['recipient_id'], verb=event['verb'],
+        content_type=content_type, object_id=event['object_id'],
+    )
+    if event['verb'] not in aggregation_settings()['VERBS']:
+        unread = rows.filter(actor_id=event['actor_id'], is_read=False).delete()[0]
+        rows.filter(actor_id=event['actor_id']).delete()
+        adjust_unread_counts({event['recipient_id']: -unread})
+        return
+
+    # Only the newest rollup holding this actor is touched
+    actor_id = event['actor_id']
+    link = (
+        NotificationActor.objects.select_for_update()
+        .filter(notification__in=rows, actor_id=actor_id)
+        .select_related('notification')
+        .order_by('-notification__timestamp', '-notification__id')
+        .first()
+    )
+    if link is None:
+        return
+    if link.events > 1:
+        # The actor has other events in this rollup and stays on it
+        link.events -= 1
+        link.save(update_fields=['events'])
+        return
+
+    row = link.notification
+    if row.actor_count <= 1:
+        # Deletes the link with it
+        row.delete()
+        if not row.is_read:
+            adjust_unread_counts({row.recipient_id: -1})
+        return
+
+    link.delete()
+    row.actor_count -= 1
+    if any(sample['id'] == actor_id for sample in row.sample_actors):
+        row.sample_actors = _latest_samples(row, aggregation_settings()['SAMPLE_SIZE'])
+    if row.actor_id == actor_id and row.sample_actors:
+        row.actor_id = row.sample_actors[0]['id']
+    row.save(update_fields=['actor', 'actor_count', 'sample_actors'])
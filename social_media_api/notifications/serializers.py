@@ -1,10 +1,11 @@
+from django.contrib.contenttypes.models import ContentType
 from rest_framework import serializers
 from .models import Notification
-from accounts.serializers import CustomUserSerializer # Reuse CustomUserSerializer
+from accounts.serializers import UserSummarySerializer
 
 class NotificationSerializer(serializers.ModelSerializer):
-    # Display the actor's details
-    actor = CustomUserSerializer(read_only=True)
+    # Display the actor's id, username and avatar
+    actor = UserSummarySerializer(read_only=True)
     
     # Read-only field to clearly display the target object's type and ID
     target_type = serializers.SerializerMethodField()
@@ -12,13 +13,30 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Notification
-        fields = ('id', 'actor', 'verb', 'timestamp', 'is_read', 'target_type', 'target_id')
-        read_only_fields = ('actor', 'recipient', 'verb', 'timestamp', 'is_read')
+        fields = (
+            'id', 'actor', 'actor_count', 'sample_actors', 'verb', 'timestamp',
+            'is_read', 'target_type', 'target_id'
+        )
+        read_only_fields = ('actor', 'recipient', 'verb', 'timestamp', 'is_read', 'actor_count', 'sample_actors')
 
     def get_target_type(self, obj):
-        # Returns the name of the model (e.g., 'post', 'user')
-        return obj.content_type.model
+        # Returns the name of the model (e.g., 'post', 'user'); served from the ContentType cache
+        return ContentType.objects.get_for_id(obj.content_type_id).model
         
     def get_target_id(self, obj):
         # Returns the primary key of the target object
         return obj.object_id
+
+class MarkReadSerializer(serializers.Serializer):
+    """Selects notifications to mark as read: explicit ids, everything up to a timestamp, or all."""
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, max_length=1000)
+    before = serializers.DateTimeField(required=False)
+    all = serializers.BooleanField(required=False)
+
+    def validate(self, data):
+        chosen = [key for key in ('ids', 'before') if key in data]
+        if data.get('all'):
+            chosen.append('all')
+        if len(chosen) != 1:
+            raise serializers.ValidationError('Provide exactly one of "ids", "before" or "all".')
+        return data
@@ -1,3 +1,335 @@
-from django.test import TestCase
+import asyncio
+import gc
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from posts.models import Post
+from . import dispatch
+from .models import ArchivedNotification, Notification, NotificationJob
+from .realtime import InMemoryBroker, RedisBroker, get_broker
+from .views import _notification_events
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+User = get_user_model()
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.fan = User.objects.create_user(username='fan')
+        self.post = Post.objects.create(author=self.author, content='hello')
+
+    def test_inline_backend_applies_events_in_order(self):
+        dispatch.notify(self.author.pk, self.fan.pk, 'liked', Post, self.post.pk)
+        dispatch.retract(self.author.pk, self.fan.pk, 'liked', Post, self.post.pk)
+        dispatch.notify(self.author.pk, self.fan.pk, 'commented on', Post, self.post.pk)
+
+        self.assertEqual(list(Notification.objects.values_list('verb', flat=True)), ['commented on'])
+        self.assertEqual(Notification.objects.get().target, self.post)
+
+    @override_settings(NOTIFICATION_DISPATCH={'BACKEND': 'database', 'WORKERS': 0})
+    def test_database_backend_keeps_events_until_processed(self):
+        dispatch.notify(self.author.pk, self.fan.pk, 'liked', Post, self.post.pk)
+        self.assertEqual(NotificationJob.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+        # A fresh worker process picks up jobs queued before the "restart"
+        dispatch._backend = None
+        call_command('process_notification_jobs', stdout=StringIO())
+
+        self.assertFalse(NotificationJob.objects.exists())
+        self.assertEqual(Notification.objects.get().recipient, self.author)
+
+    @override_settings(NOTIFICATION_DISPATCH={'BACKEND': 'database', 'WORKERS': 0, 'MAX_ATTEMPTS': 2})
+    def test_poison_job_does_not_block_the_queue(self):
+        poison = NotificationJob.objects.create(
+            payload=dispatch.make_event(dispatch.CREATE, self.author.pk, self.fan.pk, 'liked', Post, self.post.pk)
+            | {'target': 'posts.missing'}
+        )
+        dispatch.notify(self.author.pk, self.fan.pk, 'liked', Post, self.post.pk)
+        dispatch.notify(self.author.pk, self.fan.pk, 'commented on', Post, self.post.pk)
+
+        with self.assertLogs('notifications.dispatch', 'WARNING'):
+            self.assertEqual(dispatch.process_jobs(10), 3)
+        self.assertEqual(set(Notification.objects.values_list('verb', flat=True)), {'liked', 'commented on'})
+        poison.refresh_from_db()
+        self.assertEqual(poison.attempts, 1)
+        self.assertIn('DoesNotExist', poison.last_error)
+        self.assertIsNone(poison.failed_at)
+
+        # The second failure dead-letters the job, which is then left alone
+        with self.assertLogs('notifications.dispatch', 'ERROR'):
+            call_command('process_notification_jobs', stdout=StringIO())
+        poison.refresh_from_db()
+        self.assertEqual(poison.attempts, 2)
+        self.assertIsNotNone(poison.failed_at)
+        self.assertEqual(dispatch.process_jobs(10), 0)
+
+        self.assertEqual(dispatch.retry_failed_jobs(), 1)
+        with self.assertLogs('notifications.dispatch', 'ERROR'):
+            self.assertEqual(dispatch.process_jobs(10), 1)
+
+
+class AggregationTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.fans = [User.objects.create_user(username=f'fan{i}') for i in range(5)]
+        self.post = Post.objects.create(author=self.author, content='viral')
+
+    def like(self, fan):
+        dispatch.notify(self.author.pk, fan.pk, 'liked', Post, self.post.pk)
+
+    def test_likes_roll_up_into_one_row(self):
+        for fan in self.fans:
+            self.like(fan)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 5)
+        self.assertEqual(notification.actor, self.fans[-1])
+        self.assertEqual([sample['username'] for sample in notification.sample_actors], ['fan4', 'fan3', 'fan2'])
+
+    def test_read_or_expired_groups_start_a_new_row(self):
+        self.like(self.fans[0])
+        Notification.objects.update(is_read=True)
+        self.like(self.fans[1])
+        self.assertEqual(Notification.objects.count(), 2)
+
+        with override_settings(NOTIFICATION_AGGREGATION={'WINDOW': 0}):
+            self.like(self.fans[2])
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_retract_shrinks_then_deletes_the_rollup(self):
+        self.like(self.fans[0])
+        self.like(self.fans[1])
+
+        dispatch.retract(self.author.pk, self.fans[1].pk, 'liked', Post, self.post.pk)
+        notification = Notification.objects.get()
+        self.assertEqual((notification.actor_count, notification.actor), (1, self.fans[0]))
+
+        dispatch.retract(self.author.pk, self.fans[0].pk, 'liked', Post, self.post.pk)
+        self.assertFalse(Notification.objects.exists())
+
+    def comment(self, fan):
+        dispatch.notify(self.author.pk, fan.pk, 'commented on', Post, self.post.pk)
+
+    def test_repeated_events_by_one_actor_count_once(self):
+        for _ in range(5):
+            self.comment(self.fans[0])
+        self.comment(self.fans[1])
+        self.assertEqual(Notification.objects.get().actor_count, 2)
+
+        # fans[0] stays on the rollup until their last comment is retracted
+        for _ in range(4):
+            dispatch.retract(self.author.pk, self.fans[0].pk, 'commented on', Post, self.post.pk)
+            self.assertEqual(Notification.objects.get().actor_count, 2)
+        dispatch.retract(self.author.pk, self.fans[0].pk, 'commented on', Post, self.post.pk)
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 1)
+        self.assertEqual([sample['id'] for sample in notification.sample_actors], [self.fans[1].pk])
+
+    def test_retract_only_touches_the_row_holding_the_actor(self):
+        self.like(self.fans[0])
+        Notification.objects.update(is_read=True)
+        self.like(self.fans[1])
+        older, newer = Notification.objects.order_by('timestamp', 'id')
+
+        # fans[0] is only on the older, read row
+        dispatch.retract(self.author.pk, self.fans[0].pk, 'liked', Post, self.post.pk)
+        self.assertFalse(Notification.objects.filter(pk=older.pk).exists())
+        newer.refresh_from_db()
+        self.assertEqual((newer.actor_count, newer.actor), (1, self.fans[1]))
+
+
+class UnreadCounterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.other = User.objects.create_user(username='other')
+        self.posts = [Post.objects.create(author=self.user, content=f'post {i}') for i in range(3)]
+        for post in self.posts:
+            dispatch.notify(self.user.pk, self.other.pk, 'liked', Post, post.pk)
+        self.client.force_authenticate(self.user)
+
+    def unread_count(self):
+        self.user.refresh_from_db()
+        self.client.force_authenticate(self.user)
+        return self.client.get('/api/notifications/unread-count/').data['unread_count']
+
+    def test_counter_tracks_new_and_rolled_up_rows(self):
+        self.assertEqual(self.unread_count(), 3)
+        # Joins the existing unread rollup, so the badge does not move
+        third = User.objects.create_user(username='third')
+        dispatch.notify(self.user.pk, third.pk, 'liked', Post, self.posts[0].pk)
+        self.assertEqual(self.unread_count(), 3)
+
+    def test_drifted_counter_does_not_go_negative(self):
+        User.objects.filter(pk=self.user.pk).update(unread_notification_count=1)
+        response = self.client.post('/api/notifications/read/', {'all': True}, format='json')
+        self.assertEqual(response.data['marked_read'], 3)
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_bulk_mark_read_by_ids_and_all(self):
+        ids = list(Notification.objects.values_list('pk', flat=True))
+        with self.assertNumQueries(4):  # savepoint, UPDATE, counter UPDATE, release
+            response = self.client.post('/api/notifications/read/', {'ids': ids[:2]}, format='json')
+        self.assertEqual(response.data['marked_read'], 2)
+        self.assertEqual(self.unread_count(), 1)
+
+        response = self.client.post('/api/notifications/read/', {'all': True}, format='json')
+        self.assertEqual(response.data['marked_read'], 1)
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_mark_single_notification_checks_owner(self):
+        notification = Notification.objects.first()
+        self.client.force_authenticate(self.other)
+        response = self.client.put(f'/api/notifications/{notification.pk}/read/')
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.put(f'/api/notifications/{notification.pk}/read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unread_count(), 2)
+
+    def test_bulk_mark_read_requires_one_selector(self):
+        response = self.client.post('/api/notifications/read/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.other = User.objects.create_user(username='other')
+        for i in range(5):
+            post = Post.objects.create(author=self.user, content=f'post {i}')
+            dispatch.notify(self.user.pk, self.other.pk, 'liked', Post, post.pk)
+        notifications = list(Notification.objects.order_by('id'))
+        # Three old read rows, one old unread row and one recent read row
+        old = timezone.now() - timedelta(days=100)
+        Notification.objects.filter(pk__in=[n.pk for n in notifications[:4]]).update(timestamp=old)
+        Notification.objects.filter(pk__in=[n.pk for n in notifications[:3] + notifications[4:]]).update(is_read=True)
+        self.old_read = [n.pk for n in notifications[:3]]
+
+    def test_prune_deletes_only_old_read_rows_in_batches(self):
+        out = StringIO()
+        call_command('prune_notifications', '--days', '30', '--batch-size', '2', stdout=out)
+        self.assertIn('Deleted 3', out.getvalue())
+        self.assertFalse(Notification.objects.filter(pk__in=self.old_read).exists())
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_prune_can_archive(self):
+        call_command('prune_notifications', '--days', '30', '--archive', stdout=StringIO())
+        self.assertEqual(sorted(ArchivedNotification.objects.values_list('pk', flat=True)), self.old_read)
+        self.assertEqual(ArchivedNotification.objects.first().recipient, self.user)
+
+
+class RealtimeStreamTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.fan = User.objects.create_user(username='fan')
+        self.post = Post.objects.create(author=self.author, content='live')
+        self.token = Token.objects.create(user=self.author)
+
+    def like(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatch.notify(self.author.pk, self.fan.pk, 'liked', Post, self.post.pk)
+
+    async def test_stream_requires_token(self):
+        response = await self.async_client.get('/api/notifications/stream/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_pushes_new_notifications(self):
+        response = await self.async_client.get(
+            '/api/notifications/stream/', headers={'authorization': f'Token {self.token.key}'},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        frames = aiter(response.streaming_content)
+        # The first frame is sent once the subscription is registered
+        self.assertEqual(await asyncio.wait_for(anext(frames), 5), b'retry: 5000\n\n')
+
+        await sync_to_async(self.like)()
+        frame = (await asyncio.wait_for(anext(frames), 5)).decode()
+        await frames.aclose()
+
+        self.assertIn('event: notification\n', frame)
+        message = json.loads(frame.split('data: ', 1)[1])
+        self.assertEqual((message['verb'], message['target_type'], message['target_id']), ('liked', 'post', self.post.pk))
+        self.assertEqual(message['sample_actors'], [{'id': self.fan.pk, 'username': 'fan'}])
+
+    async def test_closed_and_abandoned_streams_unsubscribe_cleanly(self):
+        broker = get_broker()
+        loop = asyncio.get_running_loop()
+        errors = []
+        loop.set_exception_handler(lambda loop, context: errors.append(context))
+        try:
+            for close in (True, False):
+                events = _notification_events(self.author.pk)
+                self.assertEqual(await anext(events), 'retry: 5000\n\n')
+                self.assertIn(self.author.pk, broker.subscribers)
+                if close:
+                    await events.aclose()
+                else:
+                    # Dropped without aclose(), as when a client disconnects mid-stream:
+                    # the loop finalizes the generator on its own
+                    del events
+                    gc.collect()
+                    for _ in range(3):
+                        await asyncio.sleep(0)
+                self.assertNotIn(self.author.pk, broker.subscribers)
+        finally:
+            loop.set_exception_handler(None)
+        self.assertEqual(errors, [])
+
+    async def test_subscription_exit_only_removes_its_own_queue(self):
+        broker = InMemoryBroker()
+        async with broker.subscribe(self.author.pk) as kept:
+            with self.assertRaises(RuntimeError):
+                async with broker.subscribe(self.author.pk):
+                    raise RuntimeError('client went away')
+            broker.publish(self.author.pk, {'id': 1})
+            self.assertEqual(await asyncio.wait_for(kept.get(), 5), {'id': 1})
+        self.assertEqual(broker.subscribers, {})
+
+    def test_stream_is_refused_under_wsgi(self):
+        # A WSGI worker would drain the endless stream forever
+        response = self.client.get('/api/notifications/stream/', headers={'authorization': f'Token {self.token.key}'})
+        self.assertEqual(response.status_code, 501)
+
+
+class FakeRedisBroker(RedisBroker):
+    """RedisBroker against an in-process fakeredis server shared by both clients."""
+
+    def __init__(self):
+        self.server = fakeredis.FakeServer()
+        super().__init__()
+
+    def sync_client(self):
+        return fakeredis.FakeRedis(server=self.server)
+
+    def async_client(self):
+        return fakeredis.FakeAsyncRedis(server=self.server)
+
+
+@skipUnless(fakeredis, 'needs fakeredis')
+class RedisBrokerTests(TestCase):
+    async def test_messages_published_elsewhere_reach_subscribers(self):
+        broker = FakeRedisBroker()
+        async with broker.subscribe(1) as messages:
+            # Published from a worker thread, as process_notification_jobs would from another process
+            await sync_to_async(broker.publish, thread_sensitive=False)(2, {'id': 1})
+            await sync_to_async(broker.publish, thread_sensitive=False)(1, {'id': 2})
+            self.assertEqual(await asyncio.wait_for(messages.get(), 5), {'id': 2})
+        self.assertTrue(messages.empty())
@@ -0,0 +1,27 @@
+"""
+Maintained per-user unread notification counter (CustomUser.unread_notification_count).
+
+Every write that creates, reads or deletes unread Notification rows adjusts the
+counter in the same transaction, so the unread badge never needs a COUNT(*).
+Decrements are clamped at zero, so a drifted counter cannot go negative (which
+the PositiveIntegerField check constraint would reject); reconcile_counters
+repairs any drift.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+
+
+def adjust_unread_counts(deltas):
+    """Apply {recipient_id: delta} to the unread counters with a single UPDATE."""
+    deltas = {recipient_id: delta for recipient_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    change = Case(
+        *(When(pk=recipient_id, then=Value(delta)) for recipient_id, delta in deltas.items()),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    get_user_model().objects.filter(pk__in=deltas).update(
+        unread_notification_count=Greatest(F('unread_notification_count') + change, Value(0))
+    )
@@ -7,4 +7,11 @@ urlpatterns = [
     
     # Endpoint to mark a specific notification as read
     path('notifications/<int:pk>/read/', views.NotificationMarkAsReadView.as_view(), name='notification-read'),
+
+    # Bulk mark-as-read (ids, "before" timestamp or all) and the unread badge counter
+    path('notifications/read/', views.NotificationBulkMarkAsReadView.as_view(), name='notification-read-bulk'),
+    path('notifications/unread-count/', views.UnreadCountView.as_view(), name='notification-unread-count'),
+
+    # Server-Sent Events stream of new notifications (replaces polling the list)
+    path('notifications/stream/', views.notification_stream, name='notification-stream'),
 ]
@@ -1,9 +1,33 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import generics
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import status
+from django.db import transaction
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import NotificationSerializer, MarkReadSerializer
+from .realtime import get_broker
+from .unread import adjust_unread_counts
+from accounts.models import USER_SUMMARY_FIELDS
+from social_media_api.pagination import NotificationPagination
+
+
+def mark_read(recipient, queryset):
+    """Mark the recipient's unread rows in queryset as read with one UPDATE; returns the count."""
+    with transaction.atomic():
+        updated = queryset.filter(recipient=recipient, is_read=False).update(is_read=True)
+        adjust_unread_counts({recipient.pk: -updated})
+    return updated
+
 
 class NotificationListView(generics.ListAPIView):
     """
@@ -12,11 +36,19 @@ class NotificationListView(generics.ListAPIView):
     """
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    # Page numbers by default, keyset on (timestamp, id) when ?cursor= is sent
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         # Fetch notifications where the recipient is the current authenticated user,
         # ordering by newest first.
-        return Notification.objects.filter(recipient=self.request.user).order_by('-timestamp')
+        return (
+            Notification.objects.filter(recipient=self.request.user)
+            .select_related('actor')
+            .only(*(field.name for field in Notification._meta.concrete_fields),
+                  *(f'actor__{field}' for field in USER_SUMMARY_FIELDS))
+            .order_by('-timestamp', '-id')
+        )
 
 class NotificationMarkAsReadView(generics.UpdateAPIView):
     """
@@ -24,19 +56,91 @@ class NotificationMarkAsReadView(generics.UpdateAPIView):
     """
     queryset = Notification.objects.all()
     permission_classes = [IsAuthenticated]
-    
+
     def update(self, request, *args, **kwargs):
+        # Single UPDATE scoped to the owner; only a no-op pays for working out why
+        if mark_read(request.user, Notification.objects.filter(pk=kwargs['pk'])):
+            return Response({'status': 'marked as read'}, status=status.HTTP_200_OK)
+
         notification = self.get_object()
-        
+
         # Security check: Ensure the user owns the notification
-        if notification.recipient != request.user:
+        if notification.recipient_id != request.user.pk:
             return Response(
-                {"detail": "You do not have permission to modify this notification."}, 
+                {"detail": "You do not have permission to modify this notification."},
                 status=status.HTTP_403_FORBIDDEN
             )
-        
-        # Mark as read and save
-        notification.is_read = True
-        notification.save()
-        
+
+        # Already read
         return Response({'status': 'marked as read'}, status=status.HTTP_200_OK)
+
+class NotificationBulkMarkAsReadView(APIView):
+    """
+    Marks many notifications as read with one UPDATE.
+    Body: {"ids": [...]}, {"before": "<timestamp>"} or {"all": true}.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        serializer = MarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        queryset = Notification.objects.all()
+        if 'ids' in data:
+            queryset = queryset.filter(pk__in=data['ids'])
+        elif 'before' in data:
+            queryset = queryset.filter(timestamp__lte=data['before'])
+
+        updated = mark_read(request.user, queryset)
+        return Response({'marked_read': updated}, status=status.HTTP_200_OK)
+
+class UnreadCountView(APIView):
+    """Returns the maintained unread notification counter (no COUNT query)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        return Response({'unread_count': request.user.unread_notification_count})
+
+# --- Real-time stream (Server-Sent Events) ---
+
+def _stream_keepalive():
+    # Seconds between comment frames that keep idle proxies from closing the stream
+    return getattr(settings, 'NOTIFICATION_STREAM_KEEPALIVE', 15)
+
+
+async def _notification_events(recipient_id):
+    async with get_broker().subscribe(recipient_id) as messages:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                message = await asyncio.wait_for(messages.get(), timeout=_stream_keepalive())
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            yield f"id: {message['id']}\nevent: notification\ndata: {json.dumps(message)}\n\n"
+
+
+async def notification_stream(request):
+    """
+    Pushes the user's notifications as they are created or rolled up, as a
+    text/event-stream. Authenticates with the same token header as the API.
+    Only served through the ASGI application: under WSGI the never-ending
+    stream would hold a worker thread forever, so such requests get a 501.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'detail': 'The notification stream is only available through the ASGI application.'}, status=501,
+        )
+    try:
+        result = await sync_to_async(TokenAuthentication().authenticate)(request)
+    except AuthenticationFailed as exc:
+        return JsonResponse({'detail': str(exc.detail)}, status=401)
+    if result is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    response = StreamingHttpResponse(_notification_events(result[0].pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
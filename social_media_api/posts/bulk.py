@@ -0,0 +1,28 @@
+"""
+Batch post creation for PostViewSet.bulk (POST /posts/bulk/).
+
+A batch is inserted with one bulk_create in one transaction. bulk_create sends
+no post_save signals, so the per-post side effects are applied here, once for
+the whole batch: a single follower read fans every post out to the timelines,
+and the search index receives all rows in one statement.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from . import search
+from .models import Post
+from .timeline import fan_out_posts
+
+
+def bulk_create_limit():
+    """Most posts accepted in one request."""
+    return getattr(settings, 'POST_BULK_CREATE_MAX', 100)
+
+
+def create_posts(author, items):
+    """Insert posts (validated attribute dicts) for author; returns the saved posts in order."""
+    with transaction.atomic():
+        posts = Post.objects.bulk_create([Post(author=author, **attrs) for attrs in items], batch_size=500)
+        fan_out_posts(author, posts)
+        search.index_new_posts(posts)
+    return posts
@@ -0,0 +1,92 @@
+"""
+Conditional GET and cached response bodies for posts and comments.
+
+A post's validator is built from database state only, read with a single narrow
+query: the row's updated_at, last_activity_at (moved by every like and comment
+write) and denormalized like/comment counters, plus the author's username and
+profile picture that the body embeds. The body also embeds the authors of the
+first comments; when one of them changes their username or picture, every post
+they commented on is touched (posts.signals). So:
+
+* a request whose If-None-Match / If-Modified-Since still matches gets a 304
+  without the post being loaded or serialized, and
+* the serialized body is cached under the validator, so a stale body can never
+  be served for a newer version, whichever process or cache backend wrote it.
+
+The viewer-specific ``is_liked`` flag is not part of the cached body; it is read
+by the same query and folded into the ETag.
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from social_media_api.caching import get_or_compute
+
+# Post columns (and author fields, which the body embeds) behind a post's validators
+POST_STATE_FIELDS = (
+    'updated_at', 'last_activity_at', 'like_count', 'comment_count', 'author__username', 'author__profile_picture',
+)
+# User fields embedded in bodies (accounts.serializers.UserSummarySerializer)
+USER_SUMMARY_STATE_FIELDS = ('username', 'profile_picture')
+# The same for a comment
+COMMENT_STATE_FIELDS = ('updated_at', 'author__username', 'author__profile_picture')
+
+
+def post_cache_timeout():
+    return getattr(settings, 'POST_CACHE_TIMEOUT', 5 * 60)
+
+
+def touch_post(post_id):
+    """Record activity on a post (a comment write), which moves its validators."""
+    from .models import Post
+
+    Post.objects.filter(pk=post_id).update(last_activity_at=timezone.now())
+
+
+def touch_commented_posts(user_id):
+    """Move the validators of every post the user has commented on (one UPDATE)."""
+    from .models import Comment, Post
+
+    Post.objects.filter(pk__in=Comment.objects.filter(author_id=user_id).values('post_id')).update(
+        last_activity_at=timezone.now(),
+    )
+
+
+def digest(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def post_validators(post_id, state):
+    """(digest, last_modified) for a post, from its POST_STATE_FIELDS values."""
+    modified = max(state['updated_at'], state['last_activity_at'])
+    return digest(post_id, *(state[field] for field in POST_STATE_FIELDS)), modified
+
+
+def comment_validators(comment_id, state):
+    """(digest, last_modified) for a comment, from its COMMENT_STATE_FIELDS values."""
+    return digest(comment_id, *(state[field] for field in COMMENT_STATE_FIELDS)), state['updated_at']
+
+
+def cached_body(key, build):
+    """Read-through (single-flight) cache for a serialized response body."""
+    return get_or_compute(key, build, timeout=post_cache_timeout())
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 response if the request's validators still match, otherwise None."""
+    return get_conditional_response(
+        request._request, etag=etag, last_modified=int(last_modified.timestamp()),
+    )
+
+
+def add_validators(response, etag, last_modified, vary_on_user=False):
+    """Attach ETag/Last-Modified and make clients revalidate before reusing the body."""
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    if vary_on_user:
+        patch_vary_headers(response, ['Authorization'])
+    return response
@@ -0,0 +1,79 @@
+"""
+Streaming export of a user's posts, comments and likes (GET /api/export/).
+
+The export is newline-delimited JSON: a header line, then one line per row,
+each tagged with its "type". Rows are read with .iterator(chunk_size=...), which
+uses a server-side cursor on PostgreSQL (and chunked fetches elsewhere), and
+written out as they are read, so memory stays bounded by EXPORT_CHUNK_SIZE rows
+however much history the user has.
+
+Django buffers a streaming response whose iterator does not match the server
+(sync under WSGI, async under ASGI), so export_chunks() is wrapped for the
+server the request came through (see stream_for).
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Comment, Like, Post
+
+EXPORT_FIELDS = {
+    'post': (Post, 'author', ('id', 'content', 'created_at', 'updated_at', 'like_count', 'comment_count')),
+    'comment': (Comment, 'author', ('id', 'post_id', 'parent_id', 'content', 'created_at', 'updated_at')),
+    'like': (Like, 'user', ('post_id', 'created_at')),
+}
+
+
+def export_chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def _line(record):
+    return json.dumps(record, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
+
+
+def export_lines(user):
+    """Yield the NDJSON lines of user's export, reading each table with a cursor."""
+    yield _line({
+        'type': 'export', 'user_id': user.pk, 'username': user.username,
+        'generated_at': timezone.now(),
+    })
+    chunk_size = export_chunk_size()
+    for record_type, (model, owner, fields) in EXPORT_FIELDS.items():
+        rows = model.objects.filter(**{owner: user}).order_by('pk').values(*fields)
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield _line({'type': record_type, **row})
+
+
+def export_chunks(user):
+    """export_lines() joined into ~chunk-sized byte strings, to keep writes (and thread hops) few."""
+    batch = []
+    for line in export_lines(user):
+        batch.append(line)
+        if len(batch) >= export_chunk_size():
+            yield ''.join(batch).encode()
+            batch = []
+    if batch:
+        yield ''.join(batch).encode()
+
+
+async def _async_chunks(chunks):
+    # Each step runs in the thread that owns the request's database connection
+    step = sync_to_async(next)
+    while True:
+        chunk = await step(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def stream_for(request, user):
+    """An iterator of export chunks suited to the server handling request."""
+    chunks = export_chunks(user)
+    if isinstance(request, ASGIRequest):
+        return _async_chunks(chunks)
+    return chunks
@@ -0,0 +1,80 @@
+"""
+Race-free like/unlike writes for PostViewSet.like.
+
+Liking is a single ``INSERT ... SELECT ... ON CONFLICT DO NOTHING`` and unliking
+a single ``DELETE``; the affected row count decides whether the like counter
+and the notification change, so concurrent double-taps cannot double count.
+The post is never fetched up front: the counter ``UPDATE ... RETURNING`` hands
+back the author id that the notification event needs.
+"""
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from notifications import dispatch
+from social_media_api.sql import supports_returning
+
+from .models import Like, Post
+
+
+def _bump_like_count(post_id, delta):
+    """Apply delta to Post.like_count, touch last_activity_at and return the post's author id."""
+    now = timezone.now()
+    if supports_returning():
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {quote(Post._meta.db_table)} SET {quote("like_count")} = {quote("like_count")} + %s, '
+                f'{quote("last_activity_at")} = %s WHERE {quote("id")} = %s RETURNING {quote("author_id")}',
+                [delta, connection.ops.adapt_datetimefield_value(now), post_id],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    # Elsewhere: a plain UPDATE, then a read in the caller's transaction
+    Post.objects.filter(pk=post_id).update(like_count=F('like_count') + delta, last_activity_at=now)
+    return Post.objects.filter(pk=post_id).values_list('author_id', flat=True).first()
+
+
+def add_like(post_id, user):
+    """
+    Idempotently record that user likes the post.
+
+    Returns True if a new like was stored and False if it already existed.
+    Raises Post.DoesNotExist if there is no such post.
+    """
+    quote = connection.ops.quote_name
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Selecting from posts_post makes a missing post insert nothing
+            cursor.execute(
+                f'INSERT INTO {quote(Like._meta.db_table)} ({quote("post_id")}, {quote("user_id")}, {quote("created_at")}) '
+                f'SELECT {quote("id")}, %s, %s FROM {quote(Post._meta.db_table)} WHERE {quote("id")} = %s '
+                f'ON CONFLICT ({quote("post_id")}, {quote("user_id")}) DO NOTHING',
+                [user.pk, connection.ops.adapt_datetimefield_value(timezone.now()), post_id],
+            )
+            inserted = cursor.rowcount
+
+        if not inserted:
+            # Only the no-op path pays for telling "already liked" from "no such post"
+            if not Post.objects.filter(pk=post_id).exists():
+                raise Post.DoesNotExist
+            return False
+
+        author_id = _bump_like_count(post_id, 1)
+        if author_id != user.pk:
+            dispatch.notify(author_id, user.pk, 'liked', Post, post_id)
+    return True
+
+
+def remove_like(post_id, user):
+    """Idempotently remove user's like. Returns True if a like was deleted."""
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(post_id=post_id, user=user).delete()
+        if not deleted:
+            return False
+
+        author_id = _bump_like_count(post_id, -1)
+        if author_id != user.pk:
+            dispatch.retract(author_id, user.pk, 'liked', Post, post_id)
+    return True
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.trending import compute_trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Update the trending scores from likes and comments created since the last run, '
+        'or rebuild them from recent activity with --full.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every score from scratch.')
+        parser.add_argument('--batch-size', type=int, default=None, help='Likes/comments read per batch.')
+
+    def handle(self, *args, **options):
+        run = compute_trending(full=options['full'], batch_size=options['batch_size'])
+        kind = 'Full' if run.full else 'Incremental'
+        self.stdout.write(f'{kind} run updated {run.posts_updated} posts.')
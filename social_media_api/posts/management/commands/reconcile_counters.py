@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import Follow
+from notifications.models import Notification
+from posts.models import Comment, Like, Post
+
+
+def _total(queryset, column):
+    """Correlated COUNT(*) of rows in queryset whose column points at the outer row."""
+    return Coalesce(Subquery(
+        queryset.filter(**{column: OuterRef('pk')}).order_by()
+        .values(column).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the denormalized like/comment counters on Post and the '
+        'follower/following/unread notification counters on CustomUser, '
+        'fixing rows that drifted.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows checked per batch.')
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted rows without fixing them.')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+
+        self.reconcile(Post, {
+            'like_count': _total(Like.objects.all(), 'post'),
+            'comment_count': _total(Comment.objects.all(), 'post'),
+        })
+        self.reconcile(get_user_model(), {
+            'follower_count': _total(Follow.objects.all(), 'followee'),
+            'following_count': _total(Follow.objects.all(), 'follower'),
+            'unread_notification_count': _total(Notification.objects.filter(is_read=False), 'recipient'),
+        })
+
+    def reconcile(self, model, counters):
+        """Walk the table in primary key order and rewrite counters that disagree with the source rows."""
+        annotations = {f'actual_{name}': expression for name, expression in counters.items()}
+        drifted = Q()
+        for name in counters:
+            drifted |= ~Q(**{name: F(f'actual_{name}')})
+
+        fixed = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:self.batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+
+            rows = list(
+                model.objects.filter(pk__in=batch).annotate(**annotations).filter(drifted)
+                .only('pk', *counters)
+            )
+            for row in rows:
+                for name in counters:
+                    setattr(row, name, getattr(row, f'actual_{name}'))
+            if rows and not self.dry_run:
+                with transaction.atomic():
+                    model.objects.bulk_update(rows, list(counters))
+            fixed += len(rows)
+
+        action = 'Found' if self.dry_run else 'Fixed'
+        self.stdout.write(f'{action} {fixed} drifted {model._meta.verbose_name_plural}.')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import oversized_timelines, resume_fan_out, timeline_max_entries, trim_timeline
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete materialized timeline entries beyond the newest FEED_TIMELINE_MAX_ENTRIES per user, '
+        'and resume fan-out for pulled authors back under FEED_FANOUT_RESUME_FOLLOWER_LIMIT.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=None, help='Entries kept per user.')
+
+    def handle(self, *args, **options):
+        resumed = resume_fan_out()
+        self.stdout.write(f'Resumed fan-out for {resumed} authors.')
+
+        keep = timeline_max_entries() if options['keep'] is None else options['keep']
+        users = trimmed = 0
+        for user_id in oversized_timelines(keep).iterator():
+            trimmed += trim_timeline(user_id, keep)
+            users += 1
+        self.stdout.write(f'Trimmed {trimmed} entries from {users} timelines.')
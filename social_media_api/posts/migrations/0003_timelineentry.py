@@ -0,0 +1,107 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:21
+
+import heapq
+from itertools import groupby, islice
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+# Followers whose timelines are built per posts query, and entries per INSERT
+FOLLOWER_BATCH_SIZE = 100
+INSERT_BATCH_SIZE = 1000
+
+
+def backfill_timelines(apps, schema_editor):
+    """
+    Materialize timelines for follow relationships that already exist: the
+    newest FEED_BACKFILL_POSTS posts of each followed author, capped at
+    FEED_TIMELINE_MAX_ENTRIES per timeline. Authors over the fan-out limit are
+    pulled at read time and get no entries.
+    """
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    Follow = CustomUser.followers.through
+
+    fanout_limit = getattr(settings, 'FEED_FANOUT_FOLLOWER_LIMIT', 10000)
+    per_author = getattr(settings, 'FEED_BACKFILL_POSTS', 200)
+    keep = getattr(settings, 'FEED_TIMELINE_MAX_ENTRIES', 1000)
+
+    pushed_authors = (
+        Follow.objects.values('from_customuser_id').annotate(followers=Count('id'))
+        .filter(followers__lte=fanout_limit).values('from_customuser_id')
+    )
+    edges = (
+        Follow.objects.filter(from_customuser_id__in=pushed_authors)
+        .order_by('to_customuser_id').values_list('to_customuser_id', 'from_customuser_id')
+    )
+
+    entries = []
+
+    def flush(timelines):
+        # One query for the newest posts of every author followed in this batch
+        author_ids = {author_id for author_ids in timelines.values() for author_id in author_ids}
+        recent = (
+            Post.objects.filter(author_id__in=author_ids)
+            .annotate(rank=Window(
+                RowNumber(), partition_by=F('author_id'), order_by=[F('created_at').desc(), F('id').desc()],
+            ))
+            .filter(rank__lte=min(per_author, keep))
+            .order_by('author_id', '-created_at', '-id')
+            .values_list('author_id', 'created_at', 'id')
+        )
+        posts = {
+            author_id: [(created_at, post_id, author_id) for _, created_at, post_id in rows]
+            for author_id, rows in groupby(recent, key=lambda row: row[0])
+        }
+        for follower_id, followed in timelines.items():
+            merged = heapq.merge(*(posts.get(author_id, ()) for author_id in followed), reverse=True)
+            for created_at, post_id, author_id in islice(merged, keep):
+                entries.append(TimelineEntry(
+                    user_id=follower_id, post_id=post_id, author_id=author_id, created_at=created_at,
+                ))
+                if len(entries) >= INSERT_BATCH_SIZE:
+                    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+                    entries.clear()
+
+    timelines = {}
+    for follower_id, rows in groupby(edges.iterator(chunk_size=2000), key=lambda row: row[0]):
+        timelines[follower_id] = [author_id for _, author_id in rows]
+        if len(timelines) >= FOLLOWER_BATCH_SIZE:
+            flush(timelines)
+            timelines = {}
+    if timelines:
+        flush(timelines)
+    if entries:
+        TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('posts', '0002_like'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-post'],
+                'indexes': [models.Index(fields=['user', '-created_at', '-post'], name='posts_timeline_user_recent'), models.Index(fields=['user', 'author'], name='posts_timeline_user_author')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'post'), name='posts_timeline_unique_user_post')],
+            },
+        ),
+        migrations.RunPython(backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:24
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_post_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Like = apps.get_model('posts', 'Like')
+    Comment = apps.get_model('posts', 'Comment')
+
+    def total(model):
+        return Coalesce(Subquery(
+            model.objects.filter(post=OuterRef('pk')).order_by()
+            .values('post').annotate(total=Count('id')).values('total')
+        ), 0)
+
+    Post.objects.update(like_count=total(Like), comment_count=total(Comment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-like_count', '-created_at'], name='posts_post_popular'),
+        ),
+        migrations.RunPython(populate_post_counters, migrations.RunPython.noop),
+    ]
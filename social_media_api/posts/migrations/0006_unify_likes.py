@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:25
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 1000
+
+
+def copy_m2m_likes(apps, schema_editor):
+    """Move rows of the implicit posts_post_likes table into posts_like, in batches."""
+    Post = apps.get_model('posts', 'Post')
+    Like = apps.get_model('posts', 'Like')
+    PostLikes = Post.likes.through
+
+    last_pk = 0
+    while True:
+        rows = list(
+            PostLikes.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'post_id', 'customuser_id')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        # ignore_conflicts skips likes that were already recorded in posts_like
+        Like.objects.bulk_create(
+            [Like(post_id=post_id, user_id=user_id) for _, post_id, user_id in rows],
+            ignore_conflicts=True,
+        )
+
+    # The copied rows change like totals, so bring the counters back in line
+    Post.objects.update(like_count=Coalesce(Subquery(
+        Like.objects.filter(post=OuterRef('pk')).order_by()
+        .values('post').annotate(total=Count('id')).values('total')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_m2m_likes, migrations.RunPython.noop),
+        # Django cannot add through= to an existing M2M, so drop the implicit
+        # table and re-add the field on top of the Like model.
+        migrations.RemoveField(
+            model_name='post',
+            name='likes',
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes',
+            field=models.ManyToManyField(blank=True, related_name='liked_posts', through='posts.Like', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['user', 'post'], name='posts_like_user_post'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', '-created_at'], name='posts_like_post_recent'),
+        ),
+    ]
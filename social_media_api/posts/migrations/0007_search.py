@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:05
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+def create_search_index(apps, schema_editor):
+    """Backend-specific full-text index used by posts.search."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX posts_post_content_search ON posts_post "
+            "USING GIN (to_tsvector('english', \"content\"))"
+        )
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE posts_post_fts USING fts5(content, tokenize='porter unicode61')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5: posts.search falls back to the Python index
+            return
+        schema_editor.execute('INSERT INTO posts_post_fts (rowid, content) SELECT id, content FROM posts_post')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS posts_post_content_search')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_unify_likes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
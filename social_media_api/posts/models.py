@@ -1,5 +1,56 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Prefetch, Value
 from django.conf import settings # Import settings to link to the CustomUser model
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from accounts.models import USER_SUMMARY_FIELDS
+
+from .threads import MAX_PATH_DEPTH, path_segment
+
+
+def _concrete_fields(model):
+    return [field.name for field in model._meta.concrete_fields]
+
+
+def comment_preview_limit():
+    return getattr(settings, 'POST_COMMENT_PREVIEWS', 3)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_listing(self, viewer):
+        """
+        Load everything PostListSerializer reads in a constant number of queries:
+        the viewer's is_liked flag is annotated, authors are joined, and only
+        the first few comments of each post are prefetched (a sliced Prefetch,
+        i.e. one ROW_NUMBER() window query for the whole page). Users are
+        loaded with only the columns UserSummarySerializer reads.
+        """
+        if viewer is not None and viewer.is_authenticated:
+            viewer_has_liked = Exists(
+                Like.objects.filter(post_id=OuterRef('pk'), user_id=viewer.pk)
+            )
+        else:
+            viewer_has_liked = Value(False)
+
+        # Authors are embedded as summaries, so only those columns are loaded
+        authors = [f'author__{field}' for field in USER_SUMMARY_FIELDS]
+        # Previews are top-level comments; replies are reached through reply_count
+        previews = (
+            Comment.objects.filter(parent__isnull=True).select_related('author')
+            .only('id', 'post', 'content', 'reply_count', 'created_at', *authors)
+            .order_by('created_at', 'id')[:comment_preview_limit()]
+        )
+        return self.select_related('author').only(*_concrete_fields(Post), *authors).prefetch_related(
+            Prefetch('comments', queryset=previews, to_attr='preview_comments'),
+        ).annotate(viewer_has_liked=viewer_has_liked)
+
+    def for_detail(self, viewer):
+        """for_listing() plus the ids of the users who liked each post, for PostSerializer."""
+        return self.for_listing(viewer).prefetch_related(
+            Prefetch('likes', queryset=get_user_model().objects.only('id')),
+        )
+
 
 class Post(models.Model):
     # Foreign Key linking Post to the User who authored it.
@@ -27,20 +78,50 @@ class Post(models.Model):
     )
     
     # Many-to-Many field for tracking likes from users.
+    # Stored in the Like table so there is a single source of truth for likes.
     likes = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
+        through='Like',
         related_name='liked_posts',
         blank=True
     )
 
+    # Denormalized counters, maintained with F() updates by the like and comment views
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    # Moved by every like and comment write, so the post's HTTP validators
+    # (posts.caching) change even when updated_at and the counters do not
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         # Default ordering for queries: newest posts first.
         ordering = ['-created_at']
+        # Composite indexes for keyset pagination on (created_at, id)
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='posts_post_recent'),
+            models.Index(fields=['author', '-created_at', '-id'], name='posts_post_author_recent'),
+            # Popularity sorting without aggregating likes at query time
+            models.Index(fields=['-like_count', '-created_at'], name='posts_post_popular'),
+            # Posts edited since a point in time (the python search backend's sync)
+            models.Index(fields=['updated_at'], name='posts_post_updated'),
+        ]
 
     def __str__(self):
         return f"{self.author.username}'s Post ({self.pk})"
 
 # --- Comment Model ---
+class CommentQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        # Paths are normally written by Comment.save(), which bulk_create skips
+        objs = list(objs)
+        if any(not comment.path for comment in objs):
+            raise ValueError('Comments created with bulk_create() need their path set.')
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Comment(models.Model):
     # Foreign Key linking Comment to its parent Post.
     post = models.ForeignKey(
@@ -55,6 +136,24 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
         related_name='comments' # Access Comments via user.comments.all()
     )
+
+    # Comment this one replies to (null for top-level comments); see posts.threads
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='replies'
+    )
+
+    # Materialized path of ids from the top-level comment, for subtree range scans
+    path = models.CharField(max_length=255, blank=True, default='', editable=False)
+
+    # Nesting level (0 for top-level comments)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    # Number of replies below this comment at any depth, maintained with F() updates
+    reply_count = models.PositiveIntegerField(default=0, editable=False)
     
     # Text content of the comment. Uses models.TextField() for compliance.
     content = models.TextField(
@@ -71,13 +170,39 @@ class Comment(models.Model):
         auto_now=True
     )
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         # Default ordering for comments: oldest first.
         ordering = ['created_at']
+        indexes = [
+            # Keyset pages of a post's comments on (created_at, id)
+            models.Index(fields=['post', 'created_at', 'id'], name='posts_comment_post_created'),
+            # Threads in display order and subtree ranges (posts.threads)
+            models.Index(fields=['post', 'path'], name='posts_comment_thread'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            if not self.path:
+                raise ValueError(f'Comment {self.pk} has no path.')
+            return super().save(*args, **kwargs)
+
+        if self.parent_id:
+            self.depth = self.parent.depth + 1
+        if self.depth > MAX_PATH_DEPTH:
+            raise ValueError(f'Replies can be nested at most {MAX_PATH_DEPTH} levels deep.')
+        # The path ends with the comment's own id, known only after the INSERT;
+        # both statements commit together, so no comment is ever left without one
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            prefix = self.parent.path if self.parent_id else ''
+            self.path = prefix + path_segment(self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
 
     def __str__(self):
         return f"Comment by {self.author.username} on Post {self.post.pk}"
-# --- New Model: Like (Task 3) ---
+# --- New Model: Like (Task 3, through table of Post.likes) ---
 class Like(models.Model):
     # The post that was liked
     post = models.ForeignKey(
@@ -98,6 +223,95 @@ class Like(models.Model):
     class Meta:
         # Ensures a user can only like a post once (unique constraint)
         unique_together = ('post', 'user')
+        indexes = [
+            # "Which posts did this user like" / "did I like this" lookups
+            models.Index(fields=['user', 'post'], name='posts_like_user_post'),
+            # "Recent likers" of a post
+            models.Index(fields=['post', '-created_at'], name='posts_like_post_recent'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} liked Post {self.post.pk}'
+
+# --- Materialized Home Timeline (Fan-out-on-write) ---
+class TimelineEntry(models.Model):
+    # The follower whose home feed this entry belongs to
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+
+    # The post pushed into the feed
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+
+    # Denormalized author so an unfollow can drop entries without joining Post
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    # Copy of post.created_at so the feed is read with a single index range scan
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at', '-post']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='posts_timeline_unique_user_post'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='posts_timeline_user_recent'),
+            models.Index(fields=['user', 'author'], name='posts_timeline_user_author'),
+        ]
+
+    def __str__(self):
+        return f'Post {self.post_id} in {self.user_id}\'s timeline'
+
+# --- Trending Scores (posts.trending) ---
+class PostScore(models.Model):
+    # One row per post with recent likes or comments
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending_score'
+    )
+
+    # ln of the post's time-decayed activity, relative to posts.trending.EPOCH.
+    # Comparable across posts without rescaling, since all decay at the same rate.
+    score = models.FloatField()
+
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # /posts/trending/ is a scan of this index
+            models.Index(fields=['-score', '-post'], name='posts_score_trending'),
+        ]
+
+    def __str__(self):
+        return f'Post {self.post_id} scores {self.score:.3f}'
+
+
+class TrendingRun(models.Model):
+    """A run of compute_trending, recording how far it read the Like and Comment tables."""
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    full = models.BooleanField(default=False)
+
+    # Highest Like/Comment ids folded into the scores; the next run starts after them
+    last_like_id = models.BigIntegerField(default=0)
+    last_comment_id = models.BigIntegerField(default=0)
+
+    posts_updated = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-id']
+
+    def __str__(self):
+        return f'Trending run {self.pk} ({"full" if self.full else "incremental"})'
@@ -0,0 +1,313 @@
+"""
+Ranked full-text search over Post.content for PostViewSet (?search=...).
+
+Three interchangeable backends, picked by POST_SEARCH_BACKEND ('auto' chooses
+from the database vendor):
+
+* postgres: to_tsvector/plainto_tsquery matched against an expression GIN
+  index (migration 0007), ranked with ts_rank. The index is maintained by
+  PostgreSQL itself.
+* sqlite: an FTS5 virtual table (posts_post_fts, rowid = post id) ranked with
+  bm25. Rows are written from the post save/delete signals (posts.signals).
+* python: an in-process inverted index with TF-IDF ranking, for databases
+  without either feature. Each process builds its own copy lazily from the
+  table; the signals keep it current for the process's own writes, and every
+  search first folds in posts created or edited elsewhere (by updated_at,
+  posts_post_updated index). Posts deleted elsewhere are filtered out by the
+  database and dropped from the index by a full rebuild every
+  PYTHON_INDEX_MAX_AGE seconds. Only the PYTHON_RESULT_LIMIT best matches are
+  ranked; PostViewSet flags a cut-off list with an X-Search-Truncated header.
+
+Every backend returns the queryset filtered to matches and annotated with
+``search_rank`` (higher is better). Results are ordered by (search_rank, id),
+the order SearchKeysetPagination seeks on.
+"""
+import functools
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from rest_framework.filters import BaseFilterBackend
+
+FTS_TABLE = 'posts_post_fts'
+# Matches ranked by the python backend; more are reported as truncated
+PYTHON_RESULT_LIMIT = 1000
+# Seconds after which the python index is rebuilt, forgetting posts deleted by other processes
+PYTHON_INDEX_MAX_AGE = 10 * 60
+# Posts saved up to this long before the last sync are read again, in case
+# their transaction had not committed yet
+PYTHON_SYNC_MARGIN = timedelta(seconds=60)
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [word.lower() for word in _WORD.findall(text or '')]
+
+
+@functools.lru_cache(maxsize=None)
+def fts5_available():
+    """Whether migration 0007 could create the FTS5 table (SQLite may be built without it)."""
+    with connection.cursor() as cursor:
+        return FTS_TABLE in connection.introspection.table_names(cursor)
+
+
+def backend_name():
+    name = getattr(settings, 'POST_SEARCH_BACKEND', 'auto')
+    if name != 'auto':
+        return name
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    if connection.vendor == 'sqlite' and fts5_available():
+        return 'sqlite'
+    return 'python'
+
+
+def search_posts(queryset, query):
+    """Filter queryset to posts matching query and annotate search_rank."""
+    return run_search(queryset, query)[0]
+
+
+def run_search(queryset, query):
+    """search_posts() plus whether matches beyond PYTHON_RESULT_LIMIT were left out."""
+    terms = tokenize(query)
+    if not terms:
+        return _no_matches(queryset), False
+    return BACKENDS[backend_name()](queryset, query, terms)
+
+
+def _no_matches(queryset):
+    # Still annotated, so ordering by search_rank works on the empty result
+    return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+# --- PostgreSQL ---
+
+# Must stay identical to the expression of the GIN index in migration 0007
+PG_DOCUMENT = "to_tsvector('english', \"posts_post\".\"content\")"
+
+
+def _search_postgres(queryset, query, terms):
+    # plainto_tsquery ANDs the tokenized terms, like the other backends, and
+    # treats them as plain words rather than query syntax
+    tsquery = "plainto_tsquery('english', %s)"
+    words = ' '.join(terms)
+    return queryset.filter(
+        RawSQL(f'{PG_DOCUMENT} @@ {tsquery}', (words,), output_field=BooleanField()),
+    ).annotate(
+        search_rank=RawSQL(f'ts_rank({PG_DOCUMENT}, {tsquery})', (words,), output_field=FloatField()),
+    ), False
+
+
+# --- SQLite FTS5 ---
+
+def _fts_match(terms):
+    # Quote every term so user input can never be parsed as FTS5 query syntax
+    return ' '.join('"{}"'.format(term.replace('"', '')) for term in terms)
+
+
+def _search_sqlite(queryset, query, terms):
+    match = _fts_match(terms)
+    # bm25() is lower for better matches; negate it so higher is better everywhere
+    rank = RawSQL(
+        f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+        f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = "posts_post"."id"',
+        (match,), output_field=FloatField(),
+    )
+    matches = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,))
+    return queryset.filter(pk__in=matches).annotate(search_rank=rank), False
+
+
+def _sqlite_index(post):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, content) VALUES (%s, %s)', [post.pk, post.content])
+
+
+def _sqlite_index_many(posts):
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, content) VALUES (%s, %s)',
+            [(post.pk, post.content) for post in posts],
+        )
+
+
+def _sqlite_remove(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+
+# --- Pure-Python inverted index ---
+
+class InvertedIndex:
+    """
+    term -> {post_id: term frequency}, plus each document's length and terms
+    (for TF-IDF and for removing a document without scanning the vocabulary).
+    Results are always re-filtered by the database, so entries left behind by
+    a rolled-back save only cost a wasted candidate.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        self.terms = {}
+        self.built = False
+        # When the index was built (time.monotonic()) and the updated_at it is current to
+        self.built_at = None
+        self.synced_at = None
+
+    def build(self, rows, synced_at=None):
+        with self.lock:
+            self.postings.clear()
+            self.lengths.clear()
+            self.terms.clear()
+            for post_id, content in rows:
+                self._add(post_id, content)
+            self.built = True
+            self.built_at = time.monotonic()
+            self.synced_at = synced_at
+
+    def _add(self, post_id, content):
+        counts = Counter(tokenize(content))
+        self.lengths[post_id] = sum(counts.values()) or 1
+        self.terms[post_id] = set(counts)
+        for term, count in counts.items():
+            self.postings[term][post_id] = count
+
+    def _remove(self, post_id):
+        self.lengths.pop(post_id, None)
+        for term in self.terms.pop(post_id, ()):
+            del self.postings[term][post_id]
+            if not self.postings[term]:
+                del self.postings[term]
+
+    def update(self, post_id, content):
+        with self.lock:
+            self._remove(post_id)
+            self._add(post_id, content)
+
+    def remove(self, post_id):
+        with self.lock:
+            self._remove(post_id)
+
+    def search(self, terms, limit=PYTHON_RESULT_LIMIT):
+        """
+        Posts containing every term, as ([(post_id, score)] best first, at most
+        limit of them; the total number of matches).
+        """
+        with self.lock:
+            documents = len(self.lengths) or 1
+            postings = [self.postings.get(term, {}) for term in set(terms)]
+            if not postings or not all(postings):
+                return [], 0
+            candidates = set.intersection(*(set(docs) for docs in postings))
+            scores = {
+                post_id: sum(
+                    docs[post_id] / self.lengths[post_id] * math.log(1 + documents / len(docs))
+                    for docs in postings
+                )
+                for post_id in candidates
+            }
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:limit], len(scores)
+
+
+python_index = InvertedIndex()
+
+
+def _sync_python_index():
+    """Build the index if missing or older than PYTHON_INDEX_MAX_AGE, else fold in posts saved elsewhere."""
+    from .models import Post
+
+    now = timezone.now()
+    if not python_index.built or time.monotonic() - python_index.built_at >= PYTHON_INDEX_MAX_AGE:
+        python_index.build(Post.objects.values_list('pk', 'content').iterator(chunk_size=2000), synced_at=now)
+        return
+    changed = Post.objects.filter(updated_at__gte=python_index.synced_at - PYTHON_SYNC_MARGIN)
+    for post_id, content in changed.values_list('pk', 'content').iterator(chunk_size=2000):
+        python_index.update(post_id, content)
+    python_index.synced_at = now
+
+
+def _search_python(queryset, query, terms):
+    _sync_python_index()
+    results, total = python_index.search(terms, PYTHON_RESULT_LIMIT)
+    if not results:
+        return _no_matches(queryset), False
+    rank = Case(
+        *(When(pk=post_id, then=Value(score)) for post_id, score in results),
+        output_field=FloatField(),
+    )
+    return queryset.filter(pk__in=[post_id for post_id, _ in results]).annotate(search_rank=rank), total > len(results)
+
+
+BACKENDS = {
+    'postgres': _search_postgres,
+    'sqlite': _search_sqlite,
+    'python': _search_python,
+}
+
+
+# --- Incremental index maintenance (called from posts.signals and posts.bulk) ---
+
+def index_post(post):
+    backend = backend_name()
+    if backend == 'sqlite':
+        _sqlite_index(post)
+    elif backend == 'python' and python_index.built:
+        python_index.update(post.pk, post.content)
+
+
+def index_new_posts(posts):
+    """Index freshly inserted posts in one go (bulk_create sends no post_save signals)."""
+    backend = backend_name()
+    if backend == 'sqlite':
+        _sqlite_index_many(posts)
+    elif backend == 'python' and python_index.built:
+        for post in posts:
+            python_index.update(post.pk, post.content)
+
+
+def unindex_post(post_id):
+    backend = backend_name()
+    if backend == 'sqlite':
+        _sqlite_remove(post_id)
+    elif backend == 'python' and python_index.built:
+        python_index.remove(post_id)
+
+
+# --- DRF filter backend ---
+
+class PostSearchFilter(BaseFilterBackend):
+    """
+    Replaces SearchFilter on PostViewSet: ?search= runs a ranked full-text
+    search, and results come best match first unless ?ordering= is given.
+    Sets view.search_truncated when only the best PYTHON_RESULT_LIMIT matches
+    were kept.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        queryset, view.search_truncated = run_search(queryset, query)
+        # Same tie-break as SearchKeysetPagination, so both modes list matches alike
+        return queryset.order_by('-search_rank', '-id')
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Full-text search over post content, ranked by relevance.',
+            'schema': {'type': 'string'},
+        }]
@@ -1,31 +1,70 @@
 from rest_framework import serializers
-from .models import Post, Comment
-from accounts.serializers import CustomUserSerializer 
+from .models import Post, Comment, comment_preview_limit
+from .threads import max_depth
+from accounts.serializers import UserSummarySerializer
 
 # --- Comment Serializer ---
 class CommentSerializer(serializers.ModelSerializer):
-    # Nested serializer to display the author's details instead of just ID
-    author = CustomUserSerializer(read_only=True) 
+    # Compact author embed (id, username, avatar) instead of just the ID
+    author = UserSummarySerializer(read_only=True)
     
     # This field is required for the PostDetailView to receive the post ID
     post_id = serializers.IntegerField(write_only=True)
 
+    # Comment being replied to (omit or null for a top-level comment)
+    parent = serializers.PrimaryKeyRelatedField(
+        queryset=Comment.objects.only('id', 'post', 'path', 'depth', 'author'),
+        required=False, allow_null=True,
+    )
+
     class Meta:
         model = Comment
-        fields = ('id', 'post', 'post_id', 'author', 'content', 'created_at', 'updated_at')
+        fields = (
+            'id', 'post', 'post_id', 'parent', 'depth', 'reply_count',
+            'author', 'content', 'created_at', 'updated_at'
+        )
         # post is read-only because it's set on the server side or linked via post_id
-        read_only_fields = ('post', 'author', 'created_at', 'updated_at')
+        read_only_fields = ('post', 'depth', 'reply_count', 'author', 'created_at', 'updated_at')
+
+    def validate_parent(self, parent):
+        if self.instance is not None:
+            # Moving a comment would invalidate the paths of its whole subtree
+            if parent != self.instance.parent:
+                raise serializers.ValidationError('A comment cannot be moved to another thread.')
+            return parent
+        if parent is None:
+            return parent
+        post_pk = self.context['view'].kwargs.get('post_pk')
+        if str(parent.post_id) != str(post_pk):
+            raise serializers.ValidationError('Replies must be on the same post as their parent.')
+        if parent.depth >= max_depth():
+            raise serializers.ValidationError(f'Replies can be nested at most {max_depth()} levels deep.')
+        return parent
+
+# --- Comment Preview (first comments embedded in post responses) ---
+class CommentPreviewSerializer(serializers.ModelSerializer):
+    author = UserSummarySerializer(read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ('id', 'author', 'content', 'reply_count', 'created_at')
+        read_only_fields = fields
 
 # --- Post Serializer ---
 class PostSerializer(serializers.ModelSerializer):
-    # Nested serializer for the author
-    author = CustomUserSerializer(read_only=True) 
+    """
+    Detail representation. Comments are not embedded in full: posts carry
+    comment_count and the first few comments, and the complete, paginated
+    list is served by /posts/<id>/comments/.
+    """
+    # Compact author embed; the follower graph has its own endpoints
+    author = UserSummarySerializer(read_only=True)
     
-    # Nested serializer for comments (read-only list on the detail view)
-    comments = CommentSerializer(many=True, read_only=True) 
+    # First POST_COMMENT_PREVIEWS top-level comments, oldest first
+    comment_previews = serializers.SerializerMethodField()
     
-    # Read-only field to display the count of likes
-    likes_count = serializers.SerializerMethodField()
+    # Read-only field to display the count of likes (denormalized counter)
+    likes_count = serializers.IntegerField(source='like_count', read_only=True)
     
     # Boolean field indicating if the requesting user has liked the post (useful for UI)
     is_liked = serializers.SerializerMethodField()
@@ -34,19 +73,65 @@ class PostSerializer(serializers.ModelSerializer):
         model = Post
         fields = (
             'id', 'author', 'content', 'created_at', 'updated_at',
-            'likes', 'likes_count', 'is_liked', 'comments'
+            'likes', 'likes_count', 'is_liked', 'comment_count', 'comment_previews'
         )
         # Author, timestamps, and likes list are set/managed by the server
-        read_only_fields = ('author', 'created_at', 'updated_at', 'likes') 
+        read_only_fields = ('author', 'created_at', 'updated_at', 'likes', 'comment_count') 
 
-    def get_likes_count(self, obj):
-        # Compute and return the number of likes
-        return obj.likes.count()
-    
     def get_is_liked(self, obj):
+        # Use the annotation from Post.objects.for_listing() when present
+        if hasattr(obj, 'viewer_has_liked'):
+            return obj.viewer_has_liked
         # Check if the requesting user is in the 'likes' queryset
         user = self.context['request'].user
         if user.is_authenticated:
             # Check if the user is in the list of users who liked this post
             return obj.likes.filter(pk=user.pk).exists()
         return False
+
+    def get_comment_previews(self, obj):
+        # Prefetched by Post.objects.for_listing(); freshly saved posts query directly
+        if hasattr(obj, 'preview_comments'):
+            comments = obj.preview_comments
+        else:
+            comments = (
+                obj.comments.filter(parent__isnull=True).select_related('author')
+                .order_by('created_at', 'id')[:comment_preview_limit()]
+            )
+        return CommentPreviewSerializer(comments, many=True, context=self.context).data
+
+
+class PostListSerializer(PostSerializer):
+    """List/feed representation: PostSerializer without the list of likers."""
+
+    class Meta(PostSerializer.Meta):
+        fields = tuple(field for field in PostSerializer.Meta.fields if field != 'likes')
+
+
+# --- Bulk Post Creation (posts.bulk) ---
+class PostBulkSerializer(serializers.ListSerializer):
+    """
+    Validates a batch of posts item by item. Valid items end up in
+    validated_data and invalid ones in item_errors ({index: errors}), so one
+    bad item does not reject the rest of the batch.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'posts': ['Expected a list of posts.']})
+        if not data:
+            raise serializers.ValidationError({'posts': ['Provide at least one post.']})
+        if self.max_length is not None and len(data) > self.max_length:
+            raise serializers.ValidationError({'posts': [f'At most {self.max_length} posts per request.']})
+
+        self.item_errors = {}
+        self.valid_indexes = []
+        validated = []
+        for index, item in enumerate(data):
+            try:
+                validated.append(self.child.run_validation(item))
+            except serializers.ValidationError as exc:
+                self.item_errors[index] = exc.detail
+            else:
+                self.valid_indexes.append(index)
+        return validated
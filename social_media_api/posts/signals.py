@@ -0,0 +1,57 @@
+"""
+Receivers of the posts app that keep cached post responses (posts.caching) and
+the search index (posts.search) fresh. Likes move the post's validators in
+their own counter UPDATE (posts.likes).
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import search
+from .caching import USER_SUMMARY_STATE_FIELDS, touch_commented_posts, touch_post
+from .models import Comment, Post
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'content' in update_fields:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(pre_save, sender=Comment)
+def check_comment_path(sender, instance, raw=False, **kwargs):
+    # Fixtures (loaddata) bypass Comment.save(), so their rows must carry the path
+    if raw and not instance.path:
+        raise ValueError(f'Comment {instance.pk} has no path.')
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, origin=None, **kwargs):
+    # Comments deleted along with their post have nothing left to touch
+    if not isinstance(origin, Post):
+        touch_post(instance.post_id)
+
+
+# Post bodies embed the authors of their comment previews, whose username and
+# picture are not part of the post's validators
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def user_summary_changing(sender, instance, update_fields=None, raw=False, **kwargs):
+    instance._summary_changed = False
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(USER_SUMMARY_STATE_FIELDS) & set(update_fields):
+        return
+    old = sender.objects.filter(pk=instance.pk).values_list(*USER_SUMMARY_STATE_FIELDS).first()
+    new = (instance.username, instance.profile_picture.name)
+    instance._summary_changed = old is not None and tuple(value or '' for value in old) != tuple(value or '' for value in new)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_summary_changed(sender, instance, **kwargs):
+    if getattr(instance, '_summary_changed', False):
+        touch_commented_posts(instance.pk)
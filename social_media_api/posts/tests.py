@@ -1,3 +1,742 @@
-from django.test import TestCase
+import json
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core import serializers
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from . import search
+from .likes import add_like
+from .threads import MAX_PATH_DEPTH, max_depth
+from .trending import compute_trending
+from .models import Comment, Like, Post, PostScore, TimelineEntry
+from .timeline import fan_out_post
+
+User = get_user_model()
+
+
+class UserFeedTests(APITestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', password='pass-12345')
+        self.author = User.objects.create_user(username='author', password='pass-12345')
+        self.stranger = User.objects.create_user(username='stranger', password='pass-12345')
+        self.client.force_authenticate(self.reader)
+
+    def create_post(self, user, content):
+        # Reload counters the way token authentication would
+        user.refresh_from_db()
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/posts/', {'content': content}, format='json')
+        self.client.force_authenticate(self.reader)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def feed_ids(self):
+        response = self.client.get('/api/feed/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        self.client.post(f'/api/follow/{self.author.pk}/')
+        post_id = self.create_post(self.author, 'hello followers')
+        self.create_post(self.stranger, 'not followed')
+
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader, post_id=post_id).exists())
+        self.assertEqual(self.feed_ids(), [post_id])
+
+    def test_follow_backfills_and_unfollow_clears_timeline(self):
+        post_id = self.create_post(self.author, 'written before the follow')
+
+        self.client.post(f'/api/follow/{self.author.pk}/')
+        self.assertEqual(self.feed_ids(), [post_id])
+
+        self.client.post(f'/api/unfollow/{self.author.pk}/')
+        self.assertEqual(self.feed_ids(), [])
+
+    @override_settings(FEED_FANOUT_FOLLOWER_LIMIT=0)
+    def test_large_accounts_are_read_on_demand(self):
+        self.client.post(f'/api/follow/{self.author.pk}/')
+        post_id = self.create_post(self.author, 'celebrity post')
+
+        self.assertFalse(TimelineEntry.objects.filter(post_id=post_id).exists())
+        self.assertEqual(self.feed_ids(), [post_id])
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_feed_merges_timeline_and_pulled_authors_in_order(self):
+        self.client.post(f'/api/follow/{self.author.pk}/')
+        self.client.post(f'/api/follow/{self.stranger.pk}/')
+        pushed = [self.create_post(self.author, f'pushed {i}') for i in range(2)]
+        with override_settings(FEED_FANOUT_FOLLOWER_LIMIT=0):
+            pulled = [self.create_post(self.stranger, f'pulled {i}') for i in range(2)]
+        newest_first = [pulled[1], pulled[0], pushed[1], pushed[0]]
+
+        with override_settings(FEED_FANOUT_FOLLOWER_LIMIT=0):
+            self.assertEqual(self.feed_ids(), newest_first)
+            self.assertEqual(self.client.get('/api/feed/').data['count'], 4)
+            # Keyset pages walk the same merged order
+            seen, url = [], '/api/feed/?cursor=&page_size=3'
+            while url:
+                response = self.client.get(url)
+                seen += [post['id'] for post in response.data['results']]
+                url = response.data['next']
+            self.assertEqual(seen, newest_first)
+
+    @override_settings(FEED_FANOUT_FOLLOWER_LIMIT=1, FEED_FANOUT_RESUME_FOLLOWER_LIMIT=1, FEED_RESUME_POSTS=1)
+    def test_author_back_under_the_limit_is_fanned_out_by_the_cron(self):
+        self.client.post(f'/api/follow/{self.author.pk}/')
+        self.client.force_authenticate(self.stranger)
+        self.client.post(f'/api/follow/{self.author.pk}/')
+        older = self.create_post(self.author, 'written while pulled')
+        newer = self.create_post(self.author, 'also written while pulled')
+        self.assertFalse(TimelineEntry.objects.filter(author=self.author).exists())
+
+        # Unfollowing writes nothing; the author stays pulled until the cron runs
+        self.client.force_authenticate(self.stranger)
+        self.client.post(f'/api/unfollow/{self.author.pk}/')
+        self.client.force_authenticate(self.reader)
+        self.assertFalse(TimelineEntry.objects.filter(author=self.author).exists())
+        self.assertEqual(self.feed_ids(), [newer, older])
+
+        call_command('trim_timelines', stdout=StringIO())
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.feed_pulled)
+        # Only the FEED_RESUME_POSTS most recent posts are materialized
+        self.assertEqual(list(TimelineEntry.objects.values_list('post_id', flat=True)), [newer])
+        self.assertEqual(self.create_post(self.author, 'fanned out again'), self.feed_ids()[0])
+
+    @override_settings(FEED_FANOUT_FOLLOWER_LIMIT=1)
+    def test_authors_near_the_limit_stay_pulled(self):
+        self.client.post(f'/api/follow/{self.author.pk}/')
+        self.client.force_authenticate(self.stranger)
+        self.client.post(f'/api/follow/{self.author.pk}/')
+        self.create_post(self.author, 'written while pulled')
+        self.client.force_authenticate(self.stranger)
+        self.client.post(f'/api/unfollow/{self.author.pk}/')
+
+        # One follower is at the fan-out limit but above the resume limit (0)
+        call_command('trim_timelines', stdout=StringIO())
+        self.author.refresh_from_db()
+        self.assertTrue(self.author.feed_pulled)
+        post_id = self.create_post(self.author, 'still pulled')
+        self.assertFalse(TimelineEntry.objects.filter(post_id=post_id).exists())
+        self.assertEqual(self.feed_ids()[0], post_id)
+
+    def test_trim_timelines_keeps_the_newest_entries(self):
+        self.client.post(f'/api/follow/{self.author.pk}/')
+        posts = [self.create_post(self.author, f'post {i}') for i in range(4)]
+        call_command('trim_timelines', keep=2, stdout=StringIO())
+        self.assertEqual(self.feed_ids(), [posts[3], posts[2]])
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='pass-12345')
+        self.client.force_authenticate(self.user)
+        self.posts = [Post.objects.create(author=self.user, content=f'post {i}') for i in range(25)]
+
+    def test_cursor_walks_every_post_once_without_count(self):
+        seen = []
+        url = '/api/posts/?cursor=&page_size=10'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(post['id'] for post in response.data['results'])
+            url = response.data['next']
+
+        expected = sorted(self.posts, key=lambda post: (post.created_at, post.pk), reverse=True)
+        self.assertEqual(seen, [post.pk for post in expected])
+
+    def test_page_number_mode_is_still_the_default(self):
+        response = self.client.get('/api/posts/')
+        self.assertEqual(response.data['count'], 25)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get('/api/posts/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PostQueryCountTests(APITestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='viewer', password='pass-12345')
+        self.client.force_authenticate(self.viewer)
+
+    def add_posts(self, count):
+        for i in range(count):
+            author = User.objects.create_user(username=f'author{Post.objects.count()}')
+            author.followers.add(self.viewer)
+            post = Post.objects.create(author=author, content=f'post {i}')
+            fan_out_post(post)
+            # Through add_like, so the denormalized like_count is kept in step
+            add_like(post.pk, self.viewer)
+            add_like(post.pk, author)
+            Comment.objects.create(post=post, author=author, content='first')
+            Comment.objects.create(post=post, author=self.viewer, content='second')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_post_list_query_count_does_not_grow_with_page_size(self):
+        self.add_posts(2)
+        small, _ = self.count_queries('/api/posts/')
+        self.add_posts(8)
+        large, response = self.count_queries('/api/posts/')
+
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(small, large)
+        self.assertTrue(response.data['results'][0]['is_liked'])
+        self.assertEqual(response.data['results'][0]['likes_count'], 2)
+        # Authors are compact summaries, not the follower graph
+        post = response.data['results'][0]
+        self.assertEqual(set(post['author']), {'id', 'username', 'avatar'})
+        self.assertEqual(set(post['comment_previews'][0]['author']), {'id', 'username', 'avatar'})
+
+    @override_settings(POST_COMMENT_PREVIEWS=2)
+    def test_list_embeds_only_comment_previews(self):
+        self.add_posts(1)
+        post = Post.objects.get()
+        for i in range(5):
+            Comment.objects.create(post=post, author=self.viewer, content=f'reply {i}')
+        Post.objects.filter(pk=post.pk).update(comment_count=7)
+
+        _, response = self.count_queries('/api/posts/')
+        listed = response.data['results'][0]
+        self.assertNotIn('comments', listed)
+        self.assertNotIn('likes', listed)
+        self.assertEqual(listed['comment_count'], 7)
+        self.assertEqual([comment['content'] for comment in listed['comment_previews']], ['first', 'second'])
+
+        # The detail view keeps the likers; comments come from the comment route
+        detail = self.client.get(f'/api/posts/{post.pk}/').data
+        self.assertEqual(len(detail['likes']), 2)
+        self.assertEqual(len(detail['comment_previews']), 2)
+
+    def test_feed_query_count_does_not_grow_with_page_size(self):
+        self.add_posts(2)
+        small, _ = self.count_queries('/api/feed/')
+        self.add_posts(8)
+        large, response = self.count_queries('/api/feed/')
+
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(small, large)
+
+
+class CounterTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass-12345')
+        self.fan = User.objects.create_user(username='fan', password='pass-12345')
+        self.post = Post.objects.create(author=self.author, content='counted')
+        self.client.force_authenticate(self.fan)
+
+    def test_like_and_comment_counters_follow_writes(self):
+        self.client.post(f'/api/posts/{self.post.pk}/like/')
+        response = self.client.post(f'/api/posts/{self.post.pk}/comments/', {'content': 'hi', 'post_id': self.post.pk})
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 1))
+
+        self.client.post(f'/api/posts/{self.post.pk}/like/')
+        self.client.delete(f'/api/posts/comments/{response.data["id"]}/')
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (0, 0))
+
+    def test_like_endpoint_and_serializer_share_one_table(self):
+        self.client.post(f'/api/posts/{self.post.pk}/like/')
+        response = self.client.get(f'/api/posts/{self.post.pk}/')
+        self.assertEqual(response.data['likes'], [self.fan.pk])
+        self.assertTrue(response.data['is_liked'])
+        self.assertEqual(list(self.post.likes.all()), [self.fan])
+
+    def test_follow_counters_ignore_repeated_requests(self):
+        self.client.post(f'/api/follow/{self.author.pk}/')
+        self.client.post(f'/api/follow/{self.author.pk}/')
+        self.author.refresh_from_db()
+        self.fan.refresh_from_db()
+        self.assertEqual((self.author.follower_count, self.fan.following_count), (1, 1))
+
+        self.client.post(f'/api/unfollow/{self.author.pk}/')
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.follower_count, 0)
+
+    def test_popularity_ordering_uses_counters(self):
+        popular = Post.objects.create(author=self.author, content='popular', like_count=5)
+        response = self.client.get('/api/posts/?ordering=-like_count&like_count__gte=1')
+        self.assertEqual([post['id'] for post in response.data['results']], [popular.pk])
+
+    def test_reconcile_counters_fixes_drift(self):
+        Like.objects.create(post=self.post, user=self.fan)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=7)
+        User.objects.filter(pk=self.author.pk).update(follower_count=3)
+
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 0))
+        self.assertEqual(self.author.follower_count, 0)
+
+
+class LikeStateTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass-12345')
+        self.fan = User.objects.create_user(username='fan', password='pass-12345')
+        self.post = Post.objects.create(author=self.author, content='like me')
+        self.url = f'/api/posts/{self.post.pk}/like/'
+        self.client.force_authenticate(self.fan)
+
+    def test_put_and_delete_are_idempotent(self):
+        self.assertEqual(self.client.put(self.url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.put(self.url).status_code, status.HTTP_200_OK)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(self.author.notifications.filter(verb='liked').count(), 1)
+
+        self.client.delete(self.url)
+        self.client.delete(self.url)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+        self.assertFalse(self.author.notifications.exists())
+
+    def test_put_on_missing_post_returns_404(self):
+        response = self.client.put('/api/posts/999999/like/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Like.objects.exists())
+
+    def statements(self, method):
+        ContentType.objects.get_for_model(Post)  # warm the ContentType cache
+        with CaptureQueriesContext(connection) as queries:
+            method(self.url)
+        return [
+            query['sql'].split()[0] for query in queries
+            if 'SAVEPOINT' not in query['sql']
+        ]
+
+    def test_like_writes_do_not_read_the_post(self):
+        # INSERT ... ON CONFLICT, counter UPDATE ... RETURNING, then the notification
+        # rollup: actor usernames, open group lookup, INSERT, unread counter UPDATE, actor link INSERT
+        self.assertEqual(
+            self.statements(self.client.put), ['INSERT', 'UPDATE', 'SELECT', 'SELECT', 'INSERT', 'UPDATE', 'INSERT']
+        )
+        # DELETE like, counter UPDATE ... RETURNING, actor link lookup, DELETE links and
+        # rollup, unread counter UPDATE
+        self.assertEqual(
+            self.statements(self.client.delete), ['DELETE', 'UPDATE', 'SELECT', 'DELETE', 'DELETE', 'UPDATE']
+        )
+
+    def test_counter_falls_back_to_update_then_read(self):
+        with mock.patch('posts.likes.supports_returning', return_value=False):
+            self.assertEqual(self.client.put(self.url).status_code, status.HTTP_201_CREATED)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(self.author.notifications.filter(verb='liked').count(), 1)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', password='pass-12345')
+        self.fan = User.objects.create_user(username='fan', password='pass-12345')
+        self.post = Post.objects.create(author=self.author, content='cache me')
+        self.url = f'/api/posts/{self.post.pk}/'
+        self.client.force_authenticate(self.fan)
+
+    def test_matching_etag_returns_304_with_one_query(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_likes_and_comments_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f'{self.url}like/')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['is_liked'])
+        self.assertEqual(response.data['likes_count'], 1)
+
+        # Editing a comment leaves the post row alone but rotates its version
+        comment = Comment.objects.create(post=self.post, author=self.fan, content='first')
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f'/api/posts/comments/{comment.pk}/', {'content': 'edited', 'post_id': self.post.pk})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['comment_previews'][0]['content'], 'edited')
+
+    def test_validators_come_from_the_database(self):
+        etag = self.client.get(self.url)['ETag']
+        # Another process (or a cleared cache) computes the same validator
+        cache.clear()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # The body embeds the author, so renaming them changes it
+        User.objects.filter(pk=self.author.pk).update(username='renamed')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['author']['username'], 'renamed')
+
+    def test_renamed_commenters_change_the_etag(self):
+        Comment.objects.create(post=self.post, author=self.fan, content='first')
+        etag = self.client.get(self.url)['ETag']
+
+        # Logins only touch last_login and leave the post alone
+        self.fan.last_login = timezone.now()
+        self.fan.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.fan.username = 'superfan'
+        self.fan.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['comment_previews'][0]['author']['username'], 'superfan')
+
+    def test_comment_etag_is_not_answered_for_another_post(self):
+        other = Post.objects.create(author=self.author, content='other')
+        comment = Comment.objects.create(post=self.post, author=self.fan, content='hi')
+        etag = self.client.get(f'/api/posts/{self.post.pk}/comments/{comment.pk}/')['ETag']
+        response = self.client.get(f'/api/posts/{other.pk}/comments/{comment.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_comment_routes_support_conditional_get(self):
+        comment = Comment.objects.create(post=self.post, author=self.fan, content='hi')
+        for url in (f'/api/posts/{self.post.pk}/comments/', f'/api/posts/comments/{comment.pk}/'):
+            etag = self.client.get(url)['ETag']
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='pass-12345')
+        self.client.force_authenticate(self.user)
+        self.once = Post.objects.create(author=self.user, content='A short note about django.')
+        self.twice = Post.objects.create(author=self.user, content='Django, django and more django tips.')
+        Post.objects.create(author=self.user, content='Nothing relevant here.')
+
+    def search(self, term):
+        response = self.client.get('/api/posts/', {'search': term})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def test_results_are_ranked_and_follow_edits(self):
+        self.assertEqual(self.search('django'), [self.twice.pk, self.once.pk])
+        # Query syntax characters are treated as plain words
+        self.assertEqual(self.search('"django" OR'), [])
+
+        self.once.content = 'Now about flask.'
+        self.once.save()
+        self.twice.delete()
+        self.assertEqual(self.search('django'), [])
+        self.assertEqual(self.search('flask'), [self.once.pk])
+
+    def test_cursor_pages_keep_relevance_order(self):
+        faint = Post.objects.create(
+            author=self.user, content='One django mention lost among many other words in a long rambling post.',
+        )
+        ranked = self.search('django')
+        self.assertEqual(ranked[0], self.twice.pk)
+        self.assertNotEqual(ranked, [faint.pk, self.twice.pk, self.once.pk])  # not newest first
+
+        for backend in ('auto', 'python'):
+            with self.subTest(backend=backend), override_settings(POST_SEARCH_BACKEND=backend):
+                seen, url = [], '/api/posts/?search=django&cursor=&page_size=1'
+                while url:
+                    response = self.client.get(url)
+                    seen += [post['id'] for post in response.data['results']]
+                    url = response.data['next']
+                self.assertEqual(seen, ranked)
+
+    @override_settings(POST_SEARCH_BACKEND='python')
+    def test_python_fallback_index(self):
+        search.python_index.built = False
+        self.assertEqual(self.search('django tips'), [self.twice.pk])
+        self.assertEqual(self.search('django'), [self.twice.pk, self.once.pk])
+
+        Post.objects.create(author=self.user, content='More django tips, django forever.')
+        self.assertEqual(len(self.search('tips')), 2)
+
+    @override_settings(POST_SEARCH_BACKEND='python')
+    def test_python_index_sees_posts_written_by_other_processes(self):
+        search.python_index.built = False
+        self.assertEqual(self.search('flask'), [])
+        # bulk_create sends no signals, like a write made by another worker
+        other, = Post.objects.bulk_create([Post(author=self.user, content='Flask, written elsewhere.')])
+        self.assertEqual(self.search('flask'), [other.pk])
+
+        Post.objects.filter(pk=other.pk).delete()
+        self.assertEqual(self.search('flask'), [])
+        with mock.patch('time.monotonic', return_value=time.monotonic() + search.PYTHON_INDEX_MAX_AGE):
+            self.search('flask')
+        self.assertNotIn(other.pk, search.python_index.lengths)
+
+    @override_settings(POST_SEARCH_BACKEND='python')
+    def test_python_results_flag_truncation(self):
+        self.assertNotIn('X-Search-Truncated', self.client.get('/api/posts/', {'search': 'django'}))
+        with mock.patch.object(search, 'PYTHON_RESULT_LIMIT', 1):
+            response = self.client.get('/api/posts/', {'search': 'django'})
+        self.assertEqual([post['id'] for post in response.data['results']], [self.twice.pk])
+        self.assertEqual(response['X-Search-Truncated'], 'true')
+
+
+@override_settings(TRENDING={'SETTLE_SECONDS': 0})
+class TrendingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='pass-12345')
+        self.fans = [User.objects.create_user(username=f'fan{i}') for i in range(3)]
+        self.old = Post.objects.create(author=self.user, content='Yesterday\'s news')
+        self.new = Post.objects.create(author=self.user, content='Fresh')
+        self.quiet = Post.objects.create(author=self.user, content='Nobody cares')
+        for fan in self.fans:
+            Like.objects.create(post=self.old, user=fan)
+        # Three likes two days ago weigh less than two likes now (24h half-life)
+        Like.objects.filter(post=self.old).update(created_at=timezone.now() - timedelta(days=2))
+        for fan in self.fans[:2]:
+            Like.objects.create(post=self.new, user=fan)
+
+    def trending(self, **params):
+        response = self.client.get('/api/posts/trending/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_recent_activity_ranks_first(self):
+        compute_trending()
+        self.assertEqual([post['id'] for post in self.trending()['results']], [self.new.pk, self.old.pk])
+
+    def test_incremental_runs_only_read_new_activity(self):
+        first = compute_trending()
+        Comment.objects.create(post=self.old, author=self.fans[0], content='Still relevant')
+        Comment.objects.create(post=self.old, author=self.fans[1], content='Agreed')
+
+        second = compute_trending()
+        self.assertFalse(second.full)
+        # Only the commented post was touched; no like was read again
+        self.assertEqual(second.posts_updated, 1)
+        self.assertEqual(second.last_like_id, first.last_like_id)
+        self.assertEqual([post['id'] for post in self.trending()['results']], [self.old.pk, self.new.pk])
+
+        # A full rebuild reaches the same scores
+        incremental = dict(PostScore.objects.values_list('post_id', 'score'))
+        compute_trending(full=True)
+        for post_id, score in PostScore.objects.values_list('post_id', 'score'):
+            self.assertAlmostEqual(score, incremental[post_id], places=6)
+
+    def test_full_runs_skip_past_activity_older_than_the_window(self):
+        Like.objects.update(created_at=timezone.now() - timedelta(days=30))
+        run = compute_trending(full=True)
+        self.assertEqual(run.posts_updated, 0)
+        self.assertEqual(run.last_like_id, Like.objects.latest('pk').pk)
+
+        # The old likes are not folded in by the next incremental run either
+        self.assertEqual(compute_trending().posts_updated, 0)
+        self.assertFalse(PostScore.objects.exists())
+
+    def test_pages_follow_the_score_index(self):
+        compute_trending()
+        page = self.trending(page_size=1)
+        self.assertEqual([post['id'] for post in page['results']], [self.new.pk])
+        response = self.client.get(page['next'])
+        self.assertEqual([post['id'] for post in response.data['results']], [self.old.pk])
+        self.assertIsNone(response.data['next'])
+
+
+class CommentPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='pass-12345')
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(author=self.user, content='Discuss')
+        self.url = f'/api/posts/{self.post.pk}/comments/'
+        for i in range(5):
+            Comment.objects.create(post=self.post, author=self.user, content=f'comment {i}')
+
+    def contents(self, response):
+        return [comment['content'] for comment in response.data['results']]
+
+    def test_cursor_pages_oldest_first_without_count(self):
+        response = self.client.get(self.url, {'cursor': '', 'page_size': 3})
+        self.assertNotIn('count', response.data)
+        self.assertEqual(self.contents(response), ['comment 0', 'comment 1', 'comment 2'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(self.contents(response), ['comment 3', 'comment 4'])
+        self.assertIsNone(response.data['next'])
+
+    def test_since_returns_only_new_comments(self):
+        since = self.client.get(self.url, {'since': ''}).data['since']
+        # Nothing new: no rows, and the same position to poll from
+        response = self.client.get(self.url, {'since': since})
+        self.assertEqual((self.contents(response), response.data['since']), ([], since))
+
+        Comment.objects.create(post=self.post, author=self.user, content='late reply')
+        response = self.client.get(self.url, {'since': since})
+        self.assertEqual(self.contents(response), ['late reply'])
+        self.assertNotEqual(response.data['since'], since)
+
+
+class ThreadTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='pass-12345')
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(author=self.user, content='Discuss')
+
+    def reply(self, content, parent=None, post=None):
+        post = post or self.post
+        data = {'content': content, 'post_id': post.pk}
+        if parent is not None:
+            data['parent'] = parent
+        return self.client.post(f'/api/posts/{post.pk}/comments/', data)
+
+    def test_thread_is_depth_first_and_counts_replies(self):
+        first = self.reply('first').data['id']
+        second = self.reply('second').data['id']
+        child = self.reply('child', first).data['id']
+        self.reply('grandchild', child)
+        self.reply('sibling', first)
+
+        response = self.client.get(f'/api/posts/{self.post.pk}/thread/')
+        self.assertEqual(
+            [(comment['content'], comment['depth']) for comment in response.data['results']],
+            [('first', 0), ('child', 1), ('grandchild', 2), ('sibling', 1), ('second', 0)],
+        )
+        self.assertEqual(Comment.objects.get(pk=first).reply_count, 3)
+        self.assertEqual(Comment.objects.get(pk=second).reply_count, 0)
+
+        response = self.client.get(f'/api/posts/comments/{first}/replies/', {'max_depth': 0})
+        self.assertEqual([comment['content'] for comment in response.data['results']], ['child', 'sibling'])
+
+        # Deleting a reply removes its subtree from every counter
+        self.client.delete(f'/api/posts/comments/{child}/')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+        self.assertEqual(Comment.objects.get(pk=first).reply_count, 1)
+
+    @override_settings(COMMENT_MAX_DEPTH=1)
+    def test_replies_are_validated(self):
+        top = self.reply('top').data['id']
+        child = self.reply('child', top).data['id']
+        self.assertEqual(self.reply('too deep', child).status_code, status.HTTP_400_BAD_REQUEST)
+
+        other = Post.objects.create(author=self.user, content='Elsewhere')
+        self.assertEqual(self.reply('wrong post', top, post=other).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+    @override_settings(COMMENT_MAX_DEPTH=50)
+    def test_depth_is_limited_to_what_paths_hold(self):
+        self.assertEqual(max_depth(), MAX_PATH_DEPTH)
+        parent = None
+        for _ in range(MAX_PATH_DEPTH + 1):
+            parent = Comment.objects.create(post=self.post, author=self.user, content='deeper', parent=parent)
+        self.assertEqual(len(parent.path), 255 // 12 * 12)
+        self.assertEqual(self.reply('too deep', parent.pk).status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertRaises(ValueError):
+            Comment.objects.create(post=self.post, author=self.user, content='too deep', parent=parent)
+
+    def test_comments_without_a_path_are_rejected(self):
+        with self.assertRaises(ValueError):
+            Comment.objects.bulk_create([Comment(post=self.post, author=self.user, content='no path')])
+
+        fixture = json.dumps([{'model': 'posts.comment', 'pk': 999, 'fields': {
+            'post': self.post.pk, 'author': self.user.pk, 'content': 'no path', 'path': '',
+            'created_at': '2024-01-01T00:00:00Z', 'updated_at': '2024-01-01T00:00:00Z',
+        }}])
+        with self.assertRaises(ValueError):
+            for item in serializers.deserialize('json', fixture):
+                item.save()
+        self.assertFalse(Comment.objects.filter(pk=999).exists())
+
+        # A failed path write takes the INSERT with it
+        with mock.patch.object(Comment.objects, 'filter', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                Comment.objects.create(post=self.post, author=self.user, content='half written')
+        self.assertFalse(Comment.objects.filter(content='half written').exists())
+
+class BulkCreateTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='importer', password='pass-12345')
+        self.followers = [User.objects.create_user(username=f'reader{i}') for i in range(3)]
+        for follower in self.followers:
+            self.client.force_authenticate(follower)
+            self.client.post(f'/api/follow/{self.author.pk}/')
+        self.author.refresh_from_db()
+        self.client.force_authenticate(self.author)
+
+    def test_valid_items_are_created_and_fanned_out(self):
+        posts = [{'content': 'partner feed one'}, {'content': ''}, {'content': 'partner feed two'}]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/posts/bulk/', {'posts': posts}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([(post['index'], post['content']) for post in response.data['created']],
+                         [(0, 'partner feed one'), (2, 'partner feed two')])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        # One INSERT for the posts and one for the timeline entries, whatever the batch size
+        inserts = [query for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len([q for q in inserts if 'posts_post"' in q['sql']]), 1)
+        self.assertEqual(len([q for q in inserts if 'posts_timelineentry' in q['sql']]), 1)
+
+        self.assertEqual(TimelineEntry.objects.filter(user=self.followers[0]).count(), 2)
+        self.client.force_authenticate(self.followers[0])
+        response = self.client.get('/api/posts/', {'search': 'partner'})
+        self.assertEqual(len(response.data['results']), 2)
+
+    @override_settings(POST_BULK_CREATE_MAX=2)
+    def test_rejects_oversized_or_all_invalid_batches(self):
+        response = self.client.post('/api/posts/bulk/', [{'content': 'x'}] * 3, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/posts/bulk/', {'posts': [{'content': ''}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='archivist', password='pass-12345')
+        other = User.objects.create_user(username='other')
+        self.posts = [Post.objects.create(author=self.user, content=f'post {i}') for i in range(3)]
+        theirs = Post.objects.create(author=other, content='not mine')
+        Comment.objects.create(post=theirs, author=self.user, content='nice')
+        Comment.objects.create(post=self.posts[0], author=other, content='not mine either')
+        Like.objects.create(post=theirs, user=self.user)
+
+    def records(self, content):
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_streams_only_the_users_rows_as_ndjson(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        chunks = list(response.streaming_content)
+        # Written in EXPORT_CHUNK_SIZE-line chunks rather than one body
+        self.assertEqual(len(chunks), 3)
+        records = self.records(b''.join(chunks))
+        self.assertEqual(records[0]['username'], 'archivist')
+        self.assertEqual(
+            [(record['type'], record.get('content')) for record in records[1:]],
+            [('post', 'post 0'), ('post', 'post 1'), ('post', 'post 2'), ('comment', 'nice'), ('like', None)],
+        )
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.client.get('/api/export/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_asgi_stream_is_asynchronous(self):
+        token = await Token.objects.acreate(user=self.user)
+        response = await self.async_client.get('/api/export/', headers={'authorization': f'Token {token.key}'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(self.records(content)), 6)
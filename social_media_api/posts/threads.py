@@ -0,0 +1,72 @@
+"""
+Threaded comment replies, stored as materialized paths.
+
+Comment.path is the chain of comment ids from the top-level comment down to
+the comment itself, each written as a SEGMENT_WIDTH-digit zero-padded number:
+'000000000042000000000057' is comment 57 replying to comment 42. Every segment
+has the same width and holds only digits, so under any collation:
+
+* ordering by path lists a thread depth-first with siblings oldest first,
+  i.e. in display order, and
+* the replies below a comment are exactly the range
+  ``path > P AND path < subtree_upper_bound(P)``,
+
+both answered by one range scan of the (post, path) index.
+
+Comment.reply_count counts all replies below a comment (not only direct ones).
+Ancestors are read from the path, so adding or deleting a reply updates their
+counters with a single UPDATE ... WHERE id IN (...).
+"""
+from django.conf import settings
+from django.db.models import F
+
+SEGMENT_WIDTH = 12
+# Deepest level whose path (depth + 1 segments) fits Comment.path's 255 characters
+MAX_PATH_DEPTH = 255 // SEGMENT_WIDTH - 1
+
+
+def max_depth():
+    """Deepest allowed reply level (top-level comments are depth 0), at most MAX_PATH_DEPTH."""
+    return min(getattr(settings, 'COMMENT_MAX_DEPTH', 8), MAX_PATH_DEPTH)
+
+
+def path_segment(comment_id):
+    return f'{comment_id:0{SEGMENT_WIDTH}d}'
+
+
+def ancestor_ids(path):
+    """Ids of the comments above the one with this path, top-level first."""
+    return [int(path[start:start + SEGMENT_WIDTH]) for start in range(0, len(path) - SEGMENT_WIDTH, SEGMENT_WIDTH)]
+
+
+def subtree_upper_bound(path):
+    """The first path after every path below this one: its last segment plus one."""
+    return path[:-SEGMENT_WIDTH] + path_segment(int(path[-SEGMENT_WIDTH:]) + 1)
+
+
+def replies_of(comment, queryset=None):
+    """Every reply below comment (at any depth), in display order."""
+    from .models import Comment
+
+    queryset = Comment.objects.all() if queryset is None else queryset
+    return queryset.filter(
+        post_id=comment.post_id, path__gt=comment.path, path__lt=subtree_upper_bound(comment.path),
+    ).order_by('path')
+
+
+def record_reply(comment):
+    """Count a new reply in every ancestor's reply_count."""
+    from .models import Comment
+
+    ancestors = ancestor_ids(comment.path)
+    if ancestors:
+        Comment.objects.filter(pk__in=ancestors).update(reply_count=F('reply_count') + 1)
+
+
+def record_subtree_removed(comment):
+    """Uncount a deleted comment and the replies deleted with it from its ancestors."""
+    from .models import Comment
+
+    ancestors = ancestor_ids(comment.path)
+    if ancestors:
+        Comment.objects.filter(pk__in=ancestors).update(reply_count=F('reply_count') - (1 + comment.reply_count))
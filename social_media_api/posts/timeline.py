@@ -0,0 +1,245 @@
+"""
+Materialized home timelines for UserFeedView.
+
+New posts are pushed ("fanned out") into a TimelineEntry row per follower when
+they are created, so a feed page is a range scan of the reader's entries on the
+(user, -created_at, -post) index. Authors with more followers than
+FEED_FANOUT_FOLLOWER_LIMIT are not fanned out; their posts are pulled at read
+time from the (author, -created_at, -id) post index and merged in (hybrid
+fan-out). Only the page's posts are then loaded (see Feed).
+
+Once one of an author's posts is skipped for being over the limit, the author
+is marked (CustomUser.feed_pulled) and stays pulled until their follower count
+falls to FEED_FANOUT_RESUME_FOLLOWER_LIMIT, somewhat below the fan-out limit so
+an author hovering around it does not flip back and forth. ``manage.py
+trim_timelines`` (cron) then resumes fan-out for such authors, pushing their
+FEED_RESUME_POSTS most recent posts to every follower; older posts from the
+pulled period are not re-materialized.
+
+Timelines keep at most FEED_TIMELINE_MAX_ENTRIES entries per user; older ones
+are trimmed by ``manage.py trim_timelines`` and after follow backfills.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import Post, TimelineEntry
+
+# Number of rows written per INSERT when pushing a post to followers
+FANOUT_BATCH_SIZE = 1000
+
+
+def fanout_follower_limit():
+    """Follower count above which an author is read on demand instead of fanned out."""
+    return getattr(settings, 'FEED_FANOUT_FOLLOWER_LIMIT', 10000)
+
+
+def resume_follower_limit():
+    """Follower count at or below which a pulled author is fanned out again (90% of the limit by default)."""
+    return getattr(settings, 'FEED_FANOUT_RESUME_FOLLOWER_LIMIT', fanout_follower_limit() * 9 // 10)
+
+
+def resume_post_limit():
+    """Number of recent posts pushed to followers when an author's fan-out resumes."""
+    return getattr(settings, 'FEED_RESUME_POSTS', 20)
+
+
+def backfill_post_limit():
+    """Number of recent posts copied into a timeline when a user follows someone."""
+    return getattr(settings, 'FEED_BACKFILL_POSTS', 200)
+
+
+def timeline_max_entries():
+    """Entries kept per timeline; older ones are trimmed (the feed then ends there)."""
+    return getattr(settings, 'FEED_TIMELINE_MAX_ENTRIES', 1000)
+
+
+def _bulk_insert(entries):
+    # ignore_conflicts makes fan-out idempotent (UniqueConstraint on user + post)
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Push a newly created post into the timeline of every follower of its author."""
+    fan_out_posts(post.author, [post])
+
+
+def fan_out_posts(author, posts):
+    """Push several new posts by the same author to the followers, reading the follower list once."""
+    if author.follower_count > fanout_follower_limit():
+        # Large accounts are merged into feeds at read time instead
+        if not author.feed_pulled:
+            type(author).objects.filter(pk=author.pk).update(feed_pulled=True)
+            author.feed_pulled = True
+        return
+    if author.feed_pulled:
+        # Pulled until trim_timelines resumes the author's fan-out
+        return
+
+    follower_ids = author.followers.values_list('pk', flat=True).iterator(chunk_size=FANOUT_BATCH_SIZE)
+    _bulk_insert(
+        TimelineEntry(user_id=follower_id, post_id=post.pk, author_id=author.pk, created_at=post.created_at)
+        for follower_id in follower_ids
+        for post in posts
+    )
+
+
+def backfill_timeline(user, author_ids):
+    """Copy recent posts of newly followed authors into the user's timeline."""
+    posts = (
+        Post.objects.filter(author_id__in=author_ids)
+        .order_by('-created_at', '-id')
+        .values_list('pk', 'author_id', 'created_at')[:backfill_post_limit()]
+    )
+    _bulk_insert(
+        TimelineEntry(user_id=user.pk, post_id=post_id, author_id=author_id, created_at=created_at)
+        for post_id, author_id, created_at in posts
+    )
+    trim_timeline(user.pk)
+
+
+def resume_fan_out():
+    """
+    Fan out again for pulled authors whose follower count has fallen to
+    resume_follower_limit(), pushing their few most recent posts to every
+    follower. Returns the number of authors resumed. Run from trim_timelines.
+    """
+    from accounts.models import CustomUser
+
+    authors = CustomUser.objects.filter(feed_pulled=True, follower_count__lte=resume_follower_limit()).only('pk')
+    resumed = 0
+    for author in authors.iterator():
+        # Unmarked first, so posts created from here on are fanned out as usual
+        # (the unique constraint drops any the copy below pushes twice)
+        if not CustomUser.objects.filter(pk=author.pk, feed_pulled=True).update(feed_pulled=False):
+            continue
+        posts = list(
+            Post.objects.filter(author=author).order_by('-created_at', '-id')
+            .values_list('pk', 'created_at')[:resume_post_limit()]
+        )
+        follower_ids = author.followers.values_list('pk', flat=True).iterator(chunk_size=FANOUT_BATCH_SIZE)
+        _bulk_insert(
+            TimelineEntry(user_id=follower_id, post_id=post_id, author_id=author.pk, created_at=created_at)
+            for follower_id in follower_ids
+            for post_id, created_at in posts
+        )
+        resumed += 1
+    return resumed
+
+
+def remove_from_timeline(user, author_ids):
+    """Drop the posts of unfollowed authors from the user's timeline."""
+    TimelineEntry.objects.filter(user=user, author_id__in=author_ids).delete()
+
+
+def trim_timeline(user_id, keep=None):
+    """Delete the user's entries beyond the newest `keep`; returns the number deleted."""
+    keep = timeline_max_entries() if keep is None else keep
+    stale = TimelineEntry.objects.filter(user_id=user_id)
+    if keep:
+        # The oldest entry still kept, found by walking the timeline index
+        boundary = list(
+            stale.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[keep - 1:keep]
+        )
+        if not boundary:
+            return 0
+        stale = stale.filter(_seek(boundary[0], 'created_at', 'post_id'))
+    return stale.delete()[0]
+
+
+def oversized_timelines(keep=None):
+    """Ids of users whose timeline holds more than `keep` entries."""
+    keep = timeline_max_entries() if keep is None else keep
+    return (
+        TimelineEntry.objects.values('user_id').annotate(entries=Count('pk'))
+        .filter(entries__gt=keep).values_list('user_id', flat=True)
+    )
+
+
+def pulled_author_ids(user):
+    """Ids of followed authors whose posts are merged into the feed at read time."""
+    return list(
+        user.following.filter(Q(follower_count__gt=fanout_follower_limit()) | Q(feed_pulled=True))
+        .values_list('pk', flat=True)
+    )
+
+
+def _seek(position, created_field, id_field):
+    """Rows strictly after position, a (created_at, id) pair, in newest-first order."""
+    created_at, pk = position
+    return Q(**{f'{created_field}__lt': created_at}) | Q(**{created_field: created_at, f'{id_field}__lt': pk})
+
+
+class Feed:
+    """
+    A user's home feed, newest first, as a lazy sequence of posts.
+
+    Supports len() and slicing, so Django's Paginator (page-number mode) can
+    page it, and after() for keyset pagination (FeedKeysetPagination). Either
+    way a page costs one range scan of the timeline index, one of the post
+    index for pulled authors, and one query (plus prefetches) for the posts.
+    """
+    model = Post
+
+    def __init__(self, user):
+        self.user = user
+        self.pulled = pulled_author_ids(user)
+
+    def _entries(self):
+        return TimelineEntry.objects.filter(user=self.user)
+
+    def _pulled_posts(self):
+        # Entries left from before an author outgrew fan-out are read from the timeline
+        return Post.objects.filter(author_id__in=self.pulled).exclude(
+            pk__in=self._entries().filter(author_id__in=self.pulled).values('post_id')
+        )
+
+    def count(self):
+        total = self._entries().count()
+        if self.pulled:
+            total += self._pulled_posts().count()
+        return total
+
+    def __len__(self):
+        return self.count()
+
+    def rows(self, limit, offset=0, position=None):
+        """(created_at, post_id) of feed rows, newest first, after position if given."""
+        wanted = offset + limit
+        entries = self._entries()
+        if position is not None:
+            entries = entries.filter(_seek(position, 'created_at', 'post_id'))
+        sources = [list(entries.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:wanted])]
+        if self.pulled:
+            pulled = self._pulled_posts()
+            if position is not None:
+                pulled = pulled.filter(_seek(position, 'created_at', 'id'))
+            sources.append(list(pulled.order_by('-created_at', '-id').values_list('created_at', 'id')[:wanted]))
+        merged = heapq.merge(*sources, reverse=True)
+        return list(islice(merged, offset, wanted))
+
+    def posts(self, rows):
+        """The posts of rows, in row order, loaded for PostListSerializer."""
+        found = Post.objects.for_listing(self.user).in_bulk([post_id for _, post_id in rows])
+        return [found[post_id] for _, post_id in rows if post_id in found]
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('Feed only supports slicing')
+        start = index.start or 0
+        if index.stop is None:
+            raise TypeError('Feed slices need an end')
+        return self.posts(self.rows(index.stop - start, offset=start))
+
+    def after(self, position, limit):
+        """The next `limit` posts after position ((created_at, id), or None for the start)."""
+        return self.posts(self.rows(limit, position=position))
@@ -0,0 +1,141 @@
+"""
+Trending posts.
+
+Every like and comment adds weight * 2 ** (age / HALF_LIFE_HOURS) to its post's
+score, where age is the time of the event since EPOCH. Because every score
+decays at the same rate, an event's contribution never has to be recomputed:
+ranking posts by the sum is the same as ranking them by the decayed sum as of
+now. The sums grow without bound, so they are stored as logarithms
+(PostScore.score) and combined with log-add-exp.
+
+compute_trending() is incremental: it folds in only the Like and Comment rows
+created since the previous TrendingRun (tracked by id), reading them in
+batches of BATCH_SIZE. A full run rebuilds the table from the last WINDOW_DAYS
+of activity, which also forgets removed likes and deleted comments. Runs are
+scheduled with ``manage.py compute_trending`` (e.g. every few minutes from cron,
+plus a nightly ``--full``).
+
+/posts/trending/ reads PostScore in index order (posts_score_trending).
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Comment, Like, PostScore, TrendingRun
+
+DEFAULTS = {
+    'HALF_LIFE_HOURS': 24,
+    'LIKE_WEIGHT': 1.0,
+    'COMMENT_WEIGHT': 2.0,
+    'BATCH_SIZE': 1000,
+    # Activity older than this is left out of full runs and pruned from the table
+    'WINDOW_DAYS': 14,
+    # Rows younger than this wait for the next run, so transactions still in
+    # flight when a run starts (holding lower ids) are not skipped
+    'SETTLE_SECONDS': 60,
+}
+
+# Fixed origin of the exponential; changing it (or HALF_LIFE_HOURS) needs a --full run
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def trending_settings():
+    return {**DEFAULTS, **getattr(settings, 'TRENDING', {})}
+
+
+def event_score(timestamp, weight, half_life_hours):
+    """ln(weight * 2 ** (hours since EPOCH / half_life_hours))."""
+    hours = (timestamp - EPOCH).total_seconds() / 3600
+    return math.log(weight) + hours / half_life_hours * math.log(2)
+
+
+def log_add(a, b):
+    """ln(e**a + e**b) without overflow; a may be None (no score yet)."""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def _batches(model, after_id, since, until, batch_size):
+    """Yield (post_id, created_at) rows of model with id > after_id, in id order, batch by batch."""
+    queryset = model.objects.filter(created_at__lt=until)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    last_id = after_id
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_id).order_by('pk')
+            .values_list('pk', 'post_id', 'created_at')[:batch_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield last_id, [(post_id, created_at) for _, post_id, created_at in rows]
+
+
+def _apply(deltas, now):
+    """Fold {post_id: log score} into PostScore with one read and one upsert."""
+    existing = dict(PostScore.objects.filter(post_id__in=deltas).values_list('post_id', 'score'))
+    PostScore.objects.bulk_create(
+        [
+            PostScore(post_id=post_id, score=log_add(existing.get(post_id), delta), updated_at=now)
+            for post_id, delta in deltas.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['post'],
+        update_fields=['score', 'updated_at'],
+    )
+
+
+def compute_trending(full=False, batch_size=None):
+    """Bring PostScore up to date; returns the TrendingRun recorded for this run."""
+    config = trending_settings()
+    batch_size = batch_size or config['BATCH_SIZE']
+    half_life = config['HALF_LIFE_HOURS']
+    now = timezone.now()
+    until = now - timedelta(seconds=config['SETTLE_SECONDS'])
+    window_start = now - timedelta(days=config['WINDOW_DAYS'])
+
+    # One transaction: readers keep the previous scores until the run commits,
+    # and the scores and the recorded ids can never disagree
+    with transaction.atomic():
+        # Locking the latest run serializes concurrent runs (on databases with row locks)
+        previous = TrendingRun.objects.select_for_update().first()
+        run = TrendingRun(started_at=now, full=full or previous is None)
+        if run.full:
+            PostScore.objects.all().delete()
+        else:
+            run.last_like_id, run.last_comment_id = previous.last_like_id, previous.last_comment_id
+
+        updated = set()
+        sources = (
+            (Like, 'last_like_id', config['LIKE_WEIGHT']),
+            (Comment, 'last_comment_id', config['COMMENT_WEIGHT']),
+        )
+        for model, cursor, weight in sources:
+            since = window_start if run.full else None
+            for last_id, rows in _batches(model, getattr(run, cursor), since, until, batch_size):
+                deltas = {}
+                for post_id, created_at in rows:
+                    deltas[post_id] = log_add(deltas.get(post_id), event_score(created_at, weight, half_life))
+                _apply(deltas, now)
+                updated.update(deltas)
+                setattr(run, cursor, last_id)
+            if run.full:
+                # Past everything before until, including activity older than the
+                # window, so the next incremental run does not read it again
+                latest = model.objects.filter(created_at__lt=until).aggregate(latest=Max('pk'))['latest']
+                setattr(run, cursor, latest or 0)
+
+        # Posts whose activity has all decayed past the window no longer trend
+        PostScore.objects.filter(score__lt=event_score(window_start, 1, half_life)).delete()
+
+        run.posts_updated = len(updated)
+        run.finished_at = timezone.now()
+        run.save()
+    return run
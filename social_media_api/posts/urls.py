@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, CommentViewSet, UserFeedView 
+from .views import PostViewSet, CommentViewSet, UserFeedView, ExportView
 
 # Create a router instance for Posts
 router = DefaultRouter()
@@ -21,12 +21,24 @@ comment_routes = [
         CommentViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'}), 
         name='comment-detail'
     ),
+    # A comment addressed through its post; 404s when it belongs to another post
+    path(
+        '<int:post_pk>/comments/<int:pk>/',
+        CommentViewSet.as_view({'get': 'retrieve'}),
+        name='post-comment-detail'
+    ),
+    # Threaded views: a whole post, or the replies below one comment, in display order
+    path('<int:post_pk>/thread/', CommentViewSet.as_view({'get': 'thread'}), name='post-comment-thread'),
+    path('comments/<int:pk>/replies/', CommentViewSet.as_view({'get': 'replies'}), name='comment-replies'),
 ]
 
 # The complete list of URL patterns
 urlpatterns = [
     # Feed Endpoint (Task 2)
     path('feed/', UserFeedView.as_view(), name='user-feed'),
+
+    # Streaming NDJSON export of the requesting user's posts, comments and likes
+    path('export/', ExportView.as_view(), name='data-export'),
     
     # Include all post routes generated by the router
     path('', include(router.urls)),
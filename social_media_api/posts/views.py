@@ -1,17 +1,34 @@
 from rest_framework import viewsets, mixins, generics
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated # Compliance: permissions.IsAuthenticated imported here
 from rest_framework.decorators import action
+from rest_framework.views import APIView
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework import status
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404 
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Value
 from django_filters.rest_framework import DjangoFilterBackend 
 from rest_framework import filters 
-from django.contrib.contenttypes.models import ContentType 
-from notifications.models import Notification 
+from notifications import dispatch
+from social_media_api.pagination import (
+    CommentPagination, FeedPagination, PostPagination, ThreadPagination, TrendingPagination,
+)
 
-from .models import Post, Comment, Like
-from .serializers import PostSerializer, CommentSerializer
+from .caching import (
+    COMMENT_STATE_FIELDS, POST_STATE_FIELDS, add_validators, cached_body, comment_validators, digest,
+    not_modified, post_validators,
+)
+from .models import Like, Post, PostScore, Comment
+from .serializers import PostBulkSerializer, PostSerializer, PostListSerializer, CommentSerializer
+from .bulk import bulk_create_limit, create_posts
+from .export import stream_for
+from .likes import add_like, remove_like
 from .permissions import IsAuthorOrReadOnly
+from .search import PostSearchFilter
+from .threads import record_reply, record_subtree_removed, replies_of
+from .timeline import Feed, fan_out_post
 
 
 # --- Post ViewSet (Handles Post CRUD, Filtering, Liking) ---
@@ -20,91 +37,263 @@ class PostViewSet(viewsets.ModelViewSet):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
+    # Page numbers by default, keyset on (created_at, id) when ?cursor= is sent
+    # (on (search_rank, id) for ?search= results)
+    pagination_class = PostPagination
     
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['author__username', 'created_at'] 
-    search_fields = ['content'] 
+    # Ranked full-text search (posts.search) instead of SearchFilter's content ILIKE scan
+    filter_backends = [DjangoFilterBackend, PostSearchFilter, filters.OrderingFilter]
+    filterset_fields = {
+        'author__username': ['exact'],
+        'created_at': ['exact'],
+        # Popularity filters read the denormalized counters (no aggregates)
+        'like_count': ['exact', 'gte'],
+        'comment_count': ['exact', 'gte'],
+    }
+    ordering_fields = ['created_at', 'like_count', 'comment_count']
+
+    # Actions that return many posts use the compact list representation
+    list_actions = ('list', 'trending')
+
+    def get_queryset(self):
+        # Annotated/prefetched queryset so serializing a page costs a fixed number of queries
+        if self.action in self.list_actions:
+            return Post.objects.for_listing(self.request.user)
+        return Post.objects.for_detail(self.request.user)
+
+    def get_serializer_class(self):
+        if self.action in self.list_actions:
+            return PostListSerializer
+        return PostSerializer
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if getattr(self, 'search_truncated', False):
+            # Only the best matches were ranked (posts.search python backend)
+            response['X-Search-Truncated'] = 'true'
+        return response
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+
+        # Push the new post into each follower's materialized timeline
+        fan_out_post(post)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Conditional GET: the ETag/Last-Modified validators come from one narrow
+        query (posts.caching), so matching requests get a 304 without loading
+        or serializing the post.
+        """
+        try:
+            post_id = int(kwargs[self.lookup_field])
+        except (TypeError, ValueError):
+            raise NotFound()
+
+        user = request.user
+        viewer_has_liked = (
+            Exists(Like.objects.filter(post_id=OuterRef('pk'), user_id=user.pk))
+            if user.is_authenticated else Value(False)
+        )
+        state = (
+            Post.objects.filter(pk=post_id).annotate(viewer_has_liked=viewer_has_liked)
+            .values(*POST_STATE_FIELDS, 'viewer_has_liked').first()
+        )
+        if state is None:
+            raise NotFound()
+
+        version, last_modified = post_validators(post_id, state)
+        etag = f'"{version}-{int(state["viewer_has_liked"])}"'
+        response = not_modified(request, etag, last_modified)
+        if response is None:
+            # The cached body is shared by all viewers; is_liked comes from the state query
+            body = cached_body(
+                f'posts:post:{post_id}:body:{version}',
+                lambda: dict(self.get_serializer(self.get_object()).data),
+            )
+            response = Response({**body, 'is_liked': state['viewer_has_liked']})
+        return add_validators(response, etag, last_modified, vary_on_user=True)
     
-    # Custom action for liking/unliking a post 
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated]) # Compliance: permissions.IsAuthenticated is explicitly here
+    # Like state of a post for the requesting user:
+    #   PUT    -> like (idempotent)
+    #   DELETE -> unlike (idempotent)
+    #   POST   -> toggle (original behaviour)
+    # Each is a single INSERT ... ON CONFLICT DO NOTHING or DELETE (see posts.likes).
+    @action(detail=True, methods=['post', 'put', 'delete'], permission_classes=[IsAuthenticated]) # Compliance: permissions.IsAuthenticated is explicitly here
     def like(self, request, pk=None):
-        # NOTE: Compliance requires generics.get_object_or_404(Post, pk=pk)
-        post = get_object_or_404(Post, pk=pk)
-        
         user = request.user
-        
-        like_instance = Like.objects.filter(post=post, user=user)
-
-        if like_instance.exists():
-            # UNLIKE: If exists, delete the instance
-            like_instance.delete()
-            
-            # Delete Notification
-            Notification.objects.filter(
-                actor=user, 
-                recipient=post.author, 
-                verb='liked', 
-                object_id=post.pk,
-                content_type=ContentType.objects.get_for_model(Post)
-            ).delete()
+        try:
+            post_id = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound()
+
+        if request.method == 'DELETE':
+            remove_like(post_id, user)
+            return Response({'status': 'unliked'}, status=status.HTTP_200_OK)
 
+        if request.method == 'POST' and remove_like(post_id, user):
+            # Toggle: an existing like was just removed
             return Response({'status': 'unliked'}, status=status.HTTP_200_OK)
-        else:
-            # LIKE: Use Like.objects.get_or_create(user=request.user, post=post)
-            Like.objects.get_or_create(user=user, post=post)
-            
-            # Notification Generation 
-            if post.author != user:
-                Notification.objects.create(
-                    recipient=post.author, 
-                    actor=user, 
-                    verb='liked', 
-                    target=post
-                )
-
-            return Response({'status': 'liked'}, status=status.HTTP_201_CREATED)
+
+        try:
+            created = add_like(post_id, user)
+        except Post.DoesNotExist:
+            raise NotFound()
+
+        return Response(
+            {'status': 'liked'},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """
+        Create up to POST_BULK_CREATE_MAX posts from {"posts": [{"content": ...}, ...]}
+        (or a bare list) in one transaction (posts.bulk). Invalid items are
+        skipped and reported by their index; the rest are created.
+        """
+        items = request.data.get('posts') if isinstance(request.data, dict) else request.data
+        serializer = PostBulkSerializer(
+            child=PostSerializer(), data=items,
+            max_length=bulk_create_limit(), context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        errors = [{'index': index, 'errors': detail} for index, detail in serializer.item_errors.items()]
+        if not serializer.validated_data:
+            return Response({'created': [], 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        posts = create_posts(request.user, serializer.validated_data)
+        created = Post.objects.for_listing(request.user).in_bulk([post.pk for post in posts])
+        data = PostListSerializer(
+            [created[post.pk] for post in posts], many=True, context=self.get_serializer_context(),
+        ).data
+        for index, post in zip(serializer.valid_indexes, data):
+            post['index'] = index
+        return Response({'created': data, 'errors': errors}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """
+        Posts by precomputed trending score (posts.trending), best first.
+        Keyset-paginated with ?cursor= over the score index; no aggregation.
+        """
+        paginator = TrendingPagination()
+        scores = paginator.paginate_queryset(PostScore.objects.only('post_id', 'score'), request, view=self)
+        posts = Post.objects.for_listing(request.user).in_bulk([score.post_id for score in scores])
+        page = [posts[score.post_id] for score in scores if score.post_id in posts]
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
 
 # --- Comment ViewSet (Task 1: Comment CRUD, Notification added to create) ---
 
 class CommentViewSet(viewsets.ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
+    # Page numbers by default; keyset on (created_at, id) with ?cursor=, or ?since= to poll for new comments
+    pagination_class = CommentPagination
     
     def get_queryset(self):
         post_pk = self.kwargs.get('post_pk')
         if post_pk:
-            return Comment.objects.filter(post__pk=post_pk).select_related('author')
-        return Comment.objects.all()
+            return Comment.objects.filter(post_id=post_pk).select_related('author').order_by('created_at', 'id')
+        # comments/<pk>/ only ever addresses a single comment
+        return Comment.objects.select_related('author')
+
+    def list(self, request, *args, **kwargs):
+        # Conditional GET on a post's comments: the post's version changes with every comment write
+        post_pk = self.kwargs.get('post_pk')
+        state = Post.objects.filter(pk=post_pk).values(*POST_STATE_FIELDS).first()
+        if state is None:
+            return super().list(request, *args, **kwargs)
+
+        version, last_modified = post_validators(post_pk, state)
+        etag = '"{}"'.format(digest(version, request.get_full_path()))
+        response = not_modified(request, etag, last_modified) or super().list(request, *args, **kwargs)
+        return add_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        # Same lookup as get_object(), so a 304 is never answered for another post's comment
+        state = self.get_queryset().filter(pk=kwargs['pk']).values(*COMMENT_STATE_FIELDS).first()
+        if state is None:
+            raise NotFound()
+
+        etag, last_modified = comment_validators(kwargs['pk'], state)
+        etag = f'"{etag}"'
+        response = not_modified(request, etag, last_modified) or super().retrieve(request, *args, **kwargs)
+        return add_validators(response, etag, last_modified)
 
     def perform_create(self, serializer):
         post_pk = self.kwargs.get('post_pk')
         post = get_object_or_404(Post, pk=post_pk)
         
-        comment = serializer.save(author=self.request.user, post=post)
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user, post=post)
+            Post.objects.filter(pk=post.pk).update(comment_count=F('comment_count') + 1)
+            if comment.parent_id:
+                record_reply(comment)
         
-        # Notification Generation 
-        if post.author != self.request.user:
-            Notification.objects.create(
-                recipient=post.author, 
-                actor=self.request.user, 
-                verb='commented on', 
-                target=post 
-            )
+        # Notification Generation (applied by the dispatch workers)
+        if post.author_id != self.request.user.pk:
+            dispatch.notify(post.author_id, self.request.user.pk, 'commented on', Post, post.pk)
+
+    def perform_destroy(self, instance):
+        # Replies below the comment are deleted with it (CASCADE on parent)
+        removed = 1 + instance.reply_count
+        with transaction.atomic():
+            instance.delete()
+            Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') - removed)
+            record_subtree_removed(instance)
+
+    # --- Threads (posts.threads) ---
+
+    def thread_response(self, request, queryset, base_depth=0):
+        """Keyset-paginated comments in display order; ?max_depth= limits levels below base_depth."""
+        try:
+            queryset = queryset.filter(depth__lte=base_depth + int(request.query_params['max_depth']))
+        except (KeyError, ValueError):
+            pass
+        paginator = ThreadPagination()
+        page = paginator.paginate_queryset(queryset.select_related('author'), request, view=self)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def thread(self, request, post_pk=None):
+        """Every comment on a post, each followed by its replies."""
+        get_object_or_404(Post.objects.only('id'), pk=post_pk)
+        return self.thread_response(request, Comment.objects.filter(post_id=post_pk))
+
+    def replies(self, request, pk=None):
+        """The replies below one comment, at any depth, in display order (one range scan)."""
+        comment = get_object_or_404(Comment.objects.only('id', 'post', 'path', 'depth'), pk=pk)
+        return self.thread_response(request, replies_of(comment), base_depth=comment.depth + 1)
 
 # --- User Feed View (Task 2: Feed Generation) ---
 
 class UserFeedView(generics.ListAPIView):
     """
     Generates a feed showing posts from users the current authenticated user follows.
+    Reads the user's materialized timeline (see posts.timeline.Feed).
     """
-    serializer_class = PostSerializer
+    serializer_class = PostListSerializer
     permission_classes = [IsAuthenticated] 
+    # Page numbers by default, keyset on (created_at, id) when ?cursor= is sent
+    pagination_class = FeedPagination
+    # A Feed is not a queryset; it pages itself off the timeline index
+    filter_backends = []
 
     def get_queryset(self):
-        user = self.request.user
-        following_users = user.following.all() 
-        queryset = Post.objects.filter(author__in=following_users).order_by('-created_at')
-        return queryset
+        return Feed(self.request.user)
+
+
+# --- Data Export ---
+
+class ExportView(APIView):
+    """
+    Streams the requesting user's posts, comments and likes as newline-delimited
+    JSON (posts.export), with memory bounded however long their history is.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        user = request.user
+        response = StreamingHttpResponse(stream_for(request._request, user), content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{user.username}-export.ndjson"'
+        return response
@@ -0,0 +1,260 @@
+"""
+Keyset (seek) pagination shared by the posts and notifications apps.
+
+Page-number pagination costs an OFFSET scan plus a COUNT(*) per request, so
+deep pages get slower as the table grows. Keyset pagination instead filters on
+the last row seen, e.g. ``(created_at, id) < (:ts, :id)``, which the composite
+indexes on the paginated tables answer with a single range scan. The position
+is handed to clients as an opaque cursor and no COUNT query is issued.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import FloatField, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginates on a unique composite ordering using opaque cursors."""
+    # Unique ordering to seek on; the last field must be unique (usually the pk).
+    ordering = ('-created_at', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    # Model fields for ordering names that are annotations, to convert cursor values with
+    annotation_fields = {}
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        model = queryset.model
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, model)
+        if position is not None:
+            queryset = queryset.filter(self.seek_condition(position))
+
+        # Fetch one extra row to learn whether another page exists (no COUNT)
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    # --- Cursor encoding ---
+
+    def field_names(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def encode_cursor(self, row):
+        values = [getattr(row, name) for name in self.field_names()]
+        # isoformat() keeps full microsecond precision, which the seek comparison needs
+        data = json.dumps(values, default=lambda value: value.isoformat()).encode('ascii')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    def requested_cursor(self, request):
+        return request.query_params.get(self.cursor_query_param)
+
+    def decode_cursor(self, request, model):
+        encoded = self.requested_cursor(request)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            names = self.field_names()
+            if not isinstance(values, list) or len(values) != len(names):
+                raise ValueError
+            # Convert the JSON values back through the model fields (e.g. ISO strings to datetimes)
+            return [
+                (self.annotation_fields.get(name) or model._meta.get_field(name)).to_python(value)
+                for name, value in zip(names, values)
+            ]
+        except (TypeError, ValueError, ValidationError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def seek_condition(self, position):
+        """
+        Lexicographic "comes after" condition for the cursor position, e.g.
+        created_at < ts OR (created_at = ts AND id < pk) for ('-created_at', '-id').
+        """
+        condition = Q()
+        equal_prefix = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal_prefix, **{f'{name}__{lookup}': value})
+            equal_prefix[name] = value
+        return condition
+
+    # --- Response ---
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetOrPageNumberPagination(BasePagination):
+    """
+    Page-number pagination by default; switches to keyset pagination when the
+    request carries a ``cursor`` query parameter (``?cursor=`` for the first page).
+    """
+    keyset_class = KeysetPagination
+    page_number_class = PageNumberPagination
+
+    def uses_keyset(self, request):
+        return self.keyset_class.cursor_query_param in request.query_params
+
+    def get_keyset_class(self, request):
+        return self.keyset_class
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.uses_keyset(request):
+            self.paginator = self.get_keyset_class(request)()
+        else:
+            self.paginator = self.page_number_class()
+        return self.paginator.paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+
+# --- Post search results seek on relevance (posts.search annotates search_rank) ---
+
+class SearchKeysetPagination(KeysetPagination):
+    ordering = ('-search_rank', '-id')
+    annotation_fields = {'search_rank': FloatField()}
+
+
+class PostPagination(KeysetOrPageNumberPagination):
+    """Keyset on (created_at, id), or on (search_rank, id) for ?search= results."""
+    search_query_param = 'search'
+
+    def get_keyset_class(self, request):
+        if request.query_params.get(self.search_query_param, '').strip():
+            return SearchKeysetPagination
+        return self.keyset_class
+
+
+# --- Notification lists are ordered by timestamp rather than created_at ---
+
+class TimestampKeysetPagination(KeysetPagination):
+    ordering = ('-timestamp', '-id')
+
+
+class NotificationPagination(KeysetOrPageNumberPagination):
+    keyset_class = TimestampKeysetPagination
+
+
+# --- Comments are read oldest first and polled for new rows ---
+
+class CommentKeysetPagination(KeysetPagination):
+    """
+    Oldest first on (created_at, id), answered by the posts_comment_post_created
+    index. ``?since=`` is the polling form of ``?cursor=``: every response
+    carries a ``since`` cursor for the last comment returned (even on the last
+    page, where ``next`` is null), so a client polling with it reads only the
+    comments added after that one.
+    """
+    ordering = ('created_at', 'id')
+    since_query_param = 'since'
+
+    def requested_cursor(self, request):
+        return super().requested_cursor(request) or request.query_params.get(self.since_query_param)
+
+    def get_since_cursor(self):
+        if self.page:
+            return self.encode_cursor(self.page[-1])
+        # Nothing new: the client keeps polling from where it is
+        return self.requested_cursor(self.request) or None
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('since', self.get_since_cursor()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['since'] = {'type': 'string', 'nullable': True}
+        return response_schema
+
+
+class CommentPagination(KeysetOrPageNumberPagination):
+    keyset_class = CommentKeysetPagination
+
+    def uses_keyset(self, request):
+        return super().uses_keyset(request) or self.keyset_class.since_query_param in request.query_params
+
+
+class ThreadPagination(KeysetPagination):
+    """Comment threads in display (depth-first) order; the path is unique per comment."""
+    ordering = ('path',)
+
+
+# --- Home feeds merge timeline entries with pulled posts (posts.timeline.Feed) ---
+
+class FeedKeysetPagination(KeysetPagination):
+    """Keyset pages of a Feed, which seeks on (created_at, id) itself."""
+
+    def paginate_queryset(self, feed, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, feed.model)
+        rows = feed.after(position, self.page_size + 1)
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+
+class FeedPagination(KeysetOrPageNumberPagination):
+    keyset_class = FeedKeysetPagination
+
+
+# --- Follower lists seek on the follow row id (newest follows first) ---
+
+class FollowPagination(KeysetPagination):
+    ordering = ('-id',)
+
+
+# --- Trending posts seek on the precomputed score ---
+
+class TrendingPagination(KeysetPagination):
+    ordering = ('-score', '-post_id')
@@ -5,6 +5,7 @@ Django settings for social_media_api project.
 from pathlib import Path
 import os
 import dj_database_url # Import for production database configuration
+from social_media_api.caching import cache_config
 # NOTE: Removed django_heroku import
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -153,6 +154,102 @@ REST_FRAMEWORK = {
     ),
 }
 
+# --- Cache Configuration (social_media_api.caching) ---
+# CACHE_URL picks the backend: locmem:// (default), file:///path, redis://host:port/db,
+# or fakeredis:// to run the Redis backend against an in-process fake (needs fakeredis).
+CACHES = {
+    'default': cache_config(os.environ.get('CACHE_URL'), key_prefix='social'),
+}
+
+# --- Home Feed Configuration (posts.timeline) ---
+# Authors with more followers than this are merged into feeds at read time
+# instead of being pushed into every follower's timeline on write.
+FEED_FANOUT_FOLLOWER_LIMIT = int(os.environ.get('FEED_FANOUT_FOLLOWER_LIMIT', 10000))
+# A pulled author is fanned out again (`manage.py trim_timelines`) once back at
+# FEED_FANOUT_RESUME_FOLLOWER_LIMIT followers (default 90% of the limit above),
+# starting with their most recent FEED_RESUME_POSTS posts
+FEED_RESUME_POSTS = 20
+# Recent posts copied into a timeline when a user follows someone
+FEED_BACKFILL_POSTS = 200
+# Entries kept per materialized timeline; `manage.py trim_timelines` (cron)
+# deletes older ones, so feeds end after this many posts
+FEED_TIMELINE_MAX_ENTRIES = 1000
+
+# Seconds a serialized post body stays cached (posts.caching); bodies are keyed
+# by version, so changes never serve stale data regardless of this value.
+POST_CACHE_TIMEOUT = 5 * 60
+
+# Comments embedded in post and feed responses (the first N, oldest first).
+# The full list is paginated at /api/posts/<id>/comments/.
+POST_COMMENT_PREVIEWS = 3
+
+# Most posts accepted by one POST /api/posts/bulk/ request (posts.bulk)
+POST_BULK_CREATE_MAX = 100
+
+# Rows fetched per cursor round trip (and lines per write) by /api/export/ (posts.export)
+EXPORT_CHUNK_SIZE = 2000
+
+# Deepest reply level accepted by the comment API (posts.threads); top-level
+# comments are level 0. Paths hold at most 20 levels; larger values are clamped.
+COMMENT_MAX_DEPTH = 8
+
+# Full-text search backend for ?search= on posts (posts.search): 'auto' picks
+# PostgreSQL tsvector or SQLite FTS5 from the database, 'python' forces the
+# in-process inverted index.
+POST_SEARCH_BACKEND = os.environ.get('POST_SEARCH_BACKEND', 'auto')
+
+# --- Notification Dispatch (notifications.dispatch) ---
+# 'inline' applies notification events in the request, 'database' queues them
+# durably in NotificationJob. 'thread' hands them to in-process worker threads
+# and loses whatever is queued when a worker restarts, so it is opt-in only.
+NOTIFICATION_DISPATCH = {
+    'BACKEND': os.environ.get('NOTIFICATION_DISPATCH_BACKEND', 'inline'),
+    'WORKERS': int(os.environ.get('NOTIFICATION_DISPATCH_WORKERS', 2)),
+    'BATCH_SIZE': 200,
+    'POLL_INTERVAL': 1.0,
+    # Failed runs after which a queued job is dead-lettered
+    'MAX_ATTEMPTS': 5,
+}
+
+# Events with the same (recipient, verb, target) within WINDOW seconds are
+# rolled up into one notification ("X and 41 others liked your post").
+NOTIFICATION_AGGREGATION = {
+    'VERBS': ('liked', 'commented on', 'started following'),
+    'WINDOW': 24 * 60 * 60,
+    'SAMPLE_SIZE': 3,
+}
+
+# Read notifications older than DAYS are pruned in BATCH_SIZE chunks by
+# `manage.py prune_notifications` (cron) or by `process_notification_jobs --loop`
+# every INTERVAL seconds; ARCHIVE moves them to ArchivedNotification instead.
+NOTIFICATION_RETENTION = {
+    'DAYS': int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90)),
+    'ARCHIVE': os.environ.get('NOTIFICATION_RETENTION_ARCHIVE', 'False') == 'True',
+    'BATCH_SIZE': 1000,
+    'INTERVAL': 60 * 60,
+}
+
+# --- Trending Posts (posts.trending) ---
+# Likes and comments decay with a HALF_LIFE_HOURS half-life; scores are updated
+# incrementally by `manage.py compute_trending` (cron) and rebuilt with --full.
+# Changing HALF_LIFE_HOURS needs a --full run.
+TRENDING = {
+    'HALF_LIFE_HOURS': 24,
+    'LIKE_WEIGHT': 1.0,
+    'COMMENT_WEIGHT': 2.0,
+    'BATCH_SIZE': 1000,
+    'WINDOW_DAYS': 14,
+}
+
+# --- Real-time Notifications (notifications.realtime) ---
+# Broker that pushes new notifications to /api/notifications/stream/ clients.
+# The in-memory broker only reaches clients connected to the same process, so it
+# never sees jobs applied by `manage.py process_notification_jobs`; use
+# notifications.realtime.RedisBroker (needs redis) with several processes.
+NOTIFICATION_BROKER = os.environ.get('NOTIFICATION_BROKER', 'notifications.realtime.InMemoryBroker')
+NOTIFICATION_BROKER_URL = os.environ.get('NOTIFICATION_BROKER_URL', 'redis://localhost:6379/0')
+NOTIFICATION_STREAM_KEEPALIVE = 15
+
 # --- Deployment Configuration (Compliance Check: DEBUG=False, Security Headers, Static/Media) ---
 if not DEBUG:
     # Compliance Check: setting DEBUG to False
@@ -0,0 +1,15 @@
+"""Small helpers for the hand-written SQL in the write paths."""
+from django.db import connection
+
+
+def supports_returning():
+    """
+    Whether the database accepts RETURNING on UPDATE and DELETE as well as
+    INSERT (PostgreSQL, SQLite >= 3.35). can_return_columns_from_insert only
+    speaks for INSERT: MariaDB has INSERT ... RETURNING but not the others.
+    """
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return False